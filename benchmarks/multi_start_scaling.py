@@ -0,0 +1,89 @@
+"""
+How multi-start quality scales with the number of worker processes.
+
+Runs src.algorithm.multi_start on each dataset with the same time budget
+and seed for every worker count, and reports the starts completed, the
+best cost, whether it is feasible and when it was found. With a fixed
+budget more workers mean more starts, so the best cost should not get
+worse as the worker count grows (up to the number of physical cores).
+
+Usage (from the repository root):
+    python -m benchmarks.multi_start_scaling --sizes 50 100 --workers 1 2 4 8 --time-limit 10
+    python -m benchmarks.multi_start_scaling --output benchmarks/multi_start.json
+"""
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+from src.algorithm.multi_start import multi_start
+
+ROOT = Path(__file__).resolve().parent.parent
+DATASET_FOLDER = ROOT / 'datasets'
+SIZES = (25, 50, 100)
+TIME_LIMIT = 10.0
+
+
+def default_worker_counts():
+    """1, 2, 4, ... up to the number of CPUs (included)."""
+    counts, n = [], 1
+    while n < (os.cpu_count() or 1):
+        counts.append(n)
+        n *= 2
+    return counts + [os.cpu_count() or 1]
+
+
+def scaling_report(dataset_folder=DATASET_FOLDER, sizes=SIZES, worker_counts=None,
+                   time_limit=TIME_LIMIT, seed=0):
+    """
+    Run multi_start for every (size, worker count).
+
+    Returns:
+        list of dict: One row per run with size, workers, starts,
+        starts_per_second, cost, feasible and time_to_best.
+    """
+    rows = []
+    for size in sizes:
+        pkl_file = Path(dataset_folder) / f'dataset_size{size}_1.pkl'
+        if not pkl_file.is_file():
+            print(f'Skipping size {size}: {pkl_file} not found')
+            continue
+        for workers in worker_counts or default_worker_counts():
+            solution = multi_start(pkl_file, workers=workers, time_limit=time_limit, seed=seed)
+            stats = solution.solver_stats
+            rows.append({
+                'size': size,
+                'workers': workers,
+                'starts': stats['starts'],
+                'starts_per_second': stats['starts'] / time_limit,
+                'cost': solution.total_cost,
+                'feasible': solution.complete_feasibility_flag,
+                'time_to_best': stats['time_to_best'],
+            })
+            row = rows[-1]
+            print(f'size{size:<4} workers {workers:>3}  starts {row["starts"]:>5} '
+                  f'({row["starts_per_second"]:7.1f}/s)  cost {row["cost"]:10.2f}  '
+                  f'feasible {row["feasible"]!s:<5}  best at {row["time_to_best"]:6.2f} s')
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--datasets', type=Path, default=DATASET_FOLDER, help='folder with dataset_size<N>_1.pkl')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--workers', type=int, nargs='+', help='worker counts (default 1, 2, 4, ... CPUs)')
+    parser.add_argument('--time-limit', type=float, default=TIME_LIMIT, help='seconds per run')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=Path, help='write the rows to this JSON file')
+    args = parser.parse_args(argv)
+
+    rows = scaling_report(args.datasets, args.sizes, args.workers, args.time_limit, args.seed)
+    if args.output:
+        args.output.write_text(json.dumps(rows, indent=2))
+        print(f'Results saved to {args.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""
+Benchmark suite over the shipped datasets.
+
+Times instance loading, VRPInstance construction, the heuristics (full
+and granular), the VRPSolution bookkeeping and the matrix generation on
+one dataset per size, with warmup runs and repetitions, and stores the
+statistics as JSON. A run
+can be compared against a saved baseline; any benchmark whose median is
+slower than the baseline by more than the threshold is reported as a
+regression and the script exits with status 1.
+
+Usage (from the repository root):
+    python -m benchmarks.run_benchmarks --output benchmarks/baseline.json
+    python -m benchmarks.run_benchmarks --baseline benchmarks/baseline.json --threshold 0.15
+"""
+import argparse
+import importlib.util
+import json
+import pickle
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from src.instance_store import convert_pickle, load_pickle, open_instance
+from src.vrp_instance import VRPInstance
+from src.vrp_solution import VRPSolution
+from src.algorithm.nearest_neighbour import nearest_neighbour, granular_nearest_neighbour
+from src.algorithm.two_opt import two_opt, granular_two_opt
+
+ROOT = Path(__file__).resolve().parent.parent
+DATASET_FOLDER = ROOT / 'datasets'
+SIZES = (8, 25, 50, 75, 100)
+WARMUP = 1
+REPEAT = 10
+THRESHOLD = 0.10          # allowed slowdown of the median (10%)
+MIN_REGRESSION_S = 1e-4   # ignore differences below timer noise
+PERCENTILES = (10, 50, 90)
+
+
+def time_callable(fn, warmup=WARMUP, repeat=REPEAT):
+    """
+    Time fn() with perf_counter.
+
+    Returns:
+        dict: median, p10, p90, min, mean (seconds) and the number of repetitions.
+    """
+    for _ in range(warmup):
+        fn()
+    samples = np.empty(repeat)
+    for k in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples[k] = time.perf_counter() - start
+    p10, median, p90 = np.percentile(samples, PERCENTILES)
+    return {
+        'median': float(median),
+        'p10': float(p10),
+        'p90': float(p90),
+        'min': float(samples.min()),
+        'mean': float(samples.mean()),
+        'repeat': repeat,
+    }
+
+
+def _load_generator():
+    """Import datasets/generate_instances.py, which is a script and not a package."""
+    spec = importlib.util.spec_from_file_location('generate_instances', DATASET_FOLDER / 'generate_instances.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _rebuild(solution):
+    """Rebuild a solution route by route and check it, as the algorithms do."""
+    new_solution = VRPSolution(solution.instance)
+    for ids in solution.route_ids:
+        new_solution.add_route(ids)
+    new_solution.complete_feasibility()
+    return new_solution
+
+
+def dataset_cases(pkl_file, binary_folder, generator):
+    """(name, callable) pairs timed on one dataset."""
+    with open(pkl_file, 'rb') as f:
+        data = pickle.load(f)
+    instance = load_pickle(pkl_file)
+    instance_dir = convert_pickle(pkl_file, binary_folder)
+    initial = nearest_neighbour(instance)
+    locations = list(data['locations'].values())
+
+    return [
+        ('load_pickle', lambda: load_pickle(pkl_file)),
+        ('open_instance', lambda: open_instance(instance_dir)),
+        ('vrp_instance', lambda: VRPInstance(
+            data['locations'], data['distance_matrix'], data['time_matrix'],
+            data['chargin_cost'], data['cost_matrix'])),
+        ('nearest_neighbour', lambda: nearest_neighbour(instance)),
+        ('two_opt', lambda: two_opt(initial)),
+        ('granular_nearest_neighbour', lambda: granular_nearest_neighbour(instance)),
+        ('granular_two_opt', lambda: granular_two_opt(initial)),
+        ('add_route_feasibility', lambda: _rebuild(initial)),
+        ('distance_matrix', lambda: generator.calculate_distance_array(locations)),
+    ]
+
+
+def run_benchmarks(dataset_folder=DATASET_FOLDER, sizes=SIZES, warmup=WARMUP, repeat=REPEAT, only=None):
+    """
+    Run every benchmark on dataset_size<N>_1.pkl for each size.
+
+    Args:
+        only (iterable of str | None): Benchmark names to run (None = all).
+
+    Returns:
+        dict: {'meta': {...}, 'results': {'<benchmark>/size<N>': stats}}
+    """
+    generator = _load_generator()
+    results = {}
+    with tempfile.TemporaryDirectory() as binary_folder:
+        for size in sizes:
+            pkl_file = Path(dataset_folder) / f'dataset_size{size}_1.pkl'
+            if not pkl_file.is_file():
+                print(f'Skipping size {size}: {pkl_file} not found')
+                continue
+            for name, fn in dataset_cases(pkl_file, binary_folder, generator):
+                if only and name not in only:
+                    continue
+                key = f'{name}/size{size}'
+                results[key] = time_callable(fn, warmup, repeat)
+                print(f'{key:<36} median {results[key]["median"] * 1e3:10.3f} ms')
+
+    return {
+        'meta': {
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'warmup': warmup,
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold=THRESHOLD, min_difference=MIN_REGRESSION_S):
+    """
+    Compare two benchmark runs on the median.
+
+    Returns:
+        list of tuple: (benchmark, baseline median, current median, ratio) of
+        the benchmarks slower than baseline * (1 + threshold).
+    """
+    regressions = []
+    print(f'{"benchmark":<36} {"baseline ms":>12} {"current ms":>12} {"ratio":>7}')
+    for key, stats in current['results'].items():
+        if key not in baseline['results']:
+            continue
+        before, after = baseline['results'][key]['median'], stats['median']
+        ratio = after / before if before > 0 else float('inf')
+        slower = after > before * (1 + threshold) and after - before > min_difference
+        print(f'{key:<36} {before * 1e3:12.3f} {after * 1e3:12.3f} {ratio:7.2f}{"  REGRESSION" if slower else ""}')
+        if slower:
+            regressions.append((key, before, after, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--datasets', type=Path, default=DATASET_FOLDER, help='folder with dataset_size<N>_1.pkl')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--warmup', type=int, default=WARMUP)
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--only', nargs='+', help='benchmark names to run')
+    parser.add_argument('--output', type=Path, help='write the results to this JSON file')
+    parser.add_argument('--baseline', type=Path, help='compare against this JSON file')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='allowed relative slowdown of the median (default 0.10)')
+    args = parser.parse_args(argv)
+
+    current = run_benchmarks(args.datasets, args.sizes, args.warmup, args.repeat, args.only)
+    if args.output:
+        args.output.write_text(json.dumps(current, indent=2))
+        print(f'Results saved to {args.output}')
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f'{len(regressions)} regression(s) above {args.threshold:.0%}')
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""
+Load test of the local solve server (src/server.py).
+
+Fires a fixed number of solve requests with a bounded number in flight
+and reports the throughput and the client-side latency percentiles, the
+server's own queue/solve split and mean batch size, and the latency of
+'ping' requests sent while the solves run (if the event loop were blocked
+by a solve, the pings would wait for it).
+
+By default a server is started in this process for every batch window, so
+batching can be compared with no batching (window 0); with --port the
+requests go to an already running server instead.
+
+Usage (from the repository root):
+    python -m benchmarks.server_load --sizes 8 25 --requests 500 --concurrency 32
+    python -m benchmarks.server_load --batch-windows 0 0.002 0.01 --workers 4
+    python -m benchmarks.server_load --port 8765 --algorithms two_opt
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.server import DEFAULT_HOST, PERCENTILES, SolveClient, SolveServer
+
+ROOT = Path(__file__).resolve().parent.parent
+DATASET_FOLDER = ROOT / 'datasets'
+SIZES = (8, 25)
+ALGORITHMS = ('nearest_neighbour', 'two_opt')
+REQUESTS = 300
+CONCURRENCY = 32
+BATCH_WINDOWS = (0.0, 0.002)
+PING_INTERVAL = 0.01
+
+
+def _percentiles(values):
+    values = np.asarray(values) * 1000
+    return {f'p{q}': float(v) for q, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+async def load_test(client, paths, algorithms=ALGORITHMS, requests=REQUESTS, concurrency=CONCURRENCY):
+    """
+    Run the load against a connected client.
+
+    Returns:
+        dict: requests, errors, seconds, throughput (requests/s), latency_ms
+        and ping_ms percentiles, and the server stats after the run.
+    """
+    fingerprints = [await client.load(path) for path in paths]
+    jobs = [(fingerprint, algorithm) for fingerprint in fingerprints for algorithm in algorithms]
+    for fingerprint, algorithm in jobs:  # warm-up: every worker path and import exercised once
+        await client.solve(fingerprint, algorithm)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, pings, errors = [], [], 0
+    finished = asyncio.Event()
+
+    async def one(k):
+        nonlocal errors
+        fingerprint, algorithm = jobs[k % len(jobs)]
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await client.solve(fingerprint, algorithm)
+            except RuntimeError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    async def ping():
+        while not finished.is_set():
+            start = time.perf_counter()
+            await client.ping()
+            pings.append(time.perf_counter() - start)
+            await asyncio.sleep(PING_INTERVAL)
+
+    pinger = asyncio.create_task(ping())
+    start = time.perf_counter()
+    await asyncio.gather(*(one(k) for k in range(requests)))
+    seconds = time.perf_counter() - start
+    finished.set()
+    await pinger
+
+    return {
+        'requests': requests,
+        'errors': errors,
+        'seconds': seconds,
+        'throughput': requests / seconds,
+        'latency_ms': _percentiles(latencies),
+        'ping_ms': _percentiles(pings),
+        'server': await client.stats(),
+    }
+
+
+async def run(args, paths):
+    rows = []
+    if args.port is not None:
+        async with SolveClient(args.host, args.port) as client:
+            rows.append(await load_test(client, paths, args.algorithms, args.requests, args.concurrency))
+        return rows
+    for window in args.batch_windows:
+        async with SolveServer(port=0, workers=args.workers, batch_window=window) as server:
+            async with SolveClient(port=server.port) as client:
+                row = await load_test(client, paths, args.algorithms, args.requests, args.concurrency)
+        rows.append(dict(batch_window=window, **row))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--datasets', type=Path, default=DATASET_FOLDER, help='folder with dataset_size<N>_1.pkl')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--algorithms', nargs='+', default=ALGORITHMS)
+    parser.add_argument('--requests', type=int, default=REQUESTS)
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY, help='requests in flight')
+    parser.add_argument('--workers', type=int, help='server processes (default: CPUs, 0 = threads)')
+    parser.add_argument('--batch-windows', type=float, nargs='+', default=BATCH_WINDOWS,
+                        help='one in-process server per window (seconds)')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, help='use the server already listening on this port')
+    parser.add_argument('--output', type=Path, help='write the rows to this JSON file')
+    args = parser.parse_args(argv)
+
+    paths = [args.datasets / f'dataset_size{size}_1.pkl' for size in args.sizes]
+    missing = [path for path in paths if not path.is_file()]
+    if missing:
+        print(f'Not found: {", ".join(map(str, missing))}')
+        return 1
+
+    rows = asyncio.run(run(args, paths))
+    for row in rows:
+        server = row['server']
+        label = f'window {row["batch_window"] * 1000:5.1f} ms' if 'batch_window' in row else 'server'
+        latency, ping = row['latency_ms'], row['ping_ms']
+        print(f'{label}  {row["throughput"]:8.1f} req/s  '
+              f'latency p50 {latency["p50"]:7.2f} p99 {latency["p99"]:7.2f} ms  '
+              f'ping p99 {ping["p99"]:6.2f} ms  mean batch {server["mean_batch_size"]:5.1f}  '
+              f'errors {row["errors"]}')
+    if args.output:
+        args.output.write_text(json.dumps(rows, indent=2))
+        print(f'Results saved to {args.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
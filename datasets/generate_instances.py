@@ -1,7 +1,10 @@
+import hashlib
+import json
 import pickle
 import random
 from pathlib import Path
 from geopy.distance import geodesic
+import numpy as np
 import re
 
 
@@ -173,6 +176,14 @@ KWH = 300
 PRICE_PER_KM = 0.623
 AVERAGE_SPEED_KMH = 70
 
+# WGS-84 ellipsoid (km) and mean Earth radius for the vectorized distances
+WGS84_A_KM = 6378.137
+WGS84_F = 1 / 298.257223563
+EARTH_RADIUS_KM = 6371.0088
+DISTANCE_METHODS = ('haversine', 'ellipsoidal')
+GEODESIC_TOLERANCE_KM = 0.01
+MASTER_MATRIX_FILE = "master_matrix.npz"
+
 # ---------- FUNCTIONS ----------
 def calculate_distance_matrix(locations):
     """Distance matrix with location names as keys."""
@@ -220,14 +231,138 @@ def calculate_cost_matrix(distance_matrix, price_per_km=PRICE_PER_KM):
         matrix[key] = round(distance_matrix[key] * price_per_km, 2)
     return matrix
 
+# ---------- VECTORIZED FUNCTIONS ----------
+def _coords_array(locations):
+    """(n, 2) array of (lat, lon) in degrees, NaN where coords are missing."""
+    return np.array([loc['coords'] if loc['coords'] else (np.nan, np.nan) for loc in locations],
+                    dtype=np.float64)
+
+def _central_angle(lat, lon):
+    """Pairwise central angle (radians) between points, haversine formula."""
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    h = np.sin(dlat / 2) ** 2 + np.cos(lat[:, None]) * np.cos(lat[None, :]) * np.sin(dlon / 2) ** 2
+    return 2 * np.arcsin(np.sqrt(np.clip(h, 0, 1)))
+
+def haversine_distance_array(coords):
+    """Pairwise great-circle distances (km) on the mean-radius sphere."""
+    lat, lon = np.radians(coords).T
+    return EARTH_RADIUS_KM * _central_angle(lat, lon)
+
+def ellipsoidal_distance_array(coords):
+    """Pairwise distances (km) on the WGS-84 ellipsoid using Lambert's formula."""
+    lat, lon = np.radians(coords).T
+    beta = np.arctan((1 - WGS84_F) * np.tan(lat))  # reduced latitudes
+    sigma = _central_angle(beta, lon)
+
+    p = (beta[:, None] + beta[None, :]) / 2
+    q = (beta[None, :] - beta[:, None]) / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = (sigma - np.sin(sigma)) * np.sin(p) ** 2 * np.cos(q) ** 2 / np.cos(sigma / 2) ** 2
+        y = (sigma + np.sin(sigma)) * np.cos(p) ** 2 * np.sin(q) ** 2 / np.sin(sigma / 2) ** 2
+        distance = WGS84_A_KM * (sigma - WGS84_F / 2 * (x + y))
+    return np.where(sigma == 0, 0.0, distance)
+
+def check_against_geodesic(coords, distance, tolerance_km=GEODESIC_TOLERANCE_KM,
+                           samples=100, seed=0):
+    """
+    Compare a sample of pairs of a distance array against geopy's geodesic.
+
+    Raises ValueError if any sampled pair differs by more than tolerance_km.
+    """
+    n = len(coords)
+    rng = np.random.default_rng(seed)
+    pairs = rng.integers(0, n, size=(min(samples, n * n), 2))
+    for i, j in pairs:
+        if i == j or np.isnan(distance[i, j]):
+            continue
+        reference = geodesic(tuple(coords[i]), tuple(coords[j])).km
+        if abs(distance[i, j] - reference) > tolerance_km:
+            raise ValueError(
+                f"Distance {i}->{j} = {distance[i, j]:.4f} km differs from geodesic "
+                f"{reference:.4f} km by more than {tolerance_km} km"
+            )
+
+def calculate_distance_array(locations, method='ellipsoidal', tolerance_km=GEODESIC_TOLERANCE_KM):
+    """Distance array (km, rounded to 2 decimals) in the order of locations."""
+    coords = _coords_array(locations)
+    if method == 'haversine':
+        distance = haversine_distance_array(coords)
+    elif method == 'ellipsoidal':
+        distance = ellipsoidal_distance_array(coords)
+        check_against_geodesic(coords, distance, tolerance_km)
+    else:
+        raise ValueError(f"Unknown distance method {method!r}, expected one of {DISTANCE_METHODS}")
+    distance = np.round(distance, 2)
+    np.fill_diagonal(distance, 0)
+    return distance
+
+def calculate_time_array(distance, speed_kmh=AVERAGE_SPEED_KMH):
+    """Time array in minutes."""
+    return np.round(distance / speed_kmh * 60, 2)
+
+def calculate_cost_array(distance, price_per_km=PRICE_PER_KM):
+    """Cost array."""
+    return np.round(distance * price_per_km, 2)
+
+def array_to_named_matrix(array, locations):
+    """Convert an array into the dict-of-(name, name) format stored in the datasets."""
+    names = [loc['name'] for loc in locations]
+    rows = array.tolist()
+    return {
+        (name_i, name_j): (None if value != value else value)  # NaN -> None
+        for name_i, row in zip(names, rows)
+        for name_j, value in zip(names, row)
+    }
+
+# ---------- MASTER MATRIX ----------
+def pool_fingerprint(locations, method='ellipsoidal'):
+    """Hash of the names, coords and distance method of a location pool."""
+    payload = json.dumps([[loc['name'], loc['coords']] for loc in locations] + [method])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def master_distance_array(locations, method='ellipsoidal', cache_file=None):
+    """
+    Distance array of the whole location pool, computed once and cached.
+
+    The array is stored in cache_file (.npz) together with the fingerprint
+    of the pool; it is only recomputed when the pool or the method change.
+    """
+    fingerprint = pool_fingerprint(locations, method)
+    if cache_file is not None and Path(cache_file).is_file():
+        with np.load(cache_file) as cached:
+            if str(cached['fingerprint']) == fingerprint:
+                return cached['distance']
+
+    distance = calculate_distance_array(locations, method)
+    if cache_file is not None:
+        np.savez(cache_file, distance=distance, fingerprint=fingerprint)
+        print(f"Master distance matrix ({len(locations)} locations) saved to {cache_file}")
+    return distance
+
 def generate_datasets(fixed_locations, variable_locations,
                       min_size=3, max_size=9, samples_per_size=10,
-                      output_folder="datasets"):
-    """Generate EV datasets with named matrices."""
+                      output_folder="datasets", vectorized=True, method='ellipsoidal'):
+    """
+    Generate EV datasets with named matrices.
+
+    With vectorized=True the distances of the whole pool (fixed + variable
+    locations) are computed once with NumPy (method 'haversine' or
+    'ellipsoidal'), cached in output_folder/MASTER_MATRIX_FILE, and each
+    dataset takes its rows and columns from that master matrix; the time and
+    cost matrices are derived from it as array transforms. Otherwise the
+    original pairwise geodesic loop is used for every dataset.
+    """
     Path(output_folder).mkdir(exist_ok=True)
 
     print(f"Generating datasets in folder: {output_folder}")
 
+    if vectorized:
+        pool = fixed_locations + variable_locations
+        master_distance = master_distance_array(pool, method, Path(output_folder) / MASTER_MATRIX_FILE)
+        master_time = calculate_time_array(master_distance)
+        master_cost = calculate_cost_array(master_distance)
+
     for size in [25, 50, 75, 100]:
         existing_combinations = set()  # keep track of already used combinations
         
@@ -235,7 +370,8 @@ def generate_datasets(fixed_locations, variable_locations,
             tries = 0
             while True:
                 tries += 1
-                selected_variable = random.sample(variable_locations, size)
+                selected = random.sample(range(len(variable_locations)), size)
+                selected_variable = [variable_locations[k] for k in selected]
                 names_set = frozenset(loc['name'] for loc in selected_variable)
                 
                 if names_set not in existing_combinations or tries > 50:
@@ -245,10 +381,17 @@ def generate_datasets(fixed_locations, variable_locations,
             
             dataset_locations = fixed_locations + selected_variable
             
-            distance_matrix = calculate_distance_matrix(dataset_locations)
-            time_matrix = calculate_time_matrix(distance_matrix)
+            if vectorized:
+                pool_ids = list(range(len(fixed_locations))) + [len(fixed_locations) + k for k in selected]
+                rows = np.ix_(pool_ids, pool_ids)
+                distance_matrix = array_to_named_matrix(master_distance[rows], dataset_locations)
+                time_matrix = array_to_named_matrix(master_time[rows], dataset_locations)
+                cost_matrix = array_to_named_matrix(master_cost[rows], dataset_locations)
+            else:
+                distance_matrix = calculate_distance_matrix(dataset_locations)
+                time_matrix = calculate_time_matrix(distance_matrix)
+                cost_matrix = calculate_cost_matrix(distance_matrix)
             chargin_cost = calculate_charging_cost_vector(dataset_locations)
-            cost_matrix = calculate_cost_matrix(distance_matrix)
             
             dataset = {
                 "locations": {loc['name']: loc for loc in dataset_locations},
@@ -265,5 +408,6 @@ def generate_datasets(fixed_locations, variable_locations,
             print(f"Generated: {filename}")
             
 # ---------- RUN ----------
-generate_datasets(FIXED_LOCATIONS, VARIABLE_LOCATIONS)
+if __name__ == "__main__":
+    generate_datasets(FIXED_LOCATIONS, VARIABLE_LOCATIONS)
 
@@ -1,111 +1,46 @@
-from src.vrp_instance import VRPInstance
-from src.vrp_solution import VRPSolution
-from src.algorithm.exact_model import exact_model
-from src.algorithm.nearest_neighbour import nearest_neighbour
-from src.algorithm.two_opt import two_opt
-import folium as folium
-from folium.plugins import MarkerCluster
-import pickle
+from src.batch_runner import run_batch
+from src.instance_store import convert_folder
 from pathlib import Path
-import time
 import os
-import pandas as pd
-
-# Creamos una lista de diccionarios
-summary_results = []
 
 dataset_folder = Path('/Users/nataliaalvareztejero/Desktop/CLASE/MASTER/SEGUNDO/Truckster/Datos/TFM/datasets')
 results_folder = Path('/Users/nataliaalvareztejero/Desktop/CLASE/MASTER/SEGUNDO/Truckster/Datos/TFM/results/')
 csv_file = results_folder / 'solutions_metadata.csv'
-
-# Iterate over all pickle files in the folder
-for pkl_file in dataset_folder.glob('*.pkl'):
-    
-    print(f'Processing {pkl_file.name}')
-
-    # Load dataset
-    with open(pkl_file, 'rb') as f:
-        data = pickle.load(f)
-
-    # Create VRP instance
-    instance = VRPInstance(
-        locations=data['locations'],
-        distance_matrix=data['distance_matrix'],
-        time_matrix=data['time_matrix'],
-        charging_costs=data['chargin_cost'],  # verify spelling
-        cost_matrix=data['cost_matrix']
-    )
-    instance.plot_vrp_instance_default_icons(
-        save_path=os.path.join(dataset_folder, pkl_file.stem + '_instance.html')
+results_csv = Path('/Users/nataliaalvareztejero/Desktop/CLASE/MASTER/SEGUNDO/Truckster/Datos/TFM/resultados.csv')
+
+# Procesos para las heurísticas y máximo de modelos de Gurobi simultáneos
+WORKERS = os.cpu_count()
+GUROBI_WORKERS = 1
+GUROBI_THREADS = None  # None = todos los hilos que decida Gurobi
+WARM_START = True      # arrancar Gurobi desde la solución de nearest_neighbour + two_opt
+INSTRUMENT = False     # contadores, tiempos por fase y pico de memoria en resultados.csv
+PROFILE = False        # guardar un .prof de cProfile por trabajo
+RENDER = True          # mapas HTML en segundo plano; False para ejecuciones sin mapas
+RESUME = True          # saltar los trabajos que ya están en resultados.csv (con su solución guardada)
+
+
+if __name__ == '__main__':
+    # Pasamos los .pkl al formato binario (.vrp, matrices mapeadas en memoria); solo si han cambiado
+    instances = convert_folder(dataset_folder)
+
+    # Resolvemos cada (instancia, algoritmo) en paralelo; las filas vuelven en orden determinista.
+    # Cada fila se añade a resultados.csv en cuanto termina su trabajo, así que si la ejecución se
+    # interrumpe, al relanzarla solo se resuelve lo que falta
+    summary_results = run_batch(
+        instances,
+        results_folder,
+        workers=WORKERS,
+        gurobi_workers=GUROBI_WORKERS,
+        gurobi_threads=GUROBI_THREADS,
+        warm_start=WARM_START,
+        instrument=INSTRUMENT,
+        profile=PROFILE,
+        render=RENDER,
+        results_csv=results_csv,
+        resume=RESUME,
     )
 
-    # Solve using exact_model and measure execution time
-    start_time = time.perf_counter()
-    solution = exact_model(instance)
-    exec_time = time.perf_counter() - start_time
-
-    # Si no hay solución, saltar esta instancia para Gurobi
-    if solution is None:
-        print(f"Gurobi no encontró solución factible para {pkl_file.stem}.")
-    else:
-        solution.execution_time = exec_time
-        solution.save(
-            filepath=os.path.join(results_folder, 'gurobi', pkl_file.stem + '_solution.pkl')
-        )
-        solution.plot_vrp_solution(
-            save_path=os.path.join(results_folder, 'gurobi', pkl_file.stem + '_solution.html')
-        )
-        summary_results.append({
-            'instance_name': pkl_file.stem,
-            'algorithm': 'gurobi',
-            'execution_time': exec_time,
-            'cost': solution.total_cost
-        })
-
-
-    # Solve using nearest_neighbour and measure execution time        
-    start_time = time.perf_counter()
-    solution = nearest_neighbour(instance)
-    exec_time = time.perf_counter() - start_time
-
-    # Save solution pickle
-    solution.execution_time = exec_time
-    solution.save(
-        filepath = os.path.join(results_folder, 'nearest_neighbour', pkl_file.stem + '_solution.pkl')
-        )
-    solution.plot_vrp_solution(save_path=os.path.join(results_folder, 'nearest_neighbour', pkl_file.stem + '_solution.html'))
-
-
-    summary_results.append({
-        'instance_name': pkl_file.stem,
-        'algorithm': 'nearest_neighbour',
-        'execution_time': exec_time,
-        'cost': solution.total_cost
-    })
-
-    # Solve using 2-opt and measure execution time        
-    start_time = time.perf_counter()
-    solution = two_opt(solution)
-    exec_time = time.perf_counter() - start_time
-
-    # Save solution pickle
-    solution.execution_time = exec_time
-    solution.save(
-        filepath = os.path.join(results_folder, 'two_opt', pkl_file.stem + '_solution.pkl')
-        )
-    solution.plot_vrp_solution(save_path=os.path.join(results_folder, 'two_opt', pkl_file.stem + '_solution.html'))
-
-    summary_results.append({
-        'instance_name': pkl_file.stem,
-        'algorithm': 'two_opt',
-        'execution_time': exec_time,
-        'cost': solution.total_cost
-    })
-
-
-# Convertimos a DataFrame
-df = pd.DataFrame(summary_results)
-print(df)
-df.to_csv("/Users/nataliaalvareztejero/Desktop/CLASE/MASTER/SEGUNDO/Truckster/Datos/TFM/resultados.csv", index=False, encoding="utf-8")
-
-
+    # Convertimos a DataFrame
+    import pandas as pd
+    df = pd.DataFrame(summary_results)
+    print(df)
@@ -0,0 +1,141 @@
+"""
+Command-line entry point.
+
+    python -m src solve datasets/ -a nearest_neighbour two_opt -o results --no-render
+    python -m src solve datasets/dataset_size25_1.pkl -a gurobi --warm-start --csv resultados.csv
+    python -m src solve datasets/ -a two_opt alns --no-render
+    python -m src convert datasets/
+    python -m src serve --preload datasets/ --port 8765
+
+Only the standard library, NumPy and the heuristics are imported up front;
+folium, gurobipy, highspy and pandas are loaded when rendering, an exact
+model or the table output are actually requested.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from src.batch_runner import ALGORITHMS, OPTIONAL_ALGORITHMS, run_batch
+from src.instance_store import INSTANCE_SUFFIX, convert_folder, convert_pickle, is_instance_dir
+from src.server import BATCH_WINDOW, DEFAULT_HOST, DEFAULT_PORT, serve as run_server
+
+DEFAULT_PATTERN = 'dataset_*'
+
+
+def instance_paths(paths, pattern=DEFAULT_PATTERN):
+    """
+    Expand files and folders into the instances to solve, sorted by name.
+
+    A folder contributes its <pattern>.pkl pickles and <pattern>.vrp binary
+    instances; when both exist for the same instance the binary one is used.
+    """
+    found = {}
+    for path in map(Path, paths):
+        if path.is_dir() and not is_instance_dir(path):
+            candidates = sorted(path.glob(pattern + '.pkl')) + sorted(path.glob(pattern + INSTANCE_SUFFIX))
+        else:
+            candidates = [path]
+        for candidate in candidates:
+            if candidate.stem not in found or candidate.suffix == INSTANCE_SUFFIX:
+                found[candidate.stem] = candidate
+    return sorted(found.values())
+
+
+def solve(args):
+    paths = instance_paths(args.datasets, args.pattern)
+    if not paths:
+        print('No instances found')
+        return 1
+    if args.convert:
+        paths = [path if is_instance_dir(path) else convert_pickle(path) for path in paths]
+
+    csv_file = args.csv or args.output / 'resultados.csv'
+    start = time.perf_counter()
+    rows = run_batch(
+        paths,
+        args.output,
+        algorithms=args.algorithms,
+        workers=args.workers,
+        gurobi_workers=args.gurobi_workers,
+        gurobi_threads=args.gurobi_threads,
+        render=not args.no_render,
+        warm_start=args.warm_start,
+        instrument=args.instrument,
+        profile=args.profile,
+        results_csv=csv_file,
+        resume=not args.restart,
+    )
+    print(f'{len(rows)} solutions in {time.perf_counter() - start:.2f} s')
+    print(f'Results saved to {csv_file}')
+
+    if args.table:
+        import pandas as pd  # only for the table output
+        print(pd.DataFrame(rows).to_string(index=False))
+    return 0
+
+
+def convert(args):
+    for folder in args.folders:
+        for path in convert_folder(folder, args.output, args.overwrite):
+            print(path)
+    return 0
+
+
+def serve(args):
+    run_server(instance_paths(args.preload, args.pattern) if args.preload else (), args.host, args.port,
+               workers=args.workers, exact_workers=args.gurobi_workers, batch_window=args.batch_window)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m src', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    solve_parser = commands.add_parser('solve', help='solve instances with one or more algorithms')
+    solve_parser.add_argument('datasets', nargs='+', type=Path,
+                              help='dataset pickles, .vrp instance folders or folders containing them')
+    solve_parser.add_argument('-a', '--algorithms', nargs='+', default=list(ALGORITHMS),
+                              choices=ALGORITHMS + OPTIONAL_ALGORITHMS)
+    solve_parser.add_argument('-o', '--output', type=Path, default=Path('results'),
+                              help='results folder (one sub-folder per algorithm)')
+    solve_parser.add_argument('--csv', type=Path,
+                              help='summary CSV, written as jobs finish (default <output>/resultados.csv)')
+    solve_parser.add_argument('--restart', action='store_true',
+                              help='solve everything again instead of skipping the jobs already in the CSV')
+    solve_parser.add_argument('--pattern', default=DEFAULT_PATTERN, help='instance name pattern inside folders')
+    solve_parser.add_argument('--workers', type=int, help='heuristic processes (default: CPUs, 0 = serial)')
+    solve_parser.add_argument('--gurobi-workers', type=int, default=1, help='concurrent MIP jobs')
+    solve_parser.add_argument('--gurobi-threads', type=int, help='threads per MIP job')
+    solve_parser.add_argument('--warm-start', action='store_true', help='start the MIP from two_opt(NN)')
+    solve_parser.add_argument('--no-render', action='store_true', help='do not write the HTML maps')
+    solve_parser.add_argument('--convert', action='store_true', help='convert pickles to .vrp before solving')
+    solve_parser.add_argument('--instrument', action='store_true', help='add counters, phases and memory')
+    solve_parser.add_argument('--profile', action='store_true', help='write a cProfile .prof per job')
+    solve_parser.add_argument('--table', action='store_true', help='print the results table (pandas)')
+    solve_parser.set_defaults(run=solve)
+
+    convert_parser = commands.add_parser('convert', help='convert dataset pickles to .vrp instances')
+    convert_parser.add_argument('folders', nargs='+', type=Path)
+    convert_parser.add_argument('-o', '--output', type=Path, help='target folder (default: next to the pickles)')
+    convert_parser.add_argument('--overwrite', action='store_true')
+    convert_parser.set_defaults(run=convert)
+
+    serve_parser = commands.add_parser('serve', help='run the local solve server (src/server.py)')
+    serve_parser.add_argument('--preload', nargs='+', type=Path, help='instances or folders to load at start')
+    serve_parser.add_argument('--pattern', default=DEFAULT_PATTERN, help='instance name pattern inside folders')
+    serve_parser.add_argument('--host', default=DEFAULT_HOST)
+    serve_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument('--workers', type=int, help='heuristic processes (default: CPUs, 0 = threads)')
+    serve_parser.add_argument('--gurobi-workers', type=int, default=1, help='concurrent MIP solves')
+    serve_parser.add_argument('--batch-window', type=float, default=BATCH_WINDOW,
+                              help='seconds to collect small requests into one batch (0 = no waiting)')
+    serve_parser.set_defaults(run=serve)
+
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
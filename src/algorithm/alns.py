@@ -0,0 +1,435 @@
+import math
+import time
+import numpy as np
+from src.vrp_instance import LOADING, UNLOADING
+from src.vrp_solution import VRPSolution
+from src.route_cache import RouteCache, route_key
+from src.algorithm.nearest_neighbour import nearest_neighbour
+from src.algorithm.two_opt import two_opt
+from src.algorithm.split import split, MAX_ROUTE_LENGTH, MAX_TIME_PER_ROUTE
+from src.algorithm.route_state import EPSILON
+from src.algorithm.local_search import _best_insertion
+
+# Presupuesto de tiempo por defecto (segundos) y número máximo de vehículos (como exact_model)
+TIME_LIMIT = 10.0
+MAX_VEHICLES = 20
+
+# Pesos adaptativos (Ropke y Pisinger, 2006)
+SEGMENT_LENGTH = 100          # iteraciones entre actualizaciones de los pesos
+REACTION = 0.1                # inercia de los pesos
+SCORES = (33.0, 9.0, 13.0)    # nuevo mejor global, mejora la actual, peor pero aceptada
+
+# Recocido simulado: al inicio una solución un 5% peor se acepta con probabilidad 0.5
+START_WORSENING = 0.05
+FINAL_TEMPERATURE_RATIO = 1e-3
+
+# Tamaño de la destrucción: entre el 5% y el 30% de los nodos, como mucho 40
+REMOVAL_FRACTION = (0.05, 0.3)
+MAX_REMOVED = 40
+WORST_RANDOMNESS = 3          # sesgo hacia los nodos más caros en worst removal
+SHAW_RANDOMNESS = 6           # sesgo hacia los nodos más cercanos en Shaw removal
+
+# Memoria máxima de la caché de rutas ya evaluadas
+ROUTE_CACHE_BYTES = 64 * 2**20
+_ROUTE_ARRAYS = 10            # arrays por arco que guarda cada _Route, para estimar su memoria
+
+
+class _Context:
+    """Matrices de la instancia, mejor charger por arco y límites por ruta."""
+
+    def __init__(self, instance, max_route_length, max_time_per_route, max_vehicles):
+        self.instance = instance
+        self.C, self.D, self.T = instance.cost, instance.distance, instance.time
+        self.parking = int(instance.parking_ids[0])
+        self.codes = instance.node_codes
+        self.max_route_length = np.inf if max_route_length is None else max_route_length
+        self.max_time_per_route = np.inf if max_time_per_route is None else max_time_per_route
+        self.max_vehicles = max_vehicles
+
+        self.EF, self.EC, self.ED, self.ET = instance.best_chargers()
+        self.routes = RouteCache(ROUTE_CACHE_BYTES)
+
+    def route(self, loadings, unloadings):
+        """
+        _Route de esa secuencia. Destruir y reparar vuelve a generar a menudo
+        rutas ya vistas, así que se guardan en una caché LRU por secuencia.
+        """
+        key = route_key(loadings + unloadings)
+        route = self.routes.get(key)
+        if route is None:
+            route = _Route(self, loadings, unloadings)
+            self.routes.put(key, route, _ROUTE_ARRAYS * 8 * (len(key) // 8 + 2))
+        return route
+
+
+class _Route:
+    """
+    Ruta de la ALNS: loadings y unloadings en orden, sin el charger.
+
+    El charger se coloca siempre en el arco con menor desvío más coste de
+    carga. Para cada arco se guarda el mínimo de ese extra en los arcos
+    anteriores y posteriores, de modo que el coste de insertar un nodo en
+    cualquier posición se evalúa en O(1) (vectorizado sobre posiciones y
+    nodos).
+    """
+
+    def __init__(self, ctx, loadings, unloadings):
+        self.loadings = loadings
+        self.unloadings = unloadings
+        seq = np.array([ctx.parking] + loadings + unloadings + [ctx.parking], dtype=np.intp)
+        a, b = seq[:-1], seq[1:]
+        self.seq, self.a, self.b = seq, a, b
+        self.base_cost = float(ctx.C[a, b].sum())
+        self.base_distance = float(ctx.D[a, b].sum())
+        self.base_time = float(ctx.T[a, b].sum())
+
+        ec = ctx.EC[a, b]
+        self.ed, self.et = ctx.ED[a, b], ctx.ET[a, b]
+        self.charger_arc = int(ec.argmin())
+        if loadings or unloadings:
+            self.cost = self.base_cost + float(ec[self.charger_arc])
+        else:
+            self.cost = 0.0   # ruta vacía: todavía no existe
+        self.distance = self.base_distance + float(self.ed[self.charger_arc])
+        self.time = self.base_time + float(self.et[self.charger_arc])
+
+        # Extra del charger si se queda en un arco que la inserción no toca:
+        # el mínimo de los arcos anteriores o posteriores a cada arco
+        prefix, prefix_arg = _running_argmin(ec)
+        suffix, suffix_arg = _running_argmin(ec[::-1])
+        m = len(ec)
+        pre = np.concatenate(([np.inf], prefix[:-1]))
+        pre_arg = np.concatenate(([0], prefix_arg[:-1]))
+        suf = np.concatenate((suffix[::-1][1:], [np.inf]))
+        suf_arg = np.concatenate(((m - 1 - suffix_arg[::-1])[1:], [0]))
+        keep_arg = np.where(pre <= suf, pre_arg, suf_arg)
+        self.keep_cost = np.minimum(pre, suf)
+        self.keep_distance, self.keep_time = self.ed[keep_arg], self.et[keep_arg]
+
+    @property
+    def customers(self):
+        return self.loadings + self.unloadings
+
+    def insertion_costs(self, ctx, nodes, is_loading):
+        """
+        Mejor inserción factible de cada nodo en la ruta, con el charger en
+        el arco que resulte más barato tras la inserción.
+
+        Retorna:
+            tuple: (delta de coste, arco de inserción), arrays de len(nodes);
+            delta = inf si no hay posición factible.
+        """
+        a, b = self.a, self.b
+        u = nodes[:, None]
+
+        # El charger se queda en un arco no tocado o pasa a uno de los dos nuevos
+        ec_in, ec_out = ctx.EC[a, u], ctx.EC[u, b]
+        first = ec_in <= ec_out
+        extra_cost = np.where(first, ec_in, ec_out)
+        extra_dist = np.where(first, ctx.ED[a, u], ctx.ED[u, b])
+        extra_time = np.where(first, ctx.ET[a, u], ctx.ET[u, b])
+        keep = self.keep_cost <= extra_cost
+        extra_cost = np.where(keep, self.keep_cost, extra_cost)
+        extra_dist = np.where(keep, self.keep_distance, extra_dist)
+        extra_time = np.where(keep, self.keep_time, extra_time)
+
+        n_loadings = len(self.loadings)
+        arcs = np.arange(len(a))
+        legal = np.where(is_loading[:, None], arcs <= n_loadings, arcs >= n_loadings)
+        return _best_insertion(ctx.instance, a, b, nodes, legal,
+                               (self.base_cost, self.base_distance, self.base_time),
+                               (ctx.max_route_length, ctx.max_time_per_route),
+                               (extra_cost, extra_dist, extra_time), self.cost)
+
+    def insert(self, ctx, node, arc):
+        """Nueva ruta con node insertado en el arco arc."""
+        n_loadings = len(self.loadings)
+        if ctx.codes[node] == LOADING:
+            loadings = self.loadings[:arc] + [node] + self.loadings[arc:]
+            return ctx.route(loadings, self.unloadings)
+        k = arc - n_loadings
+        return ctx.route(self.loadings, self.unloadings[:k] + [node] + self.unloadings[k:])
+
+    def without(self, ctx, removed):
+        """Nueva ruta sin los nodos de removed (set)."""
+        return ctx.route([u for u in self.loadings if u not in removed],
+                      [u for u in self.unloadings if u not in removed])
+
+    def route_ids(self, ctx):
+        """Ids de la ruta completa, con el charger en su arco."""
+        k = self.charger_arc
+        charger = int(ctx.EF[self.seq[k], self.seq[k + 1]])
+        ids = self.seq.tolist()
+        if charger >= 0:
+            ids.insert(k + 1, charger)
+        return ids
+
+
+def _running_argmin(values):
+    """Mínimo acumulado y la posición donde se alcanza."""
+    minimum = np.minimum.accumulate(values)
+    arg = np.maximum.accumulate(np.where(values <= minimum, np.arange(len(values)), 0))
+    return minimum, arg
+
+
+def alns(instance, time_limit=TIME_LIMIT, initial_solution=None,
+         max_route_length=MAX_ROUTE_LENGTH, max_time_per_route=MAX_TIME_PER_ROUTE,
+         max_vehicles=MAX_VEHICLES, seed=None, max_iterations=None, metrics=None, budget=None):
+    """
+    Adaptive Large Neighbourhood Search para el EVRP.
+
+    En cada iteración un operador de destrucción (aleatorio, worst-cost o
+    Shaw por cercanía) retira q loadings/unloadings y uno de reparación
+    (inserción greedy o regret-2/regret-3) los vuelve a insertar en la
+    posición factible más barata: loadings antes que unloadings, un charger
+    por ruta colocado en el arco de menor desvío más coste de carga, y los
+    límites de batería y tiempo por ruta. La elección de operadores usa
+    pesos adaptativos (ruleta) y la aceptación es de recocido simulado con
+    una temperatura que baja con el tiempo consumido.
+
+    Parámetros:
+        instance (VRPInstance): La instancia del VRP.
+        time_limit (float): Presupuesto de tiempo (segundos de reloj).
+        initial_solution (VRPSolution | None): Solución de partida; por
+            defecto split(two_opt(nearest_neighbour)).
+        max_route_length (float | None): Distancia máxima por ruta (km).
+        max_time_per_route (float | None): Tiempo máximo por ruta (minutos).
+        max_vehicles (int): Número máximo de rutas.
+        seed (int | None): Semilla del generador aleatorio.
+        max_iterations (int | None): Límite de iteraciones además del de tiempo.
+        metrics (Metrics | None): Si se indica, cuenta iteraciones, soluciones
+            aceptadas, nuevas mejores, reparaciones imposibles y aciertos y
+            fallos de la caché de rutas.
+        budget (AnytimeBudget | None): Si se indica, recibe cada nueva mejor
+            solución, y la búsqueda se detiene cuando vence su plazo o se
+            cancela (además de time_limit).
+
+    Retorna:
+        VRPSolution: La mejor solución encontrada.
+    """
+    start = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    ctx = _Context(instance, max_route_length, max_time_per_route, max_vehicles)
+
+    if initial_solution is None:
+        initial_solution = split(two_opt(nearest_neighbour(instance)), max_route_length, max_time_per_route)
+    current = _routes_from_solution(ctx, initial_solution)
+    current_cost = sum(route.cost for route in current)
+    best, best_cost, time_to_best = current, current_cost, time.perf_counter() - start
+
+    destroy_operators = (_random_removal, _worst_removal, _shaw_removal)
+    repair_operators = (_greedy_insertion, _regret_insertion(2), _regret_insertion(3))
+    weights = [np.ones(len(destroy_operators)), np.ones(len(repair_operators))]
+    scores = [np.zeros(len(destroy_operators)), np.zeros(len(repair_operators))]
+    uses = [np.zeros(len(destroy_operators)), np.zeros(len(repair_operators))]
+
+    n_customers = len(instance.loading_ids) + len(instance.unloading_ids)
+    q_min = max(1, int(REMOVAL_FRACTION[0] * n_customers))
+    q_max = max(q_min, min(MAX_REMOVED, int(REMOVAL_FRACTION[1] * n_customers)))
+    start_temperature = -START_WORSENING * current_cost / math.log(0.5)
+
+    iteration = 0
+    while n_customers:
+        elapsed = time.perf_counter() - start
+        if elapsed >= time_limit or (max_iterations is not None and iteration >= max_iterations):
+            break
+        if budget is not None and budget.expired():
+            break
+        iteration += 1
+        temperature = start_temperature * FINAL_TEMPERATURE_RATIO ** (elapsed / time_limit)
+
+        d = _roulette(rng, weights[0])
+        r = _roulette(rng, weights[1])
+        routes = list(current)
+        removed = destroy_operators[d](ctx, routes, int(rng.integers(q_min, q_max + 1)), rng)
+        if not repair_operators[r](ctx, routes, removed, rng):
+            if metrics is not None:
+                metrics.count('repairs_failed')
+            continue
+
+        cost = sum(route.cost for route in routes)
+        accepted, score = True, 0.0
+        if cost < best_cost - EPSILON:
+            best, best_cost, time_to_best = routes, cost, time.perf_counter() - start
+            score = SCORES[0]
+            if metrics is not None:
+                metrics.count('new_best')
+            if budget is not None:
+                budget.improved(_to_solution(ctx, best), 'alns')
+        elif cost < current_cost - EPSILON:
+            score = SCORES[1]
+        elif cost > current_cost + EPSILON:
+            accepted = rng.random() < math.exp(-(cost - current_cost) / temperature)
+            score = SCORES[2] if accepted else 0.0
+        if accepted:
+            current, current_cost = routes, cost
+            if metrics is not None:
+                metrics.count('accepted')
+
+        for k, op in ((0, d), (1, r)):
+            scores[k][op] += score
+            uses[k][op] += 1
+        if iteration % SEGMENT_LENGTH == 0:
+            for k in range(2):
+                used = uses[k] > 0
+                weights[k][used] = ((1 - REACTION) * weights[k][used]
+                                    + REACTION * scores[k][used] / uses[k][used])
+                weights[k] = np.maximum(weights[k], 1e-3)
+                scores[k][:] = 0
+                uses[k][:] = 0
+
+    if metrics is not None:
+        metrics.count('iterations', iteration)
+        metrics.count('route_profile_hits', ctx.routes.hits)
+        metrics.count('route_profile_misses', ctx.routes.misses)
+
+    solution = _to_solution(ctx, best)
+    solution.solver_stats['iterations'] = iteration
+    solution.solver_stats['time_to_best'] = time_to_best
+    return solution
+
+
+def _routes_from_solution(ctx, solution):
+    """Rutas de la ALNS (sin parkings ni chargers) a partir de una VRPSolution."""
+    routes = []
+    for ids in solution.route_ids:
+        codes = ctx.codes[ids]
+        loadings = [int(i) for i in ids[codes == LOADING]]
+        unloadings = [int(i) for i in ids[codes == UNLOADING]]
+        if loadings or unloadings:
+            routes.append(ctx.route(loadings, unloadings))
+    return routes
+
+
+def _to_solution(ctx, routes):
+    solution = VRPSolution(ctx.instance)
+    for route in routes:
+        solution.add_route(route.route_ids(ctx))
+    solution.complete_feasibility()
+    return solution
+
+
+def _roulette(rng, weights):
+    return int(rng.choice(len(weights), p=weights / weights.sum()))
+
+
+# ---------------------------
+# Destrucción
+# ---------------------------
+def _remove(ctx, routes, removed):
+    """Quita de routes (en el sitio) los nodos de removed y descarta las rutas vacías."""
+    removed_set = set(removed)
+    routes[:] = [route if not removed_set.intersection(route.customers) else route.without(ctx, removed_set)
+                 for route in routes]
+    routes[:] = [route for route in routes if route.loadings or route.unloadings]
+    return removed
+
+
+def _random_removal(ctx, routes, q, rng):
+    customers = [u for route in routes for u in route.customers]
+    chosen = rng.choice(len(customers), size=min(q, len(customers)), replace=False)
+    return _remove(ctx, routes, [customers[k] for k in chosen])
+
+
+def _worst_removal(ctx, routes, q, rng):
+    """Retira los nodos cuyo desvío (arcos de entrada y salida) es más caro, con sesgo aleatorio."""
+    customers, savings = [], []
+    for route in routes:
+        seq, C = route.seq, ctx.C
+        customers += route.customers
+        savings.append(C[seq[:-2], seq[1:-1]] + C[seq[1:-1], seq[2:]] - C[seq[:-2], seq[2:]])
+    order = [customers[k] for k in np.argsort(-np.concatenate(savings))]
+    return _remove(ctx, routes, _biased_pick(rng, order, q, WORST_RANDOMNESS))
+
+
+def _shaw_removal(ctx, routes, q, rng):
+    """Retira nodos cercanos entre sí: cada uno es de los más próximos a otro ya retirado."""
+    remaining = [u for route in routes for u in route.customers]
+    removed = [remaining.pop(int(rng.integers(len(remaining))))]
+    while len(removed) < q and remaining:
+        reference = removed[int(rng.integers(len(removed)))]
+        order = np.argsort(ctx.D[reference, remaining])
+        k = order[int(rng.random() ** SHAW_RANDOMNESS * len(remaining))]
+        removed.append(remaining.pop(int(k)))
+    return _remove(ctx, routes, removed)
+
+
+def _biased_pick(rng, order, q, randomness):
+    """q elementos de order, favoreciendo los primeros (y^randomness)."""
+    order = list(order)
+    picked = []
+    while len(picked) < q and order:
+        picked.append(order.pop(int(rng.random() ** randomness * len(order))))
+    return picked
+
+
+# ---------------------------
+# Reparación
+# ---------------------------
+def _insertion_table(ctx, routes, nodes, is_loading):
+    """Coste y arco de la mejor inserción de cada nodo en cada ruta, más una ruta nueva vacía."""
+    columns = routes + [ctx.route([], [])]
+    costs = np.empty((len(nodes), len(columns)))
+    arcs = np.empty((len(nodes), len(columns)), dtype=np.intp)
+    for k, route in enumerate(columns):
+        costs[:, k], arcs[:, k] = route.insertion_costs(ctx, nodes, is_loading)
+    if len(routes) >= ctx.max_vehicles:
+        costs[:, -1] = np.inf
+    return columns, costs, arcs
+
+
+def _repair(ctx, routes, removed, choose):
+    """
+    Inserta los nodos de removed uno a uno; choose(costs) elige la fila del
+    siguiente nodo. Tras cada inserción solo se recalcula la columna de la
+    ruta modificada. Devuelve False si algún nodo no cabe en ninguna ruta.
+    """
+    nodes = np.array(removed, dtype=np.intp)
+    is_loading = ctx.codes[nodes] == LOADING
+    columns, costs, arcs = _insertion_table(ctx, routes, nodes, is_loading)
+    pending = np.ones(len(nodes), dtype=bool)
+
+    for _ in range(len(nodes)):
+        row = choose(np.where(pending[:, None], costs, np.inf), pending)
+        k = int(costs[row].argmin())
+        if not pending[row] or not np.isfinite(costs[row, k]):
+            return False
+        pending[row] = False
+        columns[k] = columns[k].insert(ctx, int(nodes[row]), int(arcs[row, k]))
+        costs[:, k], arcs[:, k] = columns[k].insertion_costs(ctx, nodes, is_loading)
+
+        if k == len(columns) - 1:   # se ha abierto una ruta nueva
+            columns.append(ctx.route([], []))
+            new_costs, new_arcs = columns[-1].insertion_costs(ctx, nodes, is_loading)
+            if len(columns) - 1 >= ctx.max_vehicles:
+                new_costs[:] = np.inf
+            costs = np.column_stack((costs, new_costs))
+            arcs = np.column_stack((arcs, new_arcs))
+
+    routes[:] = [route for route in columns if route.loadings or route.unloadings]
+    return True
+
+
+def _greedy_insertion(ctx, routes, removed, rng):
+    """Inserta primero el nodo con la inserción más barata."""
+    return _repair(ctx, routes, removed,
+                   lambda costs, pending: int(np.where(pending, costs.min(axis=1), np.inf).argmin()))
+
+
+def _regret_insertion(k):
+    """
+    Inserción regret-k: inserta primero el nodo que más perdería si no se
+    coloca ahora (suma de diferencias entre su mejor ruta y las k-1 siguientes).
+    """
+    def choose(costs, pending):
+        best = np.sort(costs, axis=1)[:, :k]
+        finite = np.where(np.isfinite(best), best, 1e12)
+        regret = (finite[:, 1:] - finite[:, :1]).sum(axis=1)
+        regret = np.where(pending, regret - 1e-6 * finite[:, 0], -np.inf)  # empate: la más barata
+        return int(regret.argmax())
+
+    def regret_insertion(ctx, routes, removed, rng):
+        return _repair(ctx, routes, removed, choose)
+
+    regret_insertion.__name__ = f'_regret{k}_insertion'
+    return regret_insertion
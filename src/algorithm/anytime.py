@@ -0,0 +1,276 @@
+import queue
+import threading
+import time
+from typing import NamedTuple
+
+from src.vrp_solution import VRPSolution
+from src.algorithm.nearest_neighbour import nearest_neighbour
+from src.algorithm.two_opt import two_opt
+from src.algorithm.split import split, MAX_ROUTE_LENGTH, MAX_TIME_PER_ROUTE
+from src.algorithm.local_search import local_search
+
+# Presupuesto por defecto (segundos)
+TIME_LIMIT = 10.0
+ANYTIME_ALGORITHMS = ('nearest_neighbour', 'two_opt', 'local_search', 'alns', 'multi_start', 'gurobi', 'highs')
+# Tiempo estimado de construcción, carga y presolve del modelo exacto: fijo más
+# uno por variable x (segundos); el presolve no se interrumpe al vencer el time_limit
+MIP_SETUP_TIME = 0.1
+MIP_SETUP_TIME_PER_VARIABLE = 1e-5
+# Vehículos del modelo exacto si no se indica n_vehicles
+MIP_VEHICLES = 20
+
+
+class Incumbent(NamedTuple):
+    """
+    Una mejora entregada por la resolución anytime.
+
+    Atributos:
+        elapsed (float): Segundos desde el inicio del presupuesto.
+        cost (float): Coste total de la solución.
+        feasible (bool): Completa y dentro de los límites por ruta.
+        source (str): Algoritmo que la ha encontrado.
+        solution (VRPSolution): La solución.
+    """
+    elapsed: float
+    cost: float
+    feasible: bool
+    source: str
+    solution: VRPSolution
+
+
+class AnytimeBudget:
+    """
+    Plazo, cancelación y mejor solución de una resolución anytime.
+
+    Los algoritmos que aceptan un parámetro budget (two_opt, local_search,
+    alns, multi_start, exact_model, exact_model_highs) le entregan sus
+    soluciones con improved() y consultan expired() para detenerse. Una
+    solución solo se registra si mejora a la mejor hasta el momento: una
+    factible (completa y dentro de los límites de batería y jornada) gana
+    siempre a una que no lo es y, a igualdad, gana la más barata.
+
+    Se puede cancelar desde otro hilo con cancel(); la mejor solución sigue
+    disponible en best.
+
+    Atributos:
+        start (float): Instante de inicio (time.perf_counter()).
+        deadline (float | None): Instante límite, o None sin plazo.
+        best (Incumbent | None): Mejor solución hasta el momento.
+        history (list of Incumbent): Todas las mejoras, en orden.
+    """
+
+    def __init__(self, time_limit=None, on_improvement=None,
+                 max_route_length=MAX_ROUTE_LENGTH, max_time_per_route=MAX_TIME_PER_ROUTE):
+        self.start = time.perf_counter()
+        self.deadline = None if time_limit is None else self.start + time_limit
+        self.on_improvement = on_improvement
+        self.max_route_length = max_route_length
+        self.max_time_per_route = max_time_per_route
+        self.best = None
+        self.history = []
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        """Pide a los algoritmos que se detengan lo antes posible."""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def remaining(self):
+        """Segundos hasta el plazo (0 si ha vencido o se ha cancelado), o None sin plazo."""
+        if self.cancelled:
+            return 0.0
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.perf_counter(), 0.0)
+
+    def expired(self):
+        """True si ha vencido el plazo o se ha cancelado."""
+        return self.cancelled or (self.deadline is not None and time.perf_counter() >= self.deadline)
+
+    def feasible(self, solution):
+        """Completa y dentro de los límites por ruta."""
+        return bool(
+            solution.complete_feasibility_flag
+            and (self.max_route_length is None
+                 or all(d <= self.max_route_length + 1e-6 for d in solution.route_distance))
+            and (self.max_time_per_route is None
+                 or all(t <= self.max_time_per_route + 1e-6 for t in solution.route_time))
+        )
+
+    def improved(self, solution, source):
+        """
+        Registra solution si mejora a la mejor y avisa a on_improvement.
+
+        Retorna:
+            bool: True si se ha registrado como nueva mejor.
+        """
+        if solution is None:
+            return False
+        feasible = self.feasible(solution)
+        with self._lock:
+            if self.best is not None and (not feasible, solution.total_cost) >= (not self.best.feasible,
+                                                                                 self.best.cost):
+                return False
+            incumbent = Incumbent(self.elapsed(), solution.total_cost, feasible, source, solution)
+            self.best = incumbent
+            self.history.append(incumbent)
+        if self.on_improvement is not None:
+            self.on_improvement(incumbent)
+        return True
+
+
+def solve_anytime(instance, algorithm='alns', time_limit=TIME_LIMIT, on_improvement=None, budget=None,
+                  **kwargs):
+    """
+    Resuelve una instancia con un plazo, entregando cada mejora.
+
+    Siempre se empieza por nearest_neighbour (milisegundos), de modo que
+    haya una respuesta casi inmediata, y después:
+      - two_opt: 2-opt con una entrega por pasada.
+      - local_search: 2-opt, split y búsqueda local entre rutas.
+      - alns: 2-opt y split como solución inicial de la ALNS durante el
+        tiempo restante.
+      - multi_start: arranques múltiples durante el tiempo restante.
+      - gurobi / highs: el modelo exacto arrancado desde 2-opt y split
+        (dentro de los límites del modelo), con una entrega por incumbente
+        del solver. Su construcción y presolve no se pueden interrumpir, así
+        que se descuentan del plazo (ver _mip_setup_time) y el modelo no se
+        construye si el tiempo restante no los cubre.
+    Cada paso solo se inicia si queda presupuesto, y cada algoritmo se
+    detiene en cuanto vence el plazo o se cancela.
+
+    Parámetros:
+        instance (VRPInstance): La instancia del VRP.
+        algorithm (str): Uno de ANYTIME_ALGORITHMS.
+        time_limit (float | None): Plazo en segundos (None = sin plazo; las
+            búsquedas con tiempo, alns y multi_start, usan entonces su
+            presupuesto por defecto).
+        on_improvement (callable | None): Recibe cada Incumbent, en el hilo
+            que resuelve.
+        budget (AnytimeBudget | None): Presupuesto ya creado (por ejemplo,
+            para cancelarlo desde otro hilo); sustituye a time_limit y
+            on_improvement.
+        **kwargs: Parámetros extra del último algoritmo.
+
+    Retorna:
+        VRPSolution | None: La mejor solución encontrada.
+    """
+    if algorithm not in ANYTIME_ALGORITHMS:
+        raise ValueError(f"Unknown algorithm {algorithm!r}, expected one of {ANYTIME_ALGORITHMS}")
+    if budget is None:
+        budget = AnytimeBudget(time_limit, on_improvement)
+
+    def remaining(default):
+        left = budget.remaining()
+        return default if left is None else left
+
+    solution = nearest_neighbour(instance)
+    budget.improved(solution, 'nearest_neighbour')
+
+    if algorithm != 'nearest_neighbour' and not budget.expired():
+        solution = two_opt(solution, budget=budget)
+        budget.improved(solution, 'two_opt')
+
+    if algorithm in ('local_search', 'alns', 'gurobi', 'highs') and not budget.expired():
+        solution = split(solution)
+        budget.improved(solution, 'split')
+        if algorithm == 'local_search' and not budget.expired():
+            solution = local_search(solution, MAX_ROUTE_LENGTH, MAX_TIME_PER_ROUTE, budget=budget, **kwargs)
+            budget.improved(solution, 'local_search')
+        elif algorithm == 'alns' and not budget.expired():
+            from src.algorithm.alns import alns, TIME_LIMIT as ALNS_TIME_LIMIT
+            solution = alns(instance, time_limit=remaining(ALNS_TIME_LIMIT), initial_solution=solution,
+                            budget=budget, **kwargs)
+            budget.improved(solution, 'alns')
+        elif algorithm in ('gurobi', 'highs') and not budget.expired():
+            setup, left = _mip_setup_time(instance, kwargs.get('n_vehicles', MIP_VEHICLES)), budget.remaining()
+            if left is None or left > setup:
+                if algorithm == 'gurobi':
+                    from src.algorithm.exact_model import exact_model  # gurobipy only when requested
+                    solver = lambda **args: exact_model(instance, batched=True, **args)
+                else:
+                    from src.algorithm.highs_model import exact_model_highs  # highspy only when requested
+                    solver = lambda **args: exact_model_highs(instance, **args)
+                limit = {} if left is None else {'time_limit': left - setup}
+                budget.improved(solver(initial_solution=solution, budget=budget, **limit, **kwargs), algorithm)
+
+    elif algorithm == 'multi_start' and not budget.expired():
+        from src.algorithm.multi_start import multi_start, TIME_LIMIT as MULTI_START_TIME_LIMIT
+        solution = multi_start(instance, time_limit=remaining(MULTI_START_TIME_LIMIT), budget=budget, **kwargs)
+        budget.improved(solution, 'multi_start')
+
+    return budget.best.solution if budget.best is not None else None
+
+
+def _mip_setup_time(instance, n_vehicles):
+    """Segundos estimados para construir, cargar y presolver el modelo exacto."""
+    return MIP_SETUP_TIME + MIP_SETUP_TIME_PER_VARIABLE * n_vehicles * (len(instance.names) + 1) ** 2
+
+
+def iter_anytime(instance, algorithm='alns', time_limit=TIME_LIMIT, budget=None, **kwargs):
+    """
+    Versión generador de solve_anytime: produce cada Incumbent en cuanto se
+    encuentra.
+
+    La resolución corre en un hilo aparte. Cerrar el generador (break,
+    close() o salir del bloque que lo consume) cancela el presupuesto y
+    espera a que el algoritmo se detenga; la mejor solución queda en la
+    última mejora recibida (o en budget.best).
+
+    Uso:
+        for incumbent in iter_anytime(instance, 'alns', time_limit=2.0):
+            print(incumbent.elapsed, incumbent.cost, incumbent.source)
+            if incumbent.feasible and incumbent.cost < objetivo:
+                break
+
+    Parámetros:
+        instance (VRPInstance): La instancia del VRP.
+        algorithm (str): Uno de ANYTIME_ALGORITHMS.
+        time_limit (float | None): Plazo en segundos.
+        budget (AnytimeBudget | None): Presupuesto ya creado, para poder
+            cancelarlo desde fuera; su on_improvement se sigue llamando.
+        **kwargs: Parámetros extra del último algoritmo (ver solve_anytime).
+
+    Produce:
+        Incumbent: Cada nueva mejor solución, con su instante.
+    """
+    if budget is None:
+        budget = AnytimeBudget(time_limit)
+    incumbents = queue.Queue()
+    finished = object()
+    callback = budget.on_improvement
+
+    def on_improvement(incumbent):
+        if callback is not None:
+            callback(incumbent)
+        incumbents.put(incumbent)
+
+    def run():
+        try:
+            solve_anytime(instance, algorithm, budget=budget, **kwargs)
+        except BaseException as exc:
+            incumbents.put(exc)
+        finally:
+            incumbents.put(finished)
+
+    budget.on_improvement = on_improvement
+    thread = threading.Thread(target=run, name=f'anytime-{algorithm}', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = incumbents.get()
+            if item is finished:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        budget.cancel()
+        thread.join()
@@ -1,20 +1,50 @@
+import time
+import numpy as np
+import scipy.sparse as sp
 import gurobipy as gp
 from gurobipy import GRB
 from src.vrp_instance import VRPInstance
-from src.vrp_solution import VRPSolution
+from src.instrumentation import phase
+from src.algorithm.milp_model import (build_exact_model, solution_from_arrival_times, mip_start_arrays,
+                                      warn_violated_start)
 
-def exact_model(vrp: VRPInstance, max_time_per_route=15*60, M=1e5, epsilon = 1e-6):
+def exact_model(vrp: VRPInstance, max_time_per_route=15*60, M=1e5, epsilon = 1e-6, threads=None,
+                initial_solution=None, batched=False, metrics=None, time_limit=900, n_vehicles=20,
+                budget=None):
     """
     Solve VRP using Gurobi and return a VRPSolution object.
     Uses tuple-key matrices (i,j) consistent with VRPInstance.
+
+    threads: optional limit on the number of Gurobi threads (None = Gurobi default).
+    initial_solution: optional VRPSolution (e.g. nearest_neighbour + two_opt)
+        used as MIP start for x, z and t.
+
+    batched: load the array-built formulation (build_exact_model) through
+        gurobipy's matrix API instead of adding constraint by constraint.
+
+    The time at which the first incumbent was found, the model build time and
+    the optimize() time are stored in solution.solver_stats
+    ('time_to_first_incumbent', 'build_time', 'optimize_time', in seconds).
+
+    metrics: optional Metrics that receives the build, solve and extract
+        phase timings and the node, simplex iteration and solution counts.
+
+    time_limit: Gurobi TimeLimit in seconds (15 minutes by default).
+    n_vehicles: number of vehicles (routes) of the model.
+
+    budget: optional AnytimeBudget. Every new incumbent is turned into a
+        VRPSolution and passed to it from the Gurobi callback, the time
+        limit is capped to the budget's remaining time, and optimize() is
+        terminated as soon as the budget expires or is cancelled; the best
+        incumbent so far is then returned as usual. If the budget expires
+        while the model is built, optimize() is not called and None is
+        returned.
     """
     # -----------------------------
     # Sets
     # -----------------------------
     
-    max_time_per_route=15*60
-    L=1e5
-    epsilon = 1e-6
+    L = M  # big-M of the time propagation constraints
     base_parking = vrp.parkings[0]
     ficticius_end_base_parking = 'FICT_END_' + base_parking
     dic_names = {i:i for i in vrp.get_location_names()} 
@@ -24,7 +54,7 @@ def exact_model(vrp: VRPInstance, max_time_per_route=15*60, M=1e5, epsilon = 1e-
     F = vrp.chargers
     N = vrp.loadings + vrp.unloadings
     P = vrp.parkings + [ficticius_end_base_parking]
-    M = range(20) #vehículos
+    M = range(n_vehicles) #vehículos
 
     if not P:
         raise ValueError("At least one parking location must exist")
@@ -32,6 +62,148 @@ def exact_model(vrp: VRPInstance, max_time_per_route=15*60, M=1e5, epsilon = 1e-
     # -----------------------------
     # Create model
     # -----------------------------
+    build_start = time.perf_counter()
+    if batched:
+        model, x, z, t = _build_model_batched(vrp, len(M), max_time_per_route, L, epsilon)
+    else:
+        model, x, z, t = _build_model(vrp, V, F, N, P, M, base_parking, ficticius_end_base_parking,
+                                      dic_names, max_time_per_route, L, epsilon)
+    model.update()
+    build_time = time.perf_counter() - build_start
+    print(f"Model build time: {build_time:.2f} s")
+    if budget is not None and budget.expired():
+        print("Time budget spent while building the model, optimize() not started.")
+        return None
+
+    # Limitar el tiempo de ejecución (15 minutos por defecto, o lo que quede del presupuesto)
+    if budget is not None and budget.remaining() is not None:
+        time_limit = min(time_limit, budget.remaining())
+    model.Params.TimeLimit = time_limit
+    if threads is not None:
+        model.Params.Threads = threads
+
+    # Arranque en caliente a partir de una solución heurística
+    if initial_solution is not None:
+        x0, z0, t0 = mip_start_arrays(vrp, initial_solution, n_vehicles=len(M),
+                                      max_time_per_route=max_time_per_route)
+        if batched:
+            x.Start, z.Start, t.Start = x0.ravel(), z0.ravel(), t0.ravel()
+            start = np.zeros(model._milp.num_vars)
+            start[model._index.x], start[model._index.z], start[model._index.t] = x0, z0, t0
+            warn_violated_start(model._milp, start)
+        else:
+            pos = {name: k for k, name in enumerate(V)}
+            model.setAttr("Start", list(x.values()), [x0[m, pos[i], pos[j]] for m, i, j in x.keys()])
+            model.setAttr("Start", list(z.values()), [z0[m, k] for m in M for k in range(len(F))])
+            model.setAttr("Start", list(t.values()), [t0[m, pos[i]] for m, i in t.keys()])
+
+    # Registrar el instante de la primera solución entera y, con budget, entregar cada incumbente
+    first_incumbent = []
+    t_vars = t if batched else [t[m, i] for m in M for i in V]
+
+    def incumbent_callback(model, where):
+        if where == GRB.Callback.MIPSOL:
+            if not first_incumbent:
+                first_incumbent.append(model.cbGet(GRB.Callback.RUNTIME))
+            if budget is not None:
+                arrival_times = np.reshape(model.cbGetSolution(t_vars), (len(M), len(V)))
+                budget.improved(solution_from_arrival_times(vrp, V, arrival_times), 'gurobi')
+        if budget is not None and budget.expired():
+            model.terminate()
+
+    optimize_start = time.perf_counter()
+    model.optimize(incumbent_callback)
+    optimize_time = time.perf_counter() - optimize_start
+    print(f"Optimize time: {optimize_time:.2f} s")
+    if metrics is not None:
+        metrics.timings['build'] = metrics.timings.get('build', 0.0) + build_time
+        metrics.timings['solve'] = metrics.timings.get('solve', 0.0) + optimize_time
+        metrics.count('nodes', int(model.NodeCount))
+        metrics.count('simplex_iterations', int(model.IterCount))
+        metrics.count('solutions_found', int(model.SolCount))
+    if first_incumbent:
+        print(f"Time to first incumbent: {first_incumbent[0]:.2f} s")
+
+    # -----------------------------
+    # Print solution variables
+    # -----------------------------
+    # if model.status == GRB.OPTIMAL:
+    #     print(f"Objective value: {model.objVal:.2f}\n")
+    # 
+    #     eps = 1e-6
+    # z
+    #     # Imprimir arcos seleccionados
+    #     print("Selected arcs (x[i,j] = 1):")
+    #     for i in V:
+    #         for j in V:
+    #             if i != j and x[i,j].x is not None and x[i,j].x > eps:
+    #                 print(f"x[{i},{j}] = {x[i,j].x:.2f}")
+    # 
+    #     # Imprimir arcos seleccionados
+    #     print("Selected cahrger:")
+    #     for i in F:
+    #         if z[i].x > eps:
+    #             print(f"z[{i}] = {z[i].x:.2f}")
+    # 
+    #     # Crear lista de (nombre, tiempo) y ordenar
+    #     arrival_times = [(i, t[i].x) for i in V if t[i].x is not None and t[i].x > 0]
+    #     arrival_times.sort(key=lambda tup: tup[1])  # orden creciente
+    # 
+    #     # Imprimir tiempos ordenados
+    #     print("\nArrival times (sorted):")
+    #     for loc, time in arrival_times:
+    #         print(f"t[{loc}] = {time:.2f} min")
+    #
+    #    else:
+    #        print("No optimal solution found")
+    #        print("Status:", model.status, "SolCount:", model.SolCount)
+
+
+    status = model.Status
+
+    # Caso 1: modelo infactible
+    if status == GRB.INFEASIBLE:
+        print("Model infeasible")
+        # Opcional: depurar IIS
+        # model.computeIIS()
+        # model.write("model.ilp")
+        # model.write("model.ilp.iis")
+        return None
+
+    # Caso 2: ha llegado a límite de tiempo o se ha interrumpido (presupuesto vencido o cancelado)
+    elif status in (GRB.TIME_LIMIT, GRB.INTERRUPTED):
+        reason = "Time limit reached" if status == GRB.TIME_LIMIT else "Interrupted"
+        if model.SolCount == 0:
+            # No hay ninguna solución que leer
+            print(f"{reason} and no feasible solution found.")
+            return None
+        else:
+            print(f"{reason}, using best incumbent solution.")
+
+    # A partir de aquí, asumimos que hay una solución disponible:
+    #  - OPTIMAL
+    #  - SUBOPTIMAL
+    #  - TIME_LIMIT o INTERRUPTED con SolCount > 0
+    if status in [GRB.OPTIMAL, GRB.SUBOPTIMAL, GRB.TIME_LIMIT, GRB.INTERRUPTED]:
+        with phase(metrics, 'extract'):
+            if batched:
+                arrival_times = t.X.reshape(len(M), len(V))
+            else:
+                arrival_times = [[t[m, i].X for i in V] for m in M]
+            solution = solution_from_arrival_times(vrp, V, arrival_times)
+        solution.solver_stats['time_to_first_incumbent'] = first_incumbent[0] if first_incumbent else None
+        solution.solver_stats['build_time'] = build_time
+        solution.solver_stats['optimize_time'] = optimize_time
+        return solution
+
+    # Caso 3: otros estados sin solución legible
+    print(f"Model ended with status = {status}, no solution to read.")
+    return None
+
+
+def _build_model(vrp, V, F, N, P, M, base_parking, ficticius_end_base_parking, dic_names,
+                 max_time_per_route, L, epsilon):
+    """Build the Gurobi model constraint by constraint over the location names."""
     model = gp.Model("VRP")
 
     # Variables
@@ -173,97 +345,38 @@ def exact_model(vrp: VRPInstance, max_time_per_route=15*60, M=1e5, epsilon = 1e-
             ) <= max_route_length,
             name=f"battery_limit_{m}"
         )
-            
-    # Limitar el tiempo de ejecución a 15 minutos (900 segundos)
-    model.Params.TimeLimit = 900
-    model.update()
-    model.optimize()
 
-    # -----------------------------
-    # Print solution variables
-    # -----------------------------
-    # if model.status == GRB.OPTIMAL:
-    #     print(f"Objective value: {model.objVal:.2f}\n")
-    # 
-    #     eps = 1e-6
-    # z
-    #     # Imprimir arcos seleccionados
-    #     print("Selected arcs (x[i,j] = 1):")
-    #     for i in V:
-    #         for j in V:
-    #             if i != j and x[i,j].x is not None and x[i,j].x > eps:
-    #                 print(f"x[{i},{j}] = {x[i,j].x:.2f}")
-    # 
-    #     # Imprimir arcos seleccionados
-    #     print("Selected cahrger:")
-    #     for i in F:
-    #         if z[i].x > eps:
-    #             print(f"z[{i}] = {z[i].x:.2f}")
-    # 
-    #     # Crear lista de (nombre, tiempo) y ordenar
-    #     arrival_times = [(i, t[i].x) for i in V if t[i].x is not None and t[i].x > 0]
-    #     arrival_times.sort(key=lambda tup: tup[1])  # orden creciente
-    # 
-    #     # Imprimir tiempos ordenados
-    #     print("\nArrival times (sorted):")
-    #     for loc, time in arrival_times:
-    #         print(f"t[{loc}] = {time:.2f} min")
-    #
-    #    else:
-    #        print("No optimal solution found")
-    #        print("Status:", model.status, "SolCount:", model.SolCount)
+    return model, x, z, t
 
 
-    status = model.Status
+def _build_model_batched(vrp, n_vehicles, max_time_per_route, L, epsilon, max_route_length=400.0):
+    """
+    Build the same Gurobi model from the solver-neutral MILPModel.
 
-    # Caso 1: modelo infactible
-    if status == GRB.INFEASIBLE:
-        print("Model infeasible")
-        # Opcional: depurar IIS
-        # model.computeIIS()
-        # model.write("model.ilp")
-        # model.write("model.ilp.iis")
-        return None
+    The formulation is generated with array operations by build_exact_model
+    and loaded in one block: a single MVar for all the columns and one
+    sparse addMConstr call per constraint sense, instead of one Python
+    expression per constraint. Model node k is instance id k, plus the
+    fictitious end parking as last node.
+    """
+    milp, index = build_exact_model(vrp, n_vehicles=n_vehicles, max_time_per_route=max_time_per_route,
+                                    L=L, epsilon=epsilon, max_route_length=max_route_length)
 
-    # Caso 2: ha llegado a límite de tiempo
-    elif status == GRB.TIME_LIMIT:
-        if model.SolCount == 0:
-            # No hay ninguna solución que leer
-            print("Time limit reached and no feasible solution found.")
-            return None
-        else:
-            print("Time limit reached, using best incumbent solution.")
+    model = gp.Model("VRP")
+    vtype = np.where(milp.integer, GRB.INTEGER, GRB.CONTINUOUS)
+    v = model.addMVar(milp.num_vars, lb=milp.col_lower, ub=milp.col_upper, vtype=vtype)
+    model.setObjective(milp.obj @ v, GRB.MINIMIZE)
 
-    # A partir de aquí, asumimos que hay una solución disponible:
-    #  - OPTIMAL
-    #  - SUBOPTIMAL
-    #  - TIME_LIMIT con SolCount > 0
-    if status in [GRB.OPTIMAL, GRB.SUBOPTIMAL, GRB.TIME_LIMIT]:
-        solution = VRPSolution(vrp)
-        start_parking = vrp.parkings[0]
-
-        for m in M:
-            arrival_times_m = [
-                (i, t[m, i].X)
-                for i in V
-                if t[m, i].X > 1e-6
-            ]
-            arrival_times_m.sort(key=lambda tup: tup[1])
-
-            if not arrival_times_m:
-                continue
-
-            route_m = [start_parking]
-            for node, tau in arrival_times_m[:-1]:
-                if tau > 0 or vrp.is_type(node, 'parking'):
-                    route_m.append(node)
-            route_m.append(start_parking)
-
-            solution.add_route(route_m)
-
-        solution.complete_feasibility()
-        return solution
+    start, cols, vals = milp.to_csr()
+    A = sp.csr_matrix((vals, cols, start), shape=(milp.num_rows, milp.num_vars))
+    A.eliminate_zeros()
+    lower, upper = milp.row_lower, milp.row_upper
+    equal = lower == upper
+    for sense, rows, rhs in ((GRB.EQUAL, equal, lower),
+                             (GRB.LESS_EQUAL, ~equal & np.isfinite(upper), upper),
+                             (GRB.GREATER_EQUAL, ~equal & np.isfinite(lower), lower)):
+        if rows.any():
+            model.addMConstr(A[rows], v, sense, rhs[rows])
 
-    # Caso 3: otros estados sin solución legible
-    print(f"Model ended with status = {status}, no solution to read.")
-    return None
+    model._milp, model._index = milp, index   # to check a MIP start against the rows
+    return model, v[index.x.ravel()], v[index.z.ravel()], v[index.t.ravel()]
@@ -0,0 +1,142 @@
+import time
+import numpy as np
+import highspy
+from src.vrp_instance import VRPInstance
+from src.instrumentation import phase
+from src.algorithm.milp_model import (build_exact_model, solution_from_arrival_times, mip_start_arrays,
+                                      warn_violated_start)
+
+
+def solve_highs(model, time_limit=900, threads=None, output=True, start=None, stats=None,
+                on_incumbent=None, interrupt=None):
+    """
+    Solve a MILPModel with the open-source HiGHS solver.
+
+    start: optional array of column values used as MIP start.
+    stats: optional dict that receives 'time_to_first_incumbent' (seconds).
+    on_incumbent: optional callable receiving the column values of every
+        improving MIP solution.
+    interrupt: optional callable; the MIP search stops when it returns True.
+
+    Returns:
+        tuple: (status name, column values or None, objective value or None)
+    """
+    row_start, index, value = model.to_csr()
+
+    lp = highspy.HighsLp()
+    lp.num_col_ = model.num_vars
+    lp.num_row_ = model.num_rows
+    lp.col_cost_ = model.obj
+    lp.col_lower_ = model.col_lower
+    lp.col_upper_ = model.col_upper
+    lp.row_lower_ = model.row_lower
+    lp.row_upper_ = model.row_upper
+    lp.a_matrix_.format_ = highspy.MatrixFormat.kRowwise
+    lp.a_matrix_.start_ = row_start
+    lp.a_matrix_.index_ = index
+    lp.a_matrix_.value_ = value
+    lp.a_matrix_.num_col_ = model.num_vars
+    lp.a_matrix_.num_row_ = model.num_rows
+    lp.integrality_ = [highspy.HighsVarType.kInteger if is_int else highspy.HighsVarType.kContinuous
+                       for is_int in model.integer]
+
+    h = highspy.Highs()
+    h.setOptionValue("output_flag", output)
+    h.setOptionValue("time_limit", float(time_limit))
+    if threads is not None:
+        h.setOptionValue("threads", int(threads))
+    h.passModel(lp)
+    if start is not None:
+        solution = highspy.HighsSolution()
+        solution.col_value = list(start)
+        h.setSolution(solution)
+
+    first_incumbent = []
+
+    def incumbent_callback(event):
+        if not first_incumbent:
+            first_incumbent.append(h.getRunTime())
+        if on_incumbent is not None:
+            on_incumbent(np.array(event.data_out.mip_solution))
+
+    def interrupt_callback(event):
+        if interrupt():
+            event.interrupt()
+
+    h.cbMipImprovingSolution.subscribe(incumbent_callback)
+    if interrupt is not None:
+        h.cbMipInterrupt.subscribe(interrupt_callback)
+    h.run()
+    if stats is not None:
+        stats['time_to_first_incumbent'] = first_incumbent[0] if first_incumbent else None
+
+    status = h.modelStatusToString(h.getModelStatus())
+    if h.getInfo().primal_solution_status != 2:   # 2 = feasible solution available
+        return status, None, None
+    return status, np.array(h.getSolution().col_value), h.getInfo().objective_function_value
+
+
+def exact_model_highs(vrp: VRPInstance, time_limit=900, threads=None, initial_solution=None,
+                      metrics=None, budget=None, **model_kwargs):
+    """
+    Solve the exact_model formulation with HiGHS and return a VRPSolution.
+
+    model_kwargs are passed to build_exact_model (n_vehicles,
+    max_time_per_route, max_route_length, ...). initial_solution is an
+    optional VRPSolution used as MIP start. Returns None if HiGHS finds no
+    feasible solution within the time limit. Model build and solve times are
+    stored in solution.solver_stats ('build_time', 'optimize_time'), and in
+    the build/solve/extract phases of metrics when given.
+
+    With an AnytimeBudget every improving solution is passed to it, the time
+    limit is capped to its remaining time and the search is interrupted when
+    it expires or is cancelled; if it expires while the model is built,
+    HiGHS is not started and None is returned.
+    """
+    build_start = time.perf_counter()
+    model, index = build_exact_model(vrp, **model_kwargs)
+    build_time = time.perf_counter() - build_start
+    if budget is not None and budget.expired():
+        print("Time budget spent while building the model, HiGHS not started.")
+        return None
+
+    start = None
+    if initial_solution is not None:
+        limits = {key: value for key, value in model_kwargs.items()
+                  if key in ('max_time_per_route', 'max_route_length')}
+        x0, z0, t0 = mip_start_arrays(vrp, initial_solution, n_vehicles=index.x.shape[0], **limits)
+        start = np.zeros(model.num_vars)
+        start[index.x] = x0
+        start[index.z] = z0
+        start[index.t] = t0
+        warn_violated_start(model, start)
+
+    on_incumbent = interrupt = None
+    if budget is not None:
+        if budget.remaining() is not None:
+            time_limit = min(time_limit, budget.remaining())
+        on_incumbent = lambda values: budget.improved(
+            solution_from_arrival_times(vrp, index.V, values[index.t]), 'highs')
+        interrupt = budget.expired
+
+    stats = {}
+    optimize_start = time.perf_counter()
+    status, values, objective = solve_highs(model, time_limit=time_limit, threads=threads,
+                                            start=start, stats=stats, on_incumbent=on_incumbent,
+                                            interrupt=interrupt)
+    stats['build_time'] = build_time
+    stats['optimize_time'] = time.perf_counter() - optimize_start
+    if metrics is not None:
+        metrics.timings['build'] = metrics.timings.get('build', 0.0) + build_time
+        metrics.timings['solve'] = metrics.timings.get('solve', 0.0) + stats['optimize_time']
+
+    if values is None:
+        print(f"HiGHS ended with status = {status}, no solution to read.")
+        return None
+    if status == "Time limit reached":
+        print("Time limit reached, using best incumbent solution.")
+
+    with phase(metrics, 'extract'):
+        solution = solution_from_arrival_times(vrp, index.V, values[index.t])
+    solution.solver_stats.update(stats)
+    return solution
@@ -0,0 +1,200 @@
+import numpy as np
+from src.vrp_instance import LOADING, UNLOADING
+from src.vrp_solution import VRPSolution
+from src.algorithm.two_opt import two_opt
+from src.algorithm.split import _insert_best_charger, MAX_ROUTE_LENGTH, MAX_TIME_PER_ROUTE
+from src.algorithm.local_search import local_search, _reassign_charger, _Route, _within
+from src.algorithm.alns import MAX_VEHICLES
+
+
+def insert_orders(solution, names, max_route_length=MAX_ROUTE_LENGTH, max_time_per_route=MAX_TIME_PER_ROUTE,
+                  max_vehicles=MAX_VEHICLES, repair=True, between_routes=False):
+    """
+    Inserta nuevos loadings/unloadings en una solución sin resolver de nuevo.
+
+    Los nodos ya deben existir en la instancia (VRPInstance.add_location).
+    Se insertan uno a uno, primero el de inserción más barata, en la
+    posición factible de menor coste de las rutas existentes: un loading
+    nunca detrás de un unloading, un unloading nunca delante de un loading,
+    y dentro de los límites de distancia y tiempo por ruta. Si es más
+    barato (o no cabe en ninguna ruta) se abre una ruta nueva parking ->
+    nodo -> parking con su mejor charger, mientras no se supere
+    max_vehicles; un nodo que no cabe en ninguna parte va a una ruta propia
+    aunque esta supere los límites o max_vehicles. Tras cada inserción solo
+    se recalculan los costes de la ruta modificada.
+
+    Después, si repair=True, solo las rutas modificadas se reparan: se
+    recoloca su charger en el mejor arco y se les aplica 2-opt (y, con
+    between_routes=True, búsqueda local entre ellas); las demás se
+    conservan tal cual.
+
+    Parámetros:
+        solution (VRPSolution): Solución actual.
+        names (list of str): Nombres de los nuevos loadings/unloadings.
+        max_route_length (float | None): Distancia máxima por ruta (km).
+        max_time_per_route (float | None): Tiempo máximo por ruta (minutos).
+        max_vehicles (int): Número máximo de rutas.
+        repair (bool): Reparar las rutas modificadas.
+        between_routes (bool): Incluir en la reparación la búsqueda local
+            entre las rutas modificadas (relocate, swap, 2-opt*,
+            cross-exchange); con rutas largas pasa de milisegundos a
+            decenas de milisegundos.
+
+    Retorna:
+        VRPSolution: Nueva solución; solver_stats incluye las rutas
+        modificadas y los nodos que no cabían dentro de los límites.
+    """
+    instance = solution.instance
+    nodes = _order_ids(instance, names)
+    visited = set(int(i) for ids in solution.route_ids for i in ids)
+    if visited.intersection(nodes.tolist()):
+        raise ValueError("Some of the orders are already in the solution")
+    limits = (max_route_length, max_time_per_route)
+    is_loading = instance.node_codes[nodes] == LOADING
+
+    routes = [_Route(instance, ids) for ids in solution.route_ids]
+    table = [route.insertion_costs(instance, nodes, is_loading, limits) for route in routes]
+    costs = np.column_stack([cost for cost, _ in table]) if table else np.empty((len(nodes), 0))
+    positions = np.column_stack([arc for _, arc in table]) if table else np.empty((len(nodes), 0), dtype=np.intp)
+    own_routes = [_own_route(instance, int(u)) for u in nodes]
+    own_costs = np.array([route.cost if _fits(route, limits) else np.inf for route in own_routes])
+
+    pending = np.ones(len(nodes), dtype=bool)
+    affected, forced = set(), 0
+    for _ in range(len(nodes)):
+        existing = np.where(pending[:, None], costs, np.inf)
+        opening = np.where(pending & (len(routes) < max_vehicles), own_costs, np.inf)
+        row, k = np.unravel_index(existing.argmin(), existing.shape) if existing.size else (0, 0)
+        if existing.size and existing[row, k] <= opening.min() and np.isfinite(existing[row, k]):
+            arc = int(positions[row, k])
+            ids = routes[k].ids
+            routes[k] = _Route(instance, np.concatenate((ids[:arc + 1], [nodes[row]], ids[arc + 1:])))
+            costs[:, k], positions[:, k] = routes[k].insertion_costs(instance, nodes, is_loading, limits)
+        else:
+            row = int(opening.argmin()) if np.isfinite(opening.min()) else int(np.flatnonzero(pending)[0])
+            forced += not np.isfinite(opening[row])
+            k = len(routes)
+            routes.append(own_routes[row])
+            new_costs, new_positions = routes[k].insertion_costs(instance, nodes, is_loading, limits)
+            costs = np.column_stack((costs, new_costs))
+            positions = np.column_stack((positions, new_positions))
+        pending[row] = False
+        affected.add(k)
+
+    new_solution = _merge(solution, [route.ids for route in routes], affected, limits, repair, between_routes)
+    new_solution.solver_stats.update(affected_routes=len(affected), over_limits=forced)
+    return new_solution
+
+
+def remove_orders(solution, names, max_route_length=MAX_ROUTE_LENGTH, max_time_per_route=MAX_TIME_PER_ROUTE,
+                  repair=True, between_routes=False):
+    """
+    Retira loadings/unloadings cancelados de la solución y de la instancia.
+
+    Cada nodo se quita de su ruta (las rutas que se quedan sin loadings ni
+    unloadings desaparecen) y, si repair=True, solo las rutas modificadas
+    se reparan. Después los nodos se eliminan de la instancia con
+    VRPInstance.remove_location, de modo que sus matrices y
+    all_loads_unloads_visited ya no los incluyen; como los ids posteriores
+    se desplazan, la solución de partida deja de ser válida para la
+    instancia y hay que usar la devuelta.
+
+    Parámetros:
+        solution (VRPSolution): Solución actual.
+        names (list of str): Nombres de los loadings/unloadings cancelados.
+        max_route_length (float | None): Distancia máxima por ruta (km).
+        max_time_per_route (float | None): Tiempo máximo por ruta (minutos).
+        repair (bool): Reparar las rutas modificadas.
+        between_routes (bool): Incluir la búsqueda local entre las rutas
+            modificadas (ver insert_orders).
+
+    Retorna:
+        VRPSolution: Nueva solución sobre la instancia ya reducida.
+    """
+    instance = solution.instance
+    removed = _order_ids(instance, names)
+    limits = (max_route_length, max_time_per_route)
+
+    routes, affected = [], set()
+    for ids in solution.route_ids:
+        keep = ~np.isin(ids, removed)
+        if keep.all():
+            routes.append(ids)
+            continue
+        ids = ids[keep]
+        codes = instance.node_codes[ids]
+        if ((codes == LOADING) | (codes == UNLOADING)).any():
+            affected.add(len(routes))
+            routes.append(ids)
+    new_routes = _merge(solution, routes, affected, limits, repair, between_routes).route_ids
+
+    for k in np.sort(removed)[::-1]:
+        instance.remove_location(instance.names[k])
+    removed = np.sort(removed)
+    new_solution = VRPSolution(instance)
+    for ids in new_routes:
+        new_solution.add_route(ids - np.searchsorted(removed, ids))
+    new_solution.complete_feasibility()
+    new_solution.solver_stats['affected_routes'] = len(affected)
+    return new_solution
+
+
+# ---------------------------
+# Utilidades
+# ---------------------------
+def _order_ids(instance, names):
+    """Ids de los nodos; solo loadings y unloadings son pedidos."""
+    ids = instance.route_to_ids(list(names))
+    codes = instance.node_codes[ids]
+    if not ((codes == LOADING) | (codes == UNLOADING)).all():
+        raise ValueError("Only loadings and unloadings can be inserted or removed")
+    return ids
+
+
+def _own_route(instance, node):
+    """Ruta parking -> nodo -> parking con su mejor charger."""
+    parking = int(instance.parking_ids[0])
+    ids = [parking, node, parking]
+    _insert_best_charger(instance, ids)
+    return _Route(instance, ids)
+
+
+def _fits(route, limits):
+    return bool(_within(limits[0], route.distance) and _within(limits[1], route.time))
+
+
+def _best_charger_routes(instance, routes, limits):
+    """Rutas (ids) con el mejor charger en el mejor arco de cada una (reasignación de local_search)."""
+    routes = [_Route(instance, ids) for ids in routes]
+    while _reassign_charger(instance, routes, limits):
+        pass
+    return [route.ids for route in routes]
+
+
+def _repair_routes(instance, routes, limits, between_routes):
+    """
+    Reparación local de unas pocas rutas: el mejor charger de cada una,
+    2-opt dentro de cada ruta y, si between_routes, búsqueda local entre ellas.
+    """
+    sub = VRPSolution(instance)
+    for ids in _best_charger_routes(instance, routes, limits):
+        sub.add_route(ids)
+    sub = two_opt(sub)
+    if between_routes and len(sub.route_ids) > 1:
+        sub = local_search(sub, *limits)
+    return _best_charger_routes(instance, sub.route_ids, limits)
+
+
+def _merge(solution, routes, affected, limits, repair, between_routes):
+    """Solución con las rutas no afectadas tal cual y las afectadas reparadas."""
+    changed = [routes[k] for k in sorted(affected)]
+    if repair and changed:
+        changed = _repair_routes(solution.instance, changed, limits, between_routes)
+    new_solution = VRPSolution(solution.instance)
+    for k, ids in enumerate(routes):
+        if k not in affected:
+            new_solution.add_route(ids)
+    for ids in changed:
+        new_solution.add_route(ids)
+    new_solution.complete_feasibility()
+    return new_solution
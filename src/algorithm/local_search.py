@@ -0,0 +1,423 @@
+import numpy as np
+from src.vrp_instance import LOADING, UNLOADING, CHARGER
+from src.vrp_solution import VRPSolution
+from src.algorithm.route_state import EPSILON, prefix_sum
+from src.algorithm.split import MAX_ROUTE_LENGTH, MAX_TIME_PER_ROUTE
+
+# Longitud máxima de los segmentos que intercambia cross-exchange
+MAX_SEGMENT_LENGTH = 3
+
+
+class _Route:
+    """
+    Perfil de una ruta para la búsqueda local entre rutas.
+
+    Guarda los ids y sus conteos prefijo de loadings, unloadings y chargers,
+    y las sumas prefijo de coste, distancia y tiempo de los arcos, de modo
+    que cualquier segmento se evalúa en O(1).
+    """
+
+    def __init__(self, instance, ids):
+        self.ids = np.asarray(ids, dtype=np.intp)
+        codes = instance.node_codes[self.ids]
+        self.loadings = prefix_sum(codes == LOADING)
+        self.unloadings = prefix_sum(codes == UNLOADING)
+        self.chargers = prefix_sum(codes == CHARGER)
+        frm, to = self.ids[:-1], self.ids[1:]
+        self.cost_cum = prefix_sum(instance.cost[frm, to])
+        self.distance_cum = prefix_sum(instance.distance[frm, to])
+        self.time_cum = prefix_sum(instance.time[frm, to])
+        self.charge = float(instance.charging_cost_array[frm].sum())
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def customers(self):
+        return int(self.loadings[-1] + self.unloadings[-1])
+
+    @property
+    def cost(self):
+        return float(self.cost_cum[-1]) + self.charge
+
+    @property
+    def distance(self):
+        return float(self.distance_cum[-1])
+
+    @property
+    def time(self):
+        return float(self.time_cum[-1])
+
+    def insertion_costs(self, instance, nodes, is_loading, limits):
+        """
+        Mejor inserción factible de cada nodo en la ruta: un loading nunca
+        detrás de un unloading y un unloading nunca delante de un loading.
+
+        Retorna:
+            tuple: (delta de coste, arco de inserción), arrays de len(nodes);
+            delta = inf si no hay posición factible.
+        """
+        # El nuevo nodo queda en la posición arc+1: loadings[arc+1] nodos por delante
+        before = np.arange(1, len(self.ids))
+        legal = np.where(is_loading[:, None],
+                         self.unloadings[before] == 0,
+                         self.loadings[-1] - self.loadings[before] == 0)
+        return _best_insertion(instance, self.ids[:-1], self.ids[1:], nodes, legal,
+                               (self.cost, self.distance, self.time), limits)
+
+
+def local_search(solution, max_route_length=MAX_ROUTE_LENGTH, max_time_per_route=MAX_TIME_PER_ROUTE,
+                 max_segment_length=MAX_SEGMENT_LENGTH, budget=None):
+    """
+    Búsqueda local entre rutas sobre una solución VRP.
+
+    Aplica, con estrategia de primera mejora y hasta alcanzar un óptimo
+    local, los movimientos:
+      - reasignación del charger: cambiar el charger de una ruta por el de
+        menor desvío más coste de carga, en el mejor arco
+      - relocate: mover un loading/unloading a otra ruta
+      - swap: intercambiar dos loadings/unloadings de rutas distintas
+      - 2-opt*: intercambiar las colas de dos rutas
+      - cross-exchange: intercambiar segmentos de hasta max_segment_length nodos
+
+    Cada movimiento se evalúa con el delta de los arcos afectados y su
+    legalidad (loadings antes que unloadings, un solo charger por ruta) con
+    conteos prefijo, sin reconstruir las rutas. Las rutas que se quedan sin
+    loadings ni unloadings se eliminan.
+
+    Parámetros:
+        solution (VRPSolution): Solución inicial.
+        max_route_length (float | None): Límite de distancia por ruta (km);
+            por defecto el de split. None = sin límite.
+        max_time_per_route (float | None): Límite de tiempo por ruta
+            (minutos); por defecto el de split. None = sin límite.
+        max_segment_length (int): Longitud máxima de los segmentos de cross-exchange.
+        budget (AnytimeBudget | None): Si se indica, recibe la solución tras
+            cada movimiento de mejora, y la búsqueda se detiene cuando vence
+            su plazo o se cancela.
+
+    Retorna:
+        VRPSolution: Nueva solución mejorada.
+    """
+    instance = solution.instance
+    limits = (max_route_length, max_time_per_route)
+    routes = [_Route(instance, ids) for ids in solution.route_ids]
+
+    moves = (
+        _reassign_charger,
+        _relocate,
+        _swap,
+        _two_opt_star,
+        lambda inst, rts, lim: _cross_exchange(inst, rts, lim, max_segment_length),
+    )
+    improved = True
+    while improved and not (budget is not None and budget.expired()):
+        improved = False
+        for move in moves:
+            if move(instance, routes, limits):
+                improved = True
+                break
+        if improved and budget is not None:
+            budget.improved(_to_solution(instance, routes), 'local_search')
+
+    return _to_solution(instance, routes)
+
+
+# ---------------------------
+# Movimientos
+# ---------------------------
+def _reassign_charger(instance, routes, limits):
+    """
+    Aplica la primera reasignación de charger que mejora una ruta.
+
+    Con la tabla del mejor charger por arco de la instancia
+    (best_chargers), el mejor par (charger, arco) de una ruta sin su
+    charger se obtiene con un recorrido vectorizado de sus arcos.
+    Retorna True si la encuentra.
+    """
+    chargers, extra_cost, extra_distance, extra_time = instance.best_chargers()
+    codes = instance.node_codes
+    for a, A in enumerate(routes):
+        if A.chargers[-1] != 1:
+            continue
+        ids = A.ids[codes[A.ids] != CHARGER]
+        frm, to = ids[:-1], ids[1:]
+        costs = (float(instance.cost[frm, to].sum()) + float(instance.charging_cost_array[frm].sum())
+                 + extra_cost[frm, to])
+        legal = _within(limits[0], float(instance.distance[frm, to].sum()) + extra_distance[frm, to])
+        legal &= _within(limits[1], float(instance.time[frm, to].sum()) + extra_time[frm, to])
+        costs = np.where(legal, costs, np.inf)
+        k = int(costs.argmin())
+        if costs[k] < A.cost - EPSILON:
+            _replace(instance, routes, {a: np.insert(ids, k + 1, chargers[frm[k], to[k]])})
+            return True
+    return False
+
+
+def _relocate(instance, routes, limits):
+    """Aplica el primer relocate de mejora. Retorna True si lo encuentra."""
+    C, D, T = instance.cost, instance.distance, instance.time
+    codes = instance.node_codes
+    for a, A in enumerate(routes):
+        for p in range(1, len(A) - 1):
+            u = A.ids[p]
+            if codes[u] not in (LOADING, UNLOADING):
+                continue
+            prev, nxt = A.ids[p-1], A.ids[p+1]
+            if A.customers == 1:
+                # La ruta A desaparece
+                delta_a = -A.cost
+            else:
+                delta_a = C[prev, nxt] - C[prev, u] - C[u, nxt]
+
+            for b, B in enumerate(routes):
+                if b == a:
+                    continue
+                prevs, nexts = B.ids[:-1], B.ids[1:]
+                deltas = delta_a + C[prevs, u] + C[u, nexts] - C[prevs, nexts]
+
+                # Posiciones de inserción q = 1..n-1 (entre q-1 y q)
+                qs = np.arange(1, len(B))
+                if codes[u] == LOADING:
+                    legal = B.unloadings[qs] == 0
+                else:
+                    legal = B.loadings[-1] - B.loadings[qs] == 0
+                legal &= _within(limits[0], B.distance + D[prevs, u] + D[u, nexts] - D[prevs, nexts])
+                legal &= _within(limits[1], B.time + T[prevs, u] + T[u, nexts] - T[prevs, nexts])
+
+                candidates = legal & (deltas < -EPSILON)
+                if candidates.any():
+                    q = int(qs[candidates.argmax()])
+                    new_b = np.concatenate((B.ids[:q], [u], B.ids[q:]))
+                    new_a = np.delete(A.ids, p)
+                    _replace(instance, routes, {a: new_a, b: new_b})
+                    return True
+    return False
+
+
+def _swap(instance, routes, limits):
+    """Aplica el primer swap de mejora entre dos rutas. Retorna True si lo encuentra."""
+    C, D, T = instance.cost, instance.distance, instance.time
+    codes = instance.node_codes
+    for a, A in enumerate(routes):
+        for p in range(1, len(A) - 1):
+            u = A.ids[p]
+            if codes[u] not in (LOADING, UNLOADING):
+                continue
+            a_prev, a_next = A.ids[p-1], A.ids[p+1]
+
+            for b in range(a + 1, len(routes)):
+                B = routes[b]
+                qs = np.arange(1, len(B) - 1)
+                vs = B.ids[qs]
+                b_prev, b_next = B.ids[qs-1], B.ids[qs+1]
+                v_codes = codes[vs]
+
+                deltas = (C[a_prev, vs] + C[vs, a_next] - C[a_prev, u] - C[u, a_next]
+                          + C[b_prev, u] + C[u, b_next] - C[b_prev, vs] - C[vs, b_next])
+
+                # v en la posición p de A y u en la posición q de B
+                legal = (v_codes == LOADING) | (v_codes == UNLOADING)
+                legal &= (v_codes != LOADING) | (A.unloadings[p] == 0)
+                legal &= (v_codes != UNLOADING) | (A.loadings[-1] - A.loadings[p+1] == 0)
+                if codes[u] == LOADING:
+                    legal &= B.unloadings[qs] == 0
+                else:
+                    legal &= B.loadings[-1] - B.loadings[qs+1] == 0
+
+                legal &= _within(limits[0], A.distance + D[a_prev, vs] + D[vs, a_next]
+                                 - D[a_prev, u] - D[u, a_next])
+                legal &= _within(limits[0], B.distance + D[b_prev, u] + D[u, b_next]
+                                 - D[b_prev, vs] - D[vs, b_next])
+                legal &= _within(limits[1], A.time + T[a_prev, vs] + T[vs, a_next]
+                                 - T[a_prev, u] - T[u, a_next])
+                legal &= _within(limits[1], B.time + T[b_prev, u] + T[u, b_next]
+                                 - T[b_prev, vs] - T[vs, b_next])
+
+                candidates = legal & (deltas < -EPSILON)
+                if candidates.any():
+                    q = int(qs[candidates.argmax()])
+                    new_a, new_b = A.ids.copy(), B.ids.copy()
+                    new_a[p], new_b[q] = B.ids[q], u
+                    _replace(instance, routes, {a: new_a, b: new_b})
+                    return True
+    return False
+
+
+def _two_opt_star(instance, routes, limits):
+    """
+    Aplica el primer 2-opt* de mejora: A[:p+1] + B[q+1:] y B[:q+1] + A[p+1:].
+    Retorna True si lo encuentra.
+    """
+    C, D, T = instance.cost, instance.distance, instance.time
+    for a, A in enumerate(routes):
+        for b in range(a + 1, len(routes)):
+            B = routes[b]
+            qs = np.arange(0, len(B) - 1)
+            b_cut, b_tail = B.ids[qs], B.ids[qs+1]
+            b_tail_loadings = B.loadings[-1] - B.loadings[qs+1]
+            b_tail_customers = b_tail_loadings + B.unloadings[-1] - B.unloadings[qs+1]
+            b_head_customers = B.loadings[qs+1] + B.unloadings[qs+1]
+            b_tail_chargers = B.chargers[-1] - B.chargers[qs+1]
+
+            for p in range(0, len(A) - 1):
+                a_cut, a_tail = A.ids[p], A.ids[p+1]
+                deltas = C[a_cut, b_tail] + C[b_cut, a_tail] - C[a_cut, a_tail] - C[b_cut, b_tail]
+
+                # Cada ruta conserva su número de chargers
+                legal = A.chargers[p+1] + b_tail_chargers == A.chargers[-1]
+                legal &= B.chargers[qs+1] + (A.chargers[-1] - A.chargers[p+1]) == B.chargers[-1]
+                # Ningún loading después de un unloading
+                legal &= (A.unloadings[p+1] == 0) | (b_tail_loadings == 0)
+                legal &= (B.unloadings[qs+1] == 0) | (A.loadings[-1] - A.loadings[p+1] == 0)
+                # Ambas rutas conservan algún loading/unloading
+                a_tail_customers = A.customers - (A.loadings[p+1] + A.unloadings[p+1])
+                legal &= (A.customers - a_tail_customers + b_tail_customers) > 0
+                legal &= (b_head_customers + a_tail_customers) > 0
+
+                legal &= _within(limits[0], A.distance_cum[p] + D[a_cut, b_tail]
+                                 + B.distance - B.distance_cum[qs+1])
+                legal &= _within(limits[0], B.distance_cum[qs] + D[b_cut, a_tail]
+                                 + A.distance - A.distance_cum[p+1])
+                legal &= _within(limits[1], A.time_cum[p] + T[a_cut, b_tail]
+                                 + B.time - B.time_cum[qs+1])
+                legal &= _within(limits[1], B.time_cum[qs] + T[b_cut, a_tail]
+                                 + A.time - A.time_cum[p+1])
+
+                candidates = legal & (deltas < -EPSILON)
+                if candidates.any():
+                    q = int(qs[candidates.argmax()])
+                    new_a = np.concatenate((A.ids[:p+1], B.ids[q+1:]))
+                    new_b = np.concatenate((B.ids[:q+1], A.ids[p+1:]))
+                    _replace(instance, routes, {a: new_a, b: new_b})
+                    return True
+    return False
+
+
+def _cross_exchange(instance, routes, limits, max_segment_length):
+    """
+    Aplica el primer cross-exchange de mejora: intercambia A[p1..p2] y
+    B[q1..q2] conservando su orientación. Retorna True si lo encuentra.
+    """
+    C, D, T = instance.cost, instance.distance, instance.time
+    for a, A in enumerate(routes):
+        for b in range(a + 1, len(routes)):
+            B = routes[b]
+            for len_b in range(1, max_segment_length + 1):
+                q1 = np.arange(1, len(B) - len_b)
+                if not len(q1):
+                    continue
+                q2 = q1 + len_b - 1
+                b_prev, b_first, b_last, b_next = B.ids[q1-1], B.ids[q1], B.ids[q2], B.ids[q2+1]
+                seg_b_loadings = B.loadings[q2+1] - B.loadings[q1]
+                seg_b_unloadings = B.unloadings[q2+1] - B.unloadings[q1]
+                seg_b_chargers = B.chargers[q2+1] - B.chargers[q1]
+                seg_b_distance = B.distance_cum[q2] - B.distance_cum[q1]
+                seg_b_time = B.time_cum[q2] - B.time_cum[q1]
+
+                for p1 in range(1, len(A) - 1):
+                    for len_a in range(1, max_segment_length + 1):
+                        p2 = p1 + len_a - 1
+                        if p2 > len(A) - 2:
+                            break
+                        a_prev, a_first, a_last, a_next = A.ids[p1-1], A.ids[p1], A.ids[p2], A.ids[p2+1]
+                        seg_a_loadings = A.loadings[p2+1] - A.loadings[p1]
+                        seg_a_unloadings = A.unloadings[p2+1] - A.unloadings[p1]
+                        seg_a_chargers = A.chargers[p2+1] - A.chargers[p1]
+
+                        deltas = (C[a_prev, b_first] + C[b_last, a_next]
+                                  + C[b_prev, a_first] + C[a_last, b_next]
+                                  - C[a_prev, a_first] - C[a_last, a_next]
+                                  - C[b_prev, b_first] - C[b_last, b_next])
+
+                        legal = seg_b_chargers == seg_a_chargers
+                        # Segmento de B dentro de A
+                        legal &= (seg_b_loadings == 0) | (A.unloadings[p1] == 0)
+                        legal &= (seg_b_unloadings == 0) | (A.loadings[-1] - A.loadings[p2+1] == 0)
+                        # Segmento de A dentro de B
+                        if seg_a_loadings:
+                            legal &= B.unloadings[q1] == 0
+                        if seg_a_unloadings:
+                            legal &= B.loadings[-1] - B.loadings[q2+1] == 0
+                        # Ambas rutas conservan algún loading/unloading
+                        seg_a_customers = seg_a_loadings + seg_a_unloadings
+                        seg_b_customers = seg_b_loadings + seg_b_unloadings
+                        legal &= A.customers - seg_a_customers + seg_b_customers > 0
+                        legal &= B.customers - seg_b_customers + seg_a_customers > 0
+
+                        seg_a_distance = A.distance_cum[p2] - A.distance_cum[p1]
+                        seg_a_time = A.time_cum[p2] - A.time_cum[p1]
+                        legal &= _within(limits[0], A.distance - seg_a_distance + seg_b_distance
+                                         - D[a_prev, a_first] - D[a_last, a_next]
+                                         + D[a_prev, b_first] + D[b_last, a_next])
+                        legal &= _within(limits[0], B.distance - seg_b_distance + seg_a_distance
+                                         - D[b_prev, b_first] - D[b_last, b_next]
+                                         + D[b_prev, a_first] + D[a_last, b_next])
+                        legal &= _within(limits[1], A.time - seg_a_time + seg_b_time
+                                         - T[a_prev, a_first] - T[a_last, a_next]
+                                         + T[a_prev, b_first] + T[b_last, a_next])
+                        legal &= _within(limits[1], B.time - seg_b_time + seg_a_time
+                                         - T[b_prev, b_first] - T[b_last, b_next]
+                                         + T[b_prev, a_first] + T[a_last, b_next])
+
+                        candidates = legal & (deltas < -EPSILON)
+                        if candidates.any():
+                            k = int(candidates.argmax())
+                            s1, s2 = int(q1[k]), int(q2[k])
+                            new_a = np.concatenate((A.ids[:p1], B.ids[s1:s2+1], A.ids[p2+1:]))
+                            new_b = np.concatenate((B.ids[:s1], A.ids[p1:p2+1], B.ids[s2+1:]))
+                            _replace(instance, routes, {a: new_a, b: new_b})
+                            return True
+    return False
+
+
+# ---------------------------
+# Utilidades
+# ---------------------------
+def _replace(instance, routes, new_ids):
+    """Sustituye las rutas indicadas y elimina las que no tienen loadings ni unloadings."""
+    for k, ids in new_ids.items():
+        routes[k] = _Route(instance, ids)
+    routes[:] = [route for route in routes if route.customers > 0]
+
+
+def _to_solution(instance, routes):
+    new_solution = VRPSolution(instance)
+    for route in routes:
+        new_solution.add_route(route.ids)
+    new_solution.complete_feasibility()
+    return new_solution
+
+
+def _best_insertion(instance, a, b, nodes, legal, base, limits, extra=(0.0, 0.0, 0.0), cost=None):
+    """
+    Mejor inserción de cada nodo entre los extremos de los arcos (a, b).
+
+    legal (len(nodes) x len(a)) marca las posiciones que respetan el orden
+    de loadings y unloadings; base es el (coste, distancia, tiempo) de la
+    ruta de partida y extra, lo que se añade en cada posición además del
+    desvío (por ejemplo, al recolocar el charger). El delta se mide frente
+    a cost, el coste actual de la ruta (por defecto, el de base).
+
+    Retorna:
+        tuple: (delta de coste, arco de inserción), arrays de len(nodes);
+        delta = inf si no hay posición factible.
+    """
+    u = nodes[:, None]
+    C, D, T = instance.cost, instance.distance, instance.time
+    base_cost, base_distance, base_time = base
+    extra_cost, extra_distance, extra_time = extra
+    delta = base_cost + (C[a, u] + C[u, b] - C[a, b]) + extra_cost - (base_cost if cost is None else cost)
+    legal = legal & _within(limits[0], base_distance + (D[a, u] + D[u, b] - D[a, b]) + extra_distance)
+    legal &= _within(limits[1], base_time + (T[a, u] + T[u, b] - T[a, b]) + extra_time)
+    delta = np.where(legal, delta, np.inf)
+    best = delta.argmin(axis=1)
+    return delta[np.arange(len(nodes)), best], best
+
+
+def _within(limit, values):
+    """Máscara de valores que respetan el límite (siempre True si limit es None)."""
+    if limit is None:
+        return True
+    return np.asarray(values) <= limit + EPSILON
+
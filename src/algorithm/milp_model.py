@@ -0,0 +1,458 @@
+import warnings
+
+import numpy as np
+from src.vrp_instance import VRPInstance
+from src.vrp_solution import VRPSolution
+
+
+class MILPModel:
+    """
+    Solver-neutral mixed-integer linear program.
+
+    Variables are numbered 0..num_vars-1 and constraints are stored as sparse
+    rows ``row_lower <= A x <= row_upper`` in coordinate format, so the model
+    can be handed to any MIP backend or written to an LP file.
+
+    Attributes:
+        name (str): Model name.
+        col_lower, col_upper, obj (np.ndarray): Bounds and objective of each variable.
+        integer (np.ndarray): True for integer (binary if bounds are 0/1) variables.
+        row_lower, row_upper (np.ndarray): Bounds of each constraint row.
+        var_families, row_families (list): (name, first index, shape) of each
+            block of variables/rows, used to name them.
+    """
+
+    def __init__(self, name="model"):
+        self.name = name
+        self.var_families = []
+        self.row_families = []
+        self._col_lower, self._col_upper, self._obj, self._integer = [], [], [], []
+        self._row_lower, self._row_upper = [], []
+        self._rows, self._cols, self._vals = [], [], []
+        self.num_vars = 0
+        self.num_rows = 0
+
+    # ---------------------------
+    # Construction
+    # ---------------------------
+    def add_vars(self, name, shape, lb=0.0, ub=np.inf, integer=False):
+        """Add a block of variables; returns an int array of their indices with the given shape."""
+        size = int(np.prod(shape))
+        index = np.arange(self.num_vars, self.num_vars + size).reshape(shape)
+        self._col_lower.append(np.full(size, lb, dtype=np.float64))
+        self._col_upper.append(np.full(size, ub, dtype=np.float64))
+        self._obj.append(np.zeros(size))
+        self._integer.append(np.full(size, integer))
+        self.var_families.append((name, self.num_vars, tuple(np.atleast_1d(shape))))
+        self.num_vars += size
+        return index
+
+    def set_objective(self, cols, coefs):
+        """Set the objective coefficients of the given variables (minimisation)."""
+        obj = self.obj
+        obj[np.asarray(cols).ravel()] = np.asarray(coefs, dtype=np.float64).ravel()
+        self._obj = [obj]
+
+    def add_rows(self, name, rows, cols, vals, lower, upper, num_rows):
+        """
+        Add a block of num_rows constraints given in coordinate format.
+
+        rows are local row numbers (0..num_rows-1), cols variable indices and
+        vals the coefficients; lower and upper are scalars or arrays of size
+        num_rows (use -np.inf/np.inf for one-sided rows).
+        """
+        rows = np.asarray(rows, dtype=np.int64).ravel()
+        self._rows.append(rows + self.num_rows)
+        self._cols.append(np.asarray(cols, dtype=np.int64).ravel())
+        vals = np.asarray(vals, dtype=np.float64)
+        self._vals.append(vals.ravel() if vals.size == rows.size else np.broadcast_to(vals, rows.shape).ravel())
+        self._row_lower.append(np.broadcast_to(np.asarray(lower, dtype=np.float64), num_rows).copy())
+        self._row_upper.append(np.broadcast_to(np.asarray(upper, dtype=np.float64), num_rows).copy())
+        self.row_families.append((name, self.num_rows, (num_rows,)))
+        self.num_rows += num_rows
+
+    # ---------------------------
+    # Array views
+    # ---------------------------
+    @property
+    def col_lower(self):
+        return np.concatenate(self._col_lower) if self._col_lower else np.zeros(0)
+
+    @property
+    def col_upper(self):
+        return np.concatenate(self._col_upper) if self._col_upper else np.zeros(0)
+
+    @property
+    def obj(self):
+        return np.concatenate(self._obj) if self._obj else np.zeros(0)
+
+    @property
+    def integer(self):
+        return np.concatenate(self._integer) if self._integer else np.zeros(0, dtype=bool)
+
+    @property
+    def row_lower(self):
+        return np.concatenate(self._row_lower) if self._row_lower else np.zeros(0)
+
+    @property
+    def row_upper(self):
+        return np.concatenate(self._row_upper) if self._row_upper else np.zeros(0)
+
+    def to_csr(self):
+        """Constraint matrix in row-wise compressed format: (start, index, value)."""
+        rows = np.concatenate(self._rows) if self._rows else np.zeros(0, dtype=np.int64)
+        cols = np.concatenate(self._cols) if self._cols else np.zeros(0, dtype=np.int64)
+        vals = np.concatenate(self._vals) if self._vals else np.zeros(0)
+        order = np.lexsort((cols, rows))
+        start = np.zeros(self.num_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=self.num_rows), out=start[1:])
+        return start, cols[order], vals[order]
+
+    def violated_rows(self, values, tol=1e-6):
+        """
+        Rows that the column values break, counted per row family.
+
+        Returns:
+            dict: family name -> number of violated rows (empty if none).
+        """
+        start, index, value = self.to_csr()
+        rows = np.repeat(np.arange(self.num_rows), np.diff(start))
+        activity = np.bincount(rows, weights=value * np.asarray(values)[index], minlength=self.num_rows)
+        broken = (activity < self.row_lower - tol) | (activity > self.row_upper + tol)
+        counts = {}
+        for name, first, (count,) in self.row_families:
+            n = int(broken[first:first + count].sum())
+            if n:
+                counts[name] = n
+        return counts
+
+    # ---------------------------
+    # Names and export
+    # ---------------------------
+    def var_names(self):
+        return _family_names(self.var_families, self.num_vars)
+
+    def row_names(self):
+        return _family_names(self.row_families, self.num_rows)
+
+    def write_lp(self, path):
+        """Write the model in CPLEX LP format, readable by HiGHS, CBC, SCIP, Gurobi, etc."""
+        names = self.var_names()
+        obj = self.obj
+        lower, upper = self.col_lower, self.col_upper
+        integer = self.integer
+        start, index, value = self.to_csr()
+        row_lower, row_upper = self.row_lower, self.row_upper
+
+        with open(path, 'w') as f:
+            f.write(f"\\ {self.name}\nMinimize\n obj:")
+            _write_terms(f, ((obj[k], names[k]) for k in np.flatnonzero(obj)))
+            f.write("\nSubject To\n")
+            for r, row_name in enumerate(self.row_names()):
+                terms = [(value[k], names[index[k]]) for k in range(start[r], start[r+1])]
+                lo, up = row_lower[r], row_upper[r]
+                if lo == up:
+                    bounds = [("", "=", lo)]
+                elif np.isinf(lo):
+                    bounds = [("", "<=", up)]
+                elif np.isinf(up):
+                    bounds = [("", ">=", lo)]
+                else:
+                    bounds = [("_lo", ">=", lo), ("_up", "<=", up)]
+                for suffix, sense, rhs in bounds:
+                    f.write(f" {row_name}{suffix}:")
+                    _write_terms(f, terms)
+                    f.write(f" {sense} {rhs:.12g}\n")
+
+            f.write("Bounds\n")
+            binary = integer & (lower == 0) & (upper == 1)
+            for k in np.flatnonzero(~binary):
+                lo = "-inf" if np.isinf(lower[k]) else f"{lower[k]:.12g}"
+                up = "+inf" if np.isinf(upper[k]) else f"{upper[k]:.12g}"
+                f.write(f" {lo} <= {names[k]} <= {up}\n")
+            if binary.any():
+                f.write("Binaries\n")
+                for k in np.flatnonzero(binary):
+                    f.write(f" {names[k]}\n")
+            if (integer & ~binary).any():
+                f.write("Generals\n")
+                for k in np.flatnonzero(integer & ~binary):
+                    f.write(f" {names[k]}\n")
+            f.write("End\n")
+
+
+class ExactModelIndex:
+    """
+    Mapping between the exact_model formulation and the MILPModel columns.
+
+    Attributes:
+        V (list): Location names of the model nodes, ending with the fictitious end parking.
+        node_ids (np.ndarray): Instance id of each model node (the fictitious
+            end parking maps to the base parking).
+        F (np.ndarray): Model node index of each charger.
+        x (np.ndarray): Column of x[m, i, j], shape (|M|, |V|, |V|).
+        z (np.ndarray): Column of z[m, f], shape (|M|, |F|).
+        t (np.ndarray): Column of t[m, i], shape (|M|, |V|).
+    """
+
+    def __init__(self, V, node_ids, F, x, z, t):
+        self.V = V
+        self.node_ids = node_ids
+        self.F = F
+        self.x = x
+        self.z = z
+        self.t = t
+
+
+def build_exact_model(vrp: VRPInstance, n_vehicles=20, max_time_per_route=15*60, L=1e5,
+                      epsilon=1e-6, max_route_length=400.0):
+    """
+    Build the exact_model formulation as a solver-neutral MILPModel.
+
+    Same variables (x, z, t) and constraints (r0-r10, time propagation,
+    t = 0 for unvisited nodes and the battery limit) as the Gurobi model in
+    exact_model, generated with array operations on the integer-indexed
+    instance matrices.
+
+    Returns:
+        tuple: (MILPModel, ExactModelIndex)
+    """
+    n = len(vrp.names)
+    base = int(vrp.parking_ids[0])
+    fict = n                                   # model node of the fictitious end parking
+    node_ids = np.append(np.arange(n), base)   # model node -> instance id
+    nV = n + 1
+    V = vrp.names + ['FICT_END_' + vrp.names[base]]
+    F = vrp.charger_ids
+    N = np.concatenate((vrp.loading_ids, vrp.unloading_ids))
+    P = np.append(vrp.parking_ids, fict)
+    NP = np.concatenate((N, P))
+    M = np.arange(n_vehicles)
+
+    C = vrp.cost[np.ix_(node_ids, node_ids)]
+    T = vrp.time[np.ix_(node_ids, node_ids)]
+    D = vrp.distance[np.ix_(node_ids, node_ids)]
+    off_diagonal = ~np.eye(nV, dtype=bool)
+    I, J = np.nonzero(off_diagonal)
+
+    model = MILPModel("VRP")
+    x = model.add_vars("x", (n_vehicles, nV, nV), 0, 1, integer=True)
+    z = model.add_vars("z", (n_vehicles, len(F)), 0, 1, integer=True)
+    t = model.add_vars("t", (n_vehicles, nV), 0, max_time_per_route)
+
+    # Objective: travel cost + charging
+    model.set_objective(
+        np.concatenate((x[:, I, J].ravel(), z.ravel())),
+        np.concatenate((np.tile(C[I, J], n_vehicles), np.tile(vrp.charging_cost_array[F], n_vehicles)))
+    )
+
+    # r0: initial time at base parking
+    model.add_rows("r0", M, t[:, base], 1.0, 0.0, 0.0, n_vehicles)
+
+    # r1: each loading and unloading point is visited exactly once
+    rows, cols = [], []
+    for k, j in enumerate(N):
+        sources = np.flatnonzero(np.arange(nV) != j)
+        cols.append(x[:, sources, j].ravel())
+        rows.append(np.full(cols[-1].size, k))
+    model.add_rows("r1", _cat(rows), _cat(cols), 1.0, 1.0, 1.0, len(N))
+
+    # r2: flow conservation for all non-depot, non-fictitious nodes
+    inner = np.array([j for j in range(nV) if j not in (base, fict)], dtype=np.int64)
+    rows, cols, vals = [], [], []
+    for k, (m, j) in enumerate((m, j) for m in M for j in inner):
+        others = np.flatnonzero(np.arange(nV) != j)
+        cols += [x[m, others, j], x[m, j, others]]
+        vals += [np.ones(len(others)), -np.ones(len(others))]
+        rows.append(np.full(2 * len(others), k))
+    model.add_rows("r2", _cat(rows), _cat(cols), _cat(vals), 0.0, 0.0, n_vehicles * len(inner))
+
+    # r3: leave base parking at most once
+    rows = np.repeat(M, len(inner))
+    model.add_rows("r3", rows, x[:, base, inner], 1.0, -np.inf, 1.0, n_vehicles)
+
+    # r4: return to fictitious end parking at most once
+    model.add_rows("r4", rows, x[:, inner, fict], 1.0, -np.inf, 1.0, n_vehicles)
+
+    # r5: fictitious end parking has no outgoing arcs
+    model.add_rows("r5", np.arange(n_vehicles * nV), x[:, fict, :], 1.0, 0.0, 0.0, n_vehicles * nV)
+
+    # r6: unloading must be visited after loading
+    m_, l_, u_ = np.meshgrid(M, vrp.loading_ids, vrp.unloading_ids, indexing='ij')
+    count = m_.size
+    rows = np.repeat(np.arange(count), 2)
+    cols = np.stack((t[m_, u_].ravel(), t[m_, l_].ravel()), axis=1)
+    vals = np.tile([1.0, -1.0], count)
+    model.add_rows("r6", rows, cols, vals, epsilon, np.inf, count)
+
+    # r7: time propagation along arcs (Big-L): t_i - t_j + (T_ij + L) x_ij <= L
+    m_ = np.repeat(M, len(I))
+    i_, j_ = np.tile(I, n_vehicles), np.tile(J, n_vehicles)
+    count = m_.size
+    rows = np.repeat(np.arange(count), 3)
+    cols = np.stack((t[m_, i_], t[m_, j_], x[m_, i_, j_]), axis=1)
+    vals = np.stack((np.ones(count), -np.ones(count), T[i_, j_] + L), axis=1)
+    model.add_rows("r7", rows, cols, vals, -np.inf, L, count)
+
+    # r8.1: visit just one charger
+    model.add_rows("r8.1", np.repeat(M, len(F)), z, 1.0, 1.0, 1.0, n_vehicles)
+
+    # r8.2: exactly one arc leaves a charger towards N+P
+    cols = x[:, F[:, None], NP[None, :]].reshape(n_vehicles, -1)
+    model.add_rows("r8.2", np.repeat(M, cols.shape[1]), cols, 1.0, 1.0, 1.0, n_vehicles)
+
+    # r9: flag charger visit if arc leaves the charger towards N+P
+    m_, f_, j_ = np.meshgrid(M, np.arange(len(F)), NP, indexing='ij')
+    keep = F[f_] != j_
+    m_, f_, j_ = m_[keep], f_[keep], j_[keep]
+    count = m_.size
+    cols = np.stack((x[m_, F[f_], j_], z[m_, f_]), axis=1)
+    model.add_rows("r9", np.repeat(np.arange(count), 2), cols, np.tile([1.0, -1.0], count),
+                   -np.inf, 0.0, count)
+
+    # r10: flag charger visit if arc arrives from N+P
+    m_, i_, f_ = np.meshgrid(M, NP, np.arange(len(F)), indexing='ij')
+    keep = i_ != F[f_]
+    m_, i_, f_ = m_[keep], i_[keep], f_[keep]
+    count = m_.size
+    cols = np.stack((x[m_, i_, F[f_]], z[m_, f_]), axis=1)
+    model.add_rows("r10", np.repeat(np.arange(count), 2), cols, np.tile([1.0, -1.0], count),
+                   -np.inf, 0.0, count)
+
+    # t[m, j] = 0 if no arc arrives at j
+    rows, cols, vals = [], [], []
+    for k, (m, j) in enumerate((m, j) for m in M for j in inner):
+        sources = np.flatnonzero(np.arange(nV) != j)
+        cols += [[t[m, j]], x[m, sources, j]]
+        vals += [[1.0], np.full(len(sources), -L)]
+        rows.append(np.full(len(sources) + 1, k))
+    model.add_rows("t_zero_if_not_visited", _cat(rows), _cat(cols), _cat(vals),
+                   -np.inf, 0.0, n_vehicles * len(inner))
+
+    # Battery limit: route length <= max_route_length per vehicle
+    model.add_rows("battery_limit", np.repeat(M, len(I)), x[:, I, J], np.tile(D[I, J], n_vehicles),
+                   -np.inf, max_route_length, n_vehicles)
+
+    return model, ExactModelIndex(V, node_ids, F, x, z, t)
+
+
+def mip_start_arrays(vrp: VRPInstance, solution, n_vehicles=20, max_time_per_route=15*60,
+                     max_route_length=400.0):
+    """
+    Translate the routes of a VRPSolution into start values for x, z and t.
+
+    Model nodes follow the instance ids with the fictitious end parking
+    appended (index len(vrp.names)). Route k is assigned to vehicle k: its
+    first node is the base parking, its last parking becomes the fictitious
+    end parking and t accumulates the travel time along the route. The
+    formulation requires every vehicle to visit one charger, so unused
+    vehicles get the cheapest base -> charger -> end loop.
+
+    max_time_per_route and max_route_length must be the limits the model
+    was built with: a RuntimeWarning is issued for every route over them,
+    since the solver rejects such a start (the search then starts cold).
+
+    Returns:
+        tuple: (x0, z0, t0) arrays of shapes (|M|, |V|, |V|), (|M|, |F|), (|M|, |V|).
+    """
+    if len(solution.route_ids) > n_vehicles:
+        raise ValueError(f"Initial solution has {len(solution.route_ids)} routes but the model "
+                         f"only has {n_vehicles} vehicles")
+
+    n = len(vrp.names)
+    base = int(vrp.parking_ids[0])
+    fict = n
+    F = vrp.charger_ids
+    charger_pos = {int(f): k for k, f in enumerate(F)}
+    x0 = np.zeros((n_vehicles, n + 1, n + 1))
+    z0 = np.zeros((n_vehicles, len(F)))
+    t0 = np.zeros((n_vehicles, n + 1))
+
+    routes = list(solution.route_ids)
+    if len(F):
+        loop_cost = vrp.cost[base, F] + vrp.cost[F, base] + vrp.charging_cost_array[F]
+        cheapest = int(F[loop_cost.argmin()])
+        routes += [np.array([base, cheapest, base])] * (n_vehicles - len(routes))
+
+    violations = []
+    for m, ids in enumerate(routes):
+        nodes = [base] + [int(i) for i in ids[1:-1]] + [fict]
+        time = length = 0.0
+        for i, j in zip(nodes[:-1], nodes[1:]):
+            x0[m, i, j] = 1
+            time += vrp.time[i, base if j == fict else j]
+            length += vrp.distance[i, base if j == fict else j]
+            t0[m, j] = time
+            if j in charger_pos and not z0[m].any():
+                z0[m, charger_pos[j]] = 1
+        if length > max_route_length + 1e-6:
+            violations.append(f"route {m} is {length:.1f} km (battery_limit {max_route_length:g})")
+        if time > max_time_per_route + 1e-6:
+            violations.append(f"route {m} takes {time:.1f} min (max_time_per_route {max_time_per_route:g})")
+
+    if violations:
+        warnings.warn("MIP start violates the model, the solver will reject it: " + "; ".join(violations),
+                      RuntimeWarning, stacklevel=2)
+    return x0, z0, t0
+
+
+def warn_violated_start(model: MILPModel, start):
+    """Issue a RuntimeWarning naming the row families a MIP start breaks (the solver will reject it)."""
+    violated = model.violated_rows(start)
+    if violated:
+        families = ", ".join(f"{name} ({count} rows)" for name, count in violated.items())
+        warnings.warn(f"MIP start violates the model, the solver will reject it: {families}",
+                      RuntimeWarning, stacklevel=2)
+
+
+def solution_from_arrival_times(vrp: VRPInstance, V, arrival_times):
+    """
+    Build a VRPSolution from the arrival times t[m, i] of a solved model.
+
+    For each vehicle the nodes with positive arrival time are visited in
+    increasing time order; the last one (the fictitious end parking) is
+    replaced by the base parking.
+
+    Args:
+        V (list): Model node names, aligned with the columns of arrival_times.
+        arrival_times (array-like): One row of arrival times per vehicle.
+    """
+    solution = VRPSolution(vrp)
+    start_parking = vrp.parkings[0]
+
+    for times in arrival_times:
+        arrival_times_m = [(i, tau) for i, tau in zip(V, times) if tau > 1e-6]
+        arrival_times_m.sort(key=lambda tup: tup[1])
+
+        if not arrival_times_m:
+            continue
+
+        route_m = [start_parking]
+        for node, tau in arrival_times_m[:-1]:
+            route_m.append(node)
+        route_m.append(start_parking)
+
+        solution.add_route(route_m)
+
+    solution.complete_feasibility()
+    return solution
+
+
+def _family_names(families, total):
+    names = [None] * total
+    for name, first, shape in families:
+        for k, idx in enumerate(np.ndindex(*shape)):
+            names[first + k] = name.replace('.', '_') + "".join(f"_{i}" for i in idx)
+    return names
+
+
+def _write_terms(f, terms):
+    """Write linear terms, wrapping lines to stay within LP-format line limits."""
+    for k, (coef, name) in enumerate(terms):
+        if k and k % 8 == 0:
+            f.write("\n  ")
+        f.write(f" {'-' if coef < 0 else '+'} {abs(coef):.12g} {name}")
+
+
+def _cat(arrays):
+    return np.concatenate([np.asarray(a).ravel() for a in arrays]) if arrays else np.zeros(0)
@@ -0,0 +1,163 @@
+import os
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import numpy as np
+from src.instance_store import convert_pickle, is_instance_dir, load_instance, save_instance
+from src.vrp_solution import VRPSolution
+from src.algorithm.nearest_neighbour import randomized_nearest_neighbour
+from src.algorithm.two_opt import two_opt
+from src.algorithm.split import split, MAX_ROUTE_LENGTH, MAX_TIME_PER_ROUTE
+from src.algorithm.local_search import local_search
+
+# Presupuesto por defecto (segundos) y tamaño de la lista restringida de candidatos
+TIME_LIMIT = 10.0
+RCL_SIZE = 3
+# Arranques encolados por proceso, para que ninguno espere entre tareas
+STARTS_PER_WORKER = 2
+# Cada cuánto se comprueba la cancelación mientras se espera a los procesos (segundos)
+POLL_INTERVAL = 0.1
+
+# Instancia del proceso de trabajo, abierta una vez por proceso
+_instance = None
+
+
+def _init_worker(instance_dir):
+    global _instance
+    _instance = load_instance(instance_dir)
+
+
+def _run_start(seed, rcl_size, max_route_length, max_time_per_route, instance=None):
+    """
+    Un arranque: vecino más próximo aleatorizado, 2-opt, split y búsqueda
+    local entre rutas.
+
+    Retorna:
+        tuple: (coste, factible, ids de las rutas). Solo viajan de vuelta los
+        ids, no la instancia.
+    """
+    instance = _instance if instance is None else instance
+    rng = np.random.default_rng(seed)
+    solution = randomized_nearest_neighbour(instance, rng, rcl_size)
+    solution = split(two_opt(solution), max_route_length, max_time_per_route)
+    solution = local_search(solution, max_route_length, max_time_per_route)
+    return solution.total_cost, solution.complete_feasibility_flag, list(solution.route_ids)
+
+
+def multi_start(instance, workers=None, time_limit=TIME_LIMIT, starts=None, seed=None,
+                rcl_size=RCL_SIZE, max_route_length=MAX_ROUTE_LENGTH,
+                max_time_per_route=MAX_TIME_PER_ROUTE, metrics=None, budget=None):
+    """
+    Búsqueda multi-arranque en paralelo.
+
+    Cada arranque construye una solución con randomized_nearest_neighbour y
+    la mejora con two_opt, split y local_search. Los arranques se reparten
+    entre procesos con semillas independientes (SeedSequence.spawn); la
+    instancia no se envía con cada tarea: cada proceso abre una vez la
+    instancia binaria (mapeada en memoria, de solo lectura, así que las
+    páginas se comparten entre procesos) y solo devuelve los ids de las
+    rutas. Se conserva la mejor solución factible (o la más barata si
+    ninguna lo es).
+
+    Parámetros:
+        instance (VRPInstance | str | Path): La instancia, o la ruta a un .pkl
+            o a una carpeta .vrp (que se usa directamente).
+        workers (int | None): Procesos (None = todos los núcleos, 0 = en serie
+            en este proceso).
+        time_limit (float | None): Presupuesto de tiempo en segundos; no se
+            lanzan arranques nuevos después, y los encolados se cancelan.
+        starts (int | None): Número máximo de arranques.
+        seed (int | None): Semilla de la que derivan las de los arranques.
+        rcl_size (int): Tamaño de la lista restringida de candidatos.
+        max_route_length (float | None): Distancia máxima por ruta (km).
+        max_time_per_route (float | None): Tiempo máximo por ruta (minutos).
+        metrics (Metrics | None): Si se indica, cuenta arranques y mejoras.
+        budget (AnytimeBudget | None): Si se indica, recibe cada nueva mejor
+            solución, y no se lanzan más arranques cuando vence su plazo o se
+            cancela.
+
+    Retorna:
+        VRPSolution: La mejor solución; solver_stats incluye los arranques,
+        los procesos y el instante en que se encontró.
+    """
+    if time_limit is None and starts is None:
+        raise ValueError("multi_start needs a time_limit or a number of starts")
+    workers = os.cpu_count() if workers is None else workers
+    seeds = np.random.SeedSequence(seed)
+    args = (rcl_size, max_route_length, max_time_per_route)
+    start = time.perf_counter()
+    deadline = None if time_limit is None else start + time_limit
+    best, time_to_best, completed = None, None, 0
+
+    def budget_left(submitted):
+        return ((starts is None or submitted < starts)
+                and (deadline is None or time.perf_counter() < deadline)
+                and not (budget is not None and budget.expired()))
+
+    def record(result):
+        nonlocal best, time_to_best, completed
+        completed += 1
+        cost, feasible, _ = result
+        if best is None or (not feasible, cost) < (not best[1], best[0]):
+            best, time_to_best = result, time.perf_counter() - start
+            if metrics is not None:
+                metrics.count('improvements_accepted')
+            if budget is not None:
+                budget.improved(_to_solution(instance, result[2]), 'multi_start')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        instance_dir = _instance_dir(instance, tmp)
+        if isinstance(instance, (str, Path)):
+            instance = load_instance(instance)
+
+        if workers == 0:
+            submitted = 0
+            while submitted == 0 or budget_left(submitted):
+                record(_run_start(seeds.spawn(1)[0], *args, instance=instance))
+                submitted += 1
+        else:
+            with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(instance_dir,)) as pool:
+                pending, submitted = set(), 0
+                while True:
+                    while budget_left(submitted) and len(pending) < workers * STARTS_PER_WORKER:
+                        pending.add(pool.submit(_run_start, seeds.spawn(1)[0], *args))
+                        submitted += 1
+                    exhausted = not budget_left(submitted)
+                    late = ((deadline is not None and time.perf_counter() >= deadline)
+                            or (budget is not None and budget.expired()))
+                    if late and best is not None:
+                        pending = {future for future in pending if not future.cancel()}
+                    if not pending:
+                        break
+                    timeout = None if exhausted or deadline is None else deadline - time.perf_counter()
+                    if budget is not None:
+                        timeout = POLL_INTERVAL if timeout is None else min(timeout, POLL_INTERVAL)
+                    done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        record(future.result())
+
+    if metrics is not None:
+        metrics.count('starts', completed)
+
+    solution = _to_solution(instance, best[2])
+    solution.solver_stats.update(starts=completed, workers=workers, time_to_best=time_to_best)
+    return solution
+
+
+def _to_solution(instance, route_ids):
+    solution = VRPSolution(instance)
+    for ids in route_ids:
+        solution.add_route(ids)
+    solution.complete_feasibility()
+    return solution
+
+
+def _instance_dir(instance, tmp):
+    """Carpeta .vrp que abren los procesos: la dada, o una conversión temporal."""
+    if isinstance(instance, (str, Path)):
+        if is_instance_dir(instance):
+            return Path(instance)
+        return convert_pickle(instance, tmp)
+    return save_instance(instance, Path(tmp) / 'instance.vrp')
@@ -1,69 +1,69 @@
+import numpy as np
 from src.vrp_instance import VRPInstance
 from src.vrp_solution import VRPSolution
+from src.vrp_instance import DEFAULT_CANDIDATES
 
 
-def nearest_neighbour(instance: VRPInstance):
+def nearest_neighbour(instance: VRPInstance, metrics=None):
     """
     Construye una solución VRP usando el algoritmo del vecino más próximo,
     asegurando que cada ruta:
       - Comience en un parking
       - Visite primero todos los loadings
       - Luego todos los unloadings
-      - Incluya exactamente un charger en la mejor posición para minimizar distancia
+      - Incluya exactamente un charger, el de menor desvío en coste más coste
+        de carga en la mejor posición
       - Termine en un parking
     
     Parámetros:
         instance (VRPInstance): La instancia del VRP.
+        metrics (Metrics | None): Si se indica, cuenta rutas, búsquedas del
+            vecino más próximo y posiciones evaluadas para insertar el charger.
     
     Retorna:
         VRPSolution: La solución generada.
     """
     solution = VRPSolution(instance)
+    D = instance.distance
 
-    # Nodos que aún deben visitarse
-    unvisited_loadings = set(instance.loadings)
-    unvisited_unloadings = set(instance.unloadings)
+    # Nodos que aún deben visitarse (máscaras sobre los ids de la instancia)
+    unvisited_loadings = np.zeros(len(instance.names), dtype=bool)
+    unvisited_loadings[instance.loading_ids] = True
+    unvisited_unloadings = np.zeros(len(instance.names), dtype=bool)
+    unvisited_unloadings[instance.unloading_ids] = True
 
-    while unvisited_loadings or unvisited_unloadings:
+    while unvisited_loadings.any() or unvisited_unloadings.any():
         # Inicializar ruta en un parking
-        start_parking = instance.parkings[0]
+        start_parking = int(instance.parking_ids[0])
         route = [start_parking]
         current_loc = start_parking
 
         # ---- Fase de loadings ----
-        while unvisited_loadings:
-            next_loc = min(unvisited_loadings, key=lambda loc: instance.get_distance(current_loc, loc))
+        while unvisited_loadings.any():
+            next_loc = int(np.where(unvisited_loadings, D[current_loc], np.inf).argmin())
             route.append(next_loc)
             current_loc = next_loc
-            unvisited_loadings.remove(next_loc)
+            unvisited_loadings[next_loc] = False
 
         # ---- Fase de unloadings ----
-        while unvisited_unloadings:
-            next_loc = min(unvisited_unloadings, key=lambda loc: instance.get_distance(current_loc, loc))
+        while unvisited_unloadings.any():
+            next_loc = int(np.where(unvisited_unloadings, D[current_loc], np.inf).argmin())
             route.append(next_loc)
             current_loc = next_loc
-            unvisited_unloadings.remove(next_loc)
+            unvisited_unloadings[next_loc] = False
 
-        # ---- Insertar un solo charger en la mejor posición ----
-        if instance.chargers:
-            charger = min(instance.chargers, key=lambda c: instance.get_distance(route[-1], c))
-            
-            # Elegir la posición que minimice la distancia incremental
-            best_pos = 1
-            min_increase = float('inf')
-            for i in range(1, len(route)):
-                prev = route[i-1]
-                next_ = route[i]
-                increase = instance.get_distance(prev, charger) + instance.get_distance(charger, next_) - instance.get_distance(prev, next_)
-                if increase < min_increase:
-                    min_increase = increase
-                    best_pos = i
-            route.insert(best_pos, charger)
+        if metrics is not None:
+            metrics.count('routes')
+            metrics.count('nearest_scans', len(route) - 1)
+            metrics.count('charger_positions_evaluated', len(route))
 
         # ---- Terminar la ruta en parking ----
         end_parking = start_parking
         route.append(end_parking)
 
+        # ---- Insertar un solo charger en la mejor posición ----
+        _insert_charger(instance, route)
+
         # Agregar ruta a la solución
         solution.add_route(route)
 
@@ -71,3 +71,126 @@ def nearest_neighbour(instance: VRPInstance):
     solution.complete_feasibility()
 
     return solution
+
+
+def granular_nearest_neighbour(instance: VRPInstance, k=DEFAULT_CANDIDATES):
+    """
+    Variante del vecino más próximo sobre listas de candidatos.
+
+    En cada paso se recorre la lista de los k loadings (o unloadings) más
+    próximos al nodo actual, precalculada en la instancia, y se toma el
+    primero no visitado. Solo si todos los candidatos ya se han visitado se
+    recurre a la búsqueda completa. Las rutas cumplen las mismas
+    restricciones que en nearest_neighbour y suelen coincidir con las suyas,
+    pero no siempre: si varios nodos empatan en distancia justo en el límite
+    de la lista de candidatos, la lista puede no incluir el de menor id, que
+    es el que elegiría la búsqueda completa.
+
+    Parámetros:
+        instance (VRPInstance): La instancia del VRP.
+        k (int): Tamaño de las listas de candidatos por tipo de nodo.
+
+    Retorna:
+        VRPSolution: La solución generada.
+    """
+    solution = VRPSolution(instance)
+    D = instance.distance
+    candidates = instance.candidate_lists(k)
+
+    unvisited = np.zeros(len(instance.names), dtype=bool)
+    unvisited[instance.loading_ids] = True
+    unvisited[instance.unloading_ids] = True
+    remaining = {'loading': len(instance.loading_ids), 'unloading': len(instance.unloading_ids)}
+    phase_ids = {'loading': instance.loading_ids, 'unloading': instance.unloading_ids}
+
+    if remaining['loading'] or remaining['unloading']:
+        start_parking = int(instance.parking_ids[0])
+        route = [start_parking]
+        current_loc = start_parking
+
+        # ---- Fase de loadings y después fase de unloadings ----
+        for node_type in ('loading', 'unloading'):
+            while remaining[node_type]:
+                next_loc = None
+                for candidate in candidates[node_type][current_loc]:
+                    if unvisited[candidate]:
+                        next_loc = int(candidate)
+                        break
+                if next_loc is None:
+                    ids = phase_ids[node_type]
+                    next_loc = int(ids[np.where(unvisited[ids], D[current_loc, ids], np.inf).argmin()])
+                route.append(next_loc)
+                current_loc = next_loc
+                unvisited[next_loc] = False
+                remaining[node_type] -= 1
+
+        # ---- Terminar la ruta en parking e insertar un solo charger en la mejor posición ----
+        route.append(start_parking)
+        _insert_charger(instance, route)
+        solution.add_route(route)
+
+    # Revisar factibilidad completa
+    solution.complete_feasibility()
+
+    return solution
+
+
+def randomized_nearest_neighbour(instance: VRPInstance, rng, rcl_size=3):
+    """
+    Variante aleatorizada del vecino más próximo para arranques múltiples.
+
+    En cada paso se elige al azar uno de los rcl_size loadings (o unloadings)
+    no visitados más próximos al nodo actual (lista restringida de
+    candidatos, como en GRASP), y el parking de salida se elige al azar.
+    Con rcl_size=1 y un solo parking coincide con nearest_neighbour.
+
+    Parámetros:
+        instance (VRPInstance): La instancia del VRP.
+        rng (numpy.random.Generator): Generador aleatorio.
+        rcl_size (int): Tamaño de la lista restringida de candidatos.
+
+    Retorna:
+        VRPSolution: La solución generada.
+    """
+    solution = VRPSolution(instance)
+    D = instance.distance
+
+    if len(instance.loading_ids) or len(instance.unloading_ids):
+        start_parking = int(rng.choice(instance.parking_ids))
+        route = [start_parking]
+        current_loc = start_parking
+
+        # ---- Fase de loadings y después fase de unloadings ----
+        for ids in (instance.loading_ids, instance.unloading_ids):
+            unvisited = list(ids)
+            while unvisited:
+                k = min(rcl_size, len(unvisited))
+                candidates = np.argpartition(D[current_loc, unvisited], k - 1)[:k]
+                next_loc = int(unvisited.pop(int(rng.choice(candidates))))
+                route.append(next_loc)
+                current_loc = next_loc
+
+        # ---- Terminar la ruta en parking e insertar un solo charger en la mejor posición ----
+        route.append(start_parking)
+        _insert_charger(instance, route)
+        solution.add_route(route)
+
+    # Revisar factibilidad completa
+    solution.complete_feasibility()
+
+    return solution
+
+
+def _insert_charger(instance, route):
+    """
+    Inserta en route (lista de ids, con el parking final) el charger y la
+    posición de menor desvío en coste más coste de carga: para cada arco el
+    mejor charger está precalculado en la instancia (best_chargers), así
+    que basta un recorrido vectorizado de los arcos de la ruta.
+    """
+    if not len(instance.charger_ids):
+        return
+    chargers, extra_cost, _, _ = instance.best_chargers()
+    prev, next_ = route[:-1], route[1:]
+    k = int(extra_cost[prev, next_].argmin())
+    route.insert(k + 1, int(chargers[prev[k], next_[k]]))
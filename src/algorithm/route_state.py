@@ -0,0 +1,127 @@
+import numpy as np
+from src.vrp_instance import LOADING, UNLOADING, CHARGER
+
+# Tolerancia para aceptar una mejora (evita ciclos por errores de redondeo)
+EPSILON = 1e-9
+
+
+class RouteState:
+    """
+    Estado incremental de una ruta para la búsqueda local.
+
+    Guarda la ruta como array de ids junto con:
+      - Conteos prefijo de loadings, unloadings y chargers, de modo que la
+        composición de cualquier segmento se obtiene en O(1).
+      - Sumas prefijo de los arcos en sentido directo e inverso (solo si la
+        matriz es asimétrica), para evaluar la inversión de un segmento en O(1).
+      - La longitud de la ruta, actualizada con cada movimiento aplicado.
+
+    Atributos:
+        ids (np.ndarray): Ids de la ruta, empezando y terminando en parking.
+        matrix (np.ndarray): Matriz usada como objetivo (distance por defecto).
+        symmetric (bool): Si la matriz es simétrica.
+        length (float): Valor de la ruta según matrix.
+    """
+
+    def __init__(self, instance, ids, matrix='distance'):
+        self.instance = instance
+        self.matrix = getattr(instance, matrix)
+        self.symmetric = instance.is_symmetric(matrix)
+        self.ids = np.array(ids, dtype=np.intp)
+        self.length = float(self.matrix[self.ids[:-1], self.ids[1:]].sum())
+        self.refresh()
+
+    def refresh(self):
+        """Recalcula los conteos y sumas prefijo tras modificar ids."""
+        codes = self.instance.node_codes[self.ids]
+        self.loadings = prefix_sum(codes == LOADING)
+        self.unloadings = prefix_sum(codes == UNLOADING)
+        self.chargers = prefix_sum(codes == CHARGER)
+        if not self.symmetric:
+            ids = self.ids
+            self.forward = prefix_sum(self.matrix[ids[:-1], ids[1:]])
+            self.backward = prefix_sum(self.matrix[ids[1:], ids[:-1]])
+
+    def segment_counts(self, i, j):
+        """(loadings, unloadings, chargers) en ids[i..j], ambos incluidos."""
+        return (self.loadings[j+1] - self.loadings[i],
+                self.unloadings[j+1] - self.unloadings[i],
+                self.chargers[j+1] - self.chargers[i])
+
+    def reversal_delta(self, i, j):
+        """Variación de longitud al invertir ids[i..j] (O(1))."""
+        ids, M = self.ids, self.matrix
+        a, b, c, e = ids[i-1], ids[i], ids[j], ids[j+1]
+        delta = M[a, c] + M[b, e] - M[a, b] - M[c, e]
+        if not self.symmetric:
+            delta += (self.backward[j] - self.backward[i]) - (self.forward[j] - self.forward[i])
+        return float(delta)
+
+    def reversal_is_legal(self, i, j):
+        """True si ids[i..j] no mezcla loadings con unloadings ni tiene más de un charger."""
+        n_loadings, n_unloadings, n_chargers = self.segment_counts(i, j)
+        return not (n_loadings and n_unloadings) and n_chargers <= 1
+
+    def reversal_deltas(self, i):
+        """
+        Evalúa la inversión de ids[i..j] para todo j en [i+1, n-2].
+
+        Cada delta usa solo los cuatro arcos afectados (más la corrección del
+        segmento interior si la matriz es asimétrica) y la legalidad se
+        obtiene de los conteos prefijo: no se mezclan loadings y unloadings
+        y no hay más de un charger en el segmento.
+
+        Retorna:
+            (js, deltas, legal): arrays alineados con los j candidatos.
+        """
+        ids, M = self.ids, self.matrix
+        n = len(ids)
+        js = np.arange(i+1, n-1)
+        a, b = ids[i-1], ids[i]
+        c, e = ids[js], ids[js+1]
+
+        deltas = M[a, c] + M[b, e] - M[a, b] - M[c, e]
+        if not self.symmetric:
+            deltas += (self.backward[js] - self.backward[i]) - (self.forward[js] - self.forward[i])
+
+        n_loadings = self.loadings[js+1] - self.loadings[i]
+        n_unloadings = self.unloadings[js+1] - self.unloadings[i]
+        n_chargers = self.chargers[js+1] - self.chargers[i]
+        legal = ~((n_loadings > 0) & (n_unloadings > 0)) & (n_chargers <= 1)
+        return js, deltas, legal
+
+    def first_improving_reversal(self, i, metrics=None):
+        """
+        Primer j cuya inversión es legal y mejora la ruta, o (None, 0).
+
+        Con metrics se cuentan los movimientos evaluados y los rechazados por
+        precedencia (loadings y unloadings mezclados) o por charger.
+        """
+        js, deltas, legal = self.reversal_deltas(i)
+        improving = legal & (deltas < -EPSILON)
+        if metrics is not None:
+            n_chargers = self.chargers[js+1] - self.chargers[i]
+            metrics.count('moves_evaluated', len(js))
+            metrics.count('moves_rejected_precedence', int((~legal & (n_chargers <= 1)).sum()))
+            metrics.count('moves_rejected_charger', int((n_chargers > 1).sum()))
+        if not improving.any():
+            return None, 0.0
+        k = int(improving.argmax())
+        return int(js[k]), float(deltas[k])
+
+    def reverse(self, i, j, delta):
+        """Invierte ids[i..j] y actualiza la longitud con el delta ya evaluado."""
+        self.ids[i:j+1] = self.ids[i:j+1][::-1].copy()
+        self.length += delta
+        self.refresh()
+
+    def route(self):
+        """Ruta como lista de nombres."""
+        return self.instance.ids_to_route(self.ids)
+
+
+def prefix_sum(values):
+    """Suma prefijo con un cero inicial: out[k] = sum(values[:k])."""
+    out = np.zeros(len(values) + 1, dtype=np.result_type(values.dtype, np.int64))
+    np.cumsum(values, out=out[1:])
+    return out
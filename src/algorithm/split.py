@@ -0,0 +1,180 @@
+import numpy as np
+from src.vrp_instance import LOADING, UNLOADING
+from src.vrp_solution import VRPSolution
+from src.algorithm.route_state import prefix_sum
+
+# Límites por vehículo, los mismos que impone exact_model
+MAX_ROUTE_LENGTH = 400.0      # batería (km)
+MAX_TIME_PER_ROUTE = 15 * 60  # jornada (minutos)
+
+
+def giant_tour(solution):
+    """Secuencia de ids de loadings y unloadings en el orden en que los visita la solución."""
+    instance = solution.instance
+    codes = instance.node_codes
+    return [int(i) for ids in solution.route_ids for i in ids if codes[i] in (LOADING, UNLOADING)]
+
+
+def split(solution, max_route_length=MAX_ROUTE_LENGTH, max_time_per_route=MAX_TIME_PER_ROUTE):
+    """
+    Divide de forma óptima la ruta gigante de una solución en rutas factibles.
+
+    La ruta gigante (loadings y unloadings en el orden de la solución, por
+    ejemplo la de nearest_neighbour o two_opt) se corta en tramos
+    consecutivos. Cada tramo forma una ruta que sale del parking, incluye un
+    charger en la posición más barata (desvío más coste de carga) y vuelve al
+    parking, respetando el límite de batería, el de tiempo y el orden
+    loadings -> unloadings. Si con el charger más barato el tramo supera los
+    límites, se usa el charger y arco más baratos de entre los que los
+    respetan, de modo que el corte es óptimo para el orden dado.
+
+    El corte óptimo es un camino mínimo sobre un grafo acíclico. Como la
+    distancia del tramo solo puede crecer al alargarlo, la ventana de
+    extensiones de cada nodo está acotada por el límite de batería y el
+    coste total es O(n·w), con w el máximo número de nodos por ruta. Cada
+    extensión se evalúa en O(1) con sumas prefijo y el mejor desvío al
+    charger ya precalculado por arco.
+
+    Parámetros:
+        solution (VRPSolution): Solución cuyo orden de visita se quiere dividir.
+        max_route_length (float): Distancia máxima por ruta (km).
+        max_time_per_route (float): Tiempo máximo por ruta (minutos).
+
+    Retorna:
+        VRPSolution: Solución con una ruta por vehículo.
+    """
+    instance = solution.instance
+    tour = np.array(giant_tour(solution), dtype=np.intp)
+    new_solution = VRPSolution(instance)
+    if not len(tour):
+        new_solution.complete_feasibility()
+        return new_solution
+
+    parking = int(instance.parking_ids[0])
+    C, D, T = instance.cost, instance.distance, instance.time
+    codes = instance.node_codes[tour]
+    n = len(tour)
+
+    # Sumas prefijo de los arcos internos de la ruta gigante
+    cost_cum = prefix_sum(C[tour[:-1], tour[1:]])
+    dist_cum = prefix_sum(D[tour[:-1], tour[1:]])
+    time_cum = prefix_sum(T[tour[:-1], tour[1:]])
+
+    # Mejor charger en cada arco: salida del parking, arcos internos, vuelta al parking
+    parkings = np.full(n, parking)
+    start_arc = _best_charger(instance, parkings, tour)
+    inner_arc = _best_charger(instance, tour[:-1], tour[1:])
+    end_arc = _best_charger(instance, tour, parkings)
+
+    # Camino mínimo: value[k] = coste mínimo para servir tour[:k]
+    value = np.full(n + 1, np.inf)
+    value[0] = 0.0
+    pred = np.zeros(n + 1, dtype=np.intp)
+    charger_choice = [None] * (n + 1)   # (arco, charger) si no es el más barato
+
+    for i in range(n):
+        if not np.isfinite(value[i]):
+            continue
+        best = _arc(start_arc, i)   # mejor desvío entre los arcos ya recorridos
+        unloading_seen = False
+        for j in range(i, n):
+            if codes[j] == UNLOADING:
+                unloading_seen = True
+            elif unloading_seen:
+                break  # loading después de un unloading
+            if j > i:
+                best = min(best, _arc(inner_arc, j - 1))
+            extra = min(best, _arc(end_arc, j))
+
+            open_dist = D[parking, tour[i]] + dist_cum[j] - dist_cum[i]
+            open_time = T[parking, tour[i]] + time_cum[j] - time_cum[i]
+            if j > i and (open_dist > max_route_length or open_time > max_time_per_route):
+                break  # alargar el tramo no puede volver a ser factible
+
+            closed_dist = open_dist + D[tour[j], parking]
+            closed_time = open_time + T[tour[j], parking]
+            choice = None
+            if (closed_dist + extra[1] > max_route_length or closed_time + extra[2] > max_time_per_route) and j > i:
+                # solo se permite exceder límites en rutas de un único nodo
+                ids = np.concatenate(([parking], tour[i:j + 1], [parking]))
+                choice = _cheapest_feasible_charger(instance, ids, max_route_length - closed_dist,
+                                                    max_time_per_route - closed_time)
+                if choice is None:
+                    continue
+                extra = choice[2:]
+
+            cost = (C[parking, tour[i]] + cost_cum[j] - cost_cum[i]
+                    + C[tour[j], parking] + extra[0])
+            if value[i] + cost < value[j + 1]:
+                value[j + 1] = value[i] + cost
+                pred[j + 1] = i
+                charger_choice[j + 1] = None if choice is None else choice[:2]
+
+    # Reconstruir las rutas
+    cuts = [n]
+    while cuts[-1] > 0:
+        cuts.append(int(pred[cuts[-1]]))
+    cuts.reverse()
+
+    for start, end in zip(cuts[:-1], cuts[1:]):
+        route = [parking] + tour[start:end].tolist() + [parking]
+        if charger_choice[end] is None:
+            _insert_best_charger(instance, route)
+        else:
+            arc, charger = charger_choice[end]
+            route.insert(arc + 1, charger)
+        new_solution.add_route(route)
+
+    new_solution.complete_feasibility()
+    return new_solution
+
+
+def _best_charger(instance, frm, to):
+    """
+    Para cada arco frm[k] -> to[k], el charger que minimiza el desvío en
+    coste más el coste de carga (de la tabla precalculada de la instancia,
+    VRPInstance.best_chargers).
+
+    Retorna:
+        tuple: (chargers, extra_cost, extra_distance, extra_time), arrays de len(frm).
+    """
+    return tuple(table[frm, to] for table in instance.best_chargers())
+
+
+def _cheapest_feasible_charger(instance, ids, distance_slack, time_slack):
+    """
+    Charger y arco de la ruta ids (sin charger) de menor desvío más coste de
+    carga entre los que añaden como mucho distance_slack km y time_slack
+    minutos.
+
+    Retorna:
+        tuple | None: (arco, charger, coste, distancia, tiempo extra), o None
+        si ninguno cabe.
+    """
+    F = instance.charger_ids
+    if not len(F):
+        return None
+    a, b = ids[:-1, None], ids[1:, None]
+    C, D, T = instance.cost, instance.distance, instance.time
+    cost = C[a, F] + C[F, b] - C[a, b] + instance.charging_cost_array[F]
+    distance = D[a, F] + D[F, b] - D[a, b]
+    time = T[a, F] + T[F, b] - T[a, b]
+    cost = np.where((distance <= distance_slack) & (time <= time_slack), cost, np.inf)
+    k, f = np.unravel_index(cost.argmin(), cost.shape)
+    if not np.isfinite(cost[k, f]):
+        return None
+    return int(k), int(F[f]), cost[k, f], distance[k, f], time[k, f]
+
+
+def _arc(table, k):
+    """(coste, distancia, tiempo) extra del mejor charger en el arco k de una tabla."""
+    return (table[1][k], table[2][k], table[3][k])
+
+
+def _insert_best_charger(instance, route):
+    """Inserta en route (lista de ids) el charger y la posición de menor desvío más carga."""
+    ids = np.array(route)
+    chargers, extra_cost, _, _ = _best_charger(instance, ids[:-1], ids[1:])
+    if len(instance.charger_ids):
+        k = int(extra_cost.argmin())
+        route.insert(k + 1, int(chargers[k]))
@@ -1,60 +1,164 @@
+from collections import deque
+import numpy as np
+from src.vrp_instance import DEFAULT_CANDIDATES
 from src.vrp_solution import VRPSolution
+from src.algorithm.route_state import RouteState, EPSILON
 
-def two_opt(solution):
+def two_opt(solution, metrics=None, budget=None):
     """
     Aplica el algoritmo 2-opt sobre una solución VRP inicial,
     respetando las restricciones:
       - Loadings antes que unloadings
       - Un solo charger por ruta
       - Cada ruta empieza y termina en parking
+
+    Cada movimiento se evalúa en O(1) a partir de los cuatro arcos afectados
+    y su legalidad con conteos prefijo (ver RouteState). Tras aceptar una
+    mejora la búsqueda continúa desde la misma posición en lugar de
+    reiniciarse, hasta completar una pasada sin mejoras.
     
     Parámetros:
         solution (VRPSolution): Solución inicial generada (por NN, por ejemplo)
+        metrics (Metrics | None): Si se indica, cuenta movimientos evaluados,
+            rechazados (precedencia / charger), mejoras aceptadas y pasadas.
+        budget (AnytimeBudget | None): Si se indica, al final de cada pasada
+            con mejoras se le entrega la solución actual, y la búsqueda se
+            detiene (devolviendo la mejor hasta el momento) cuando vence su
+            plazo o se cancela.
     
     Retorna:
         VRPSolution: Nueva solución optimizada
     """
     instance = solution.instance
     new_solution = VRPSolution(instance)
+    stopped = False
 
-    for route in solution.routes:
+    for k, ids in enumerate(solution.route_ids):
+        if stopped:
+            new_solution.add_route(ids)
+            continue
+        state = RouteState(instance, ids)
         improved = True
-        best_route = route.copy()
 
-        while improved:
+        while improved and not stopped:
             improved = False
-            n = len(best_route)
-            for i in range(1, n-2):          # no tocar el primer parking
-                for j in range(i+1, n-1):    # no tocar el último parking
-                    # Evitamos invertir un segmento que rompa el orden loadings -> unloadings
-                    segment = best_route[i:j+1]
-                    types = [instance.locations[loc]['node'] for loc in segment]
-
-                    if 'unloading' in types and 'loading' in types:
-                        continue  # no invertir si hay mezcla de load/unload
-
-                    # Solo invertir si no hay más de un charger en el segmento
-                    if types.count('charger') > 1:
-                        continue
-
-                    # Realizar inversión
-                    new_route = best_route[:i] + segment[::-1] + best_route[j+1:]
-
-                    # Calcular nueva distancia
-                    old_dist = sum(instance.get_distance(best_route[k], best_route[k+1]) for k in range(n-1))
-                    new_dist = sum(instance.get_distance(new_route[k], new_route[k+1]) for k in range(n-1))
-
-                    if new_dist < old_dist:
-                        best_route = new_route
-                        improved = True
-                        break  # reiniciar búsqueda
-                if improved:
+            if metrics is not None:
+                metrics.count('passes')
+            for i in range(1, len(state.ids)-2):   # no tocar el primer parking
+                if budget is not None and budget.expired():
+                    stopped = True
                     break
+                # Aplicar mejoras en la posición i mientras existan
+                while True:
+                    j, delta = state.first_improving_reversal(i, metrics)
+                    if j is None:
+                        break
+                    state.reverse(i, j, delta)
+                    improved = True
+                    if metrics is not None:
+                        metrics.count('improvements_accepted')
+            if improved and budget is not None:
+                _checkpoint(budget, new_solution, [state.ids.copy()] + solution.route_ids[k + 1:])
 
         # Agregar la ruta optimizada a la nueva solución
-        new_solution.add_route(best_route)
+        new_solution.add_route(state.ids)
 
     # Revisar factibilidad completa
     new_solution.complete_feasibility()
 
     return new_solution
+
+
+def _checkpoint(budget, partial, rest, source='two_opt'):
+    """Entrega a budget la solución formada por las rutas ya optimizadas y las restantes."""
+    snapshot = partial.copy()
+    for ids in rest:
+        snapshot.add_route(ids)
+    snapshot.complete_feasibility()
+    budget.improved(snapshot, source)
+
+
+def granular_two_opt(solution, k=DEFAULT_CANDIDATES):
+    """
+    Variante granular del 2-opt con listas de candidatos y don't-look bits.
+
+    Para cada nodo u solo se prueban los movimientos que lo hacen adyacente
+    a uno de sus k vecinos más próximos (de cada tipo de nodo) dentro de la
+    misma ruta. Un nodo sin movimientos de mejora queda inactivo (don't-look
+    bit) hasta que un movimiento modifica alguno de sus arcos. Se respetan
+    las mismas restricciones que en two_opt, pero al explorar menos
+    movimientos y en otro orden llega en general a otro óptimo local, con
+    un coste parecido pero no igual.
+
+    Parámetros:
+        solution (VRPSolution): Solución inicial generada (por NN, por ejemplo)
+        k (int): Tamaño de las listas de candidatos por tipo de nodo.
+
+    Retorna:
+        VRPSolution: Nueva solución optimizada
+    """
+    instance = solution.instance
+    new_solution = VRPSolution(instance)
+    lists = instance.candidate_lists(k)
+    candidates = np.hstack([lists[node_type] for node_type in ('loading', 'unloading', 'charger')])
+    n_locations = len(instance.names)
+
+    for ids in solution.route_ids:
+        state = RouteState(instance, ids)
+        n = len(state.ids)
+        position = np.full(n_locations, -1, dtype=np.intp)
+        position[state.ids[1:-1]] = np.arange(1, n-1)
+
+        # Cola de nodos activos (don't-look bit desactivado)
+        active = deque(int(u) for u in state.ids[1:-1])
+        is_active = np.zeros(n_locations, dtype=bool)
+        is_active[state.ids[1:-1]] = True
+
+        while active:
+            u = active.popleft()
+            is_active[u] = False
+            move = _first_granular_move(state, position, u, candidates[u])
+            if move is None:
+                continue
+
+            i, j, delta = move
+            touched = state.ids[[i-1, i, j, j+1]]
+            state.reverse(i, j, delta)
+            position[state.ids[i:j+1]] = np.arange(i, j+1)
+
+            # Reactivar los extremos de los arcos modificados
+            for node in (u, *touched):
+                if 0 < position[node] < n-1 and not is_active[node]:
+                    is_active[node] = True
+                    active.append(int(node))
+
+        new_solution.add_route(state.ids)
+
+    # Revisar factibilidad completa
+    new_solution.complete_feasibility()
+
+    return new_solution
+
+
+def _first_granular_move(state, position, u, candidates):
+    """
+    Primer movimiento 2-opt legal y de mejora que hace adyacentes a u y a
+    alguno de sus candidatos, como (i, j, delta) sobre state, o None.
+    """
+    n = len(state.ids)
+    p = position[u]
+    for v in candidates:
+        q = position[v]
+        if q < 0 or q == p:
+            continue
+        lo, hi = min(p, q), max(p, q)
+        # Invertir (lo, hi] crea el arco ids[lo]-ids[hi]; invertir [lo, hi) crea ids[lo]-ids[hi] por el otro extremo
+        for i, j in ((lo+1, hi), (lo, hi-1)):
+            if i < 1 or j > n-2 or j <= i:
+                continue
+            if not state.reversal_is_legal(i, j):
+                continue
+            delta = state.reversal_delta(i, j)
+            if delta < -EPSILON:
+                return i, j, delta
+    return None
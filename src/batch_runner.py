@@ -0,0 +1,322 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import ExitStack, nullcontext
+from functools import partial
+from pathlib import Path
+
+from src.instance_store import load_instance, prefetch
+from src.instrumentation import Metrics, phase, profile_to, track_memory
+from src.results_writer import ResultsWriter, job_params
+
+# Algorithms in the order their rows are reported
+ALGORITHMS = ('gurobi', 'nearest_neighbour', 'two_opt')
+# MIP solvers, scheduled in their own capped pool
+EXACT_ALGORITHMS = ('gurobi', 'highs')
+# Algorithms that only run when asked for explicitly
+OPTIONAL_ALGORITHMS = ('highs', 'alns', 'granular_nearest_neighbour', 'granular_two_opt')
+
+
+def solve(instance, algorithm, gurobi_threads=None, warm_start=False, metrics=None):
+    """
+    Run one algorithm on an instance.
+
+    With warm_start=True the MIP solvers start from the nearest_neighbour +
+    two_opt solution split into routes within the battery and time limits
+    (built outside the timed section). metrics (Metrics)
+    is passed to the algorithm; the heuristics are timed as its 'solve' phase.
+
+    Returns:
+        tuple: (VRPSolution | None, execution time in seconds). For 'two_opt'
+        only the 2-opt phase is timed, as in the original driver, and likewise
+        for 'granular_two_opt' (started from granular_nearest_neighbour).
+    """
+    from src.algorithm.nearest_neighbour import nearest_neighbour
+    from src.algorithm.two_opt import two_opt
+    from src.algorithm.split import split
+
+    if algorithm in EXACT_ALGORITHMS:
+        # A single NN + 2-opt route breaks the model's battery_limit on the larger instances
+        initial_solution = split(two_opt(nearest_neighbour(instance))) if warm_start else None
+        if algorithm == 'gurobi':
+            from src.algorithm.exact_model import exact_model  # gurobipy only when requested
+            solver = partial(exact_model, batched=True)
+        else:
+            from src.algorithm.highs_model import exact_model_highs  # highspy only when requested
+            solver = exact_model_highs
+        start_time = time.perf_counter()
+        solution = solver(instance, threads=gurobi_threads, initial_solution=initial_solution,
+                          metrics=metrics)
+        return solution, time.perf_counter() - start_time
+
+    if algorithm == 'nearest_neighbour':
+        start_time = time.perf_counter()
+        with phase(metrics, 'solve'):
+            solution = nearest_neighbour(instance, metrics)
+        return solution, time.perf_counter() - start_time
+
+    if algorithm == 'two_opt':
+        initial = nearest_neighbour(instance)
+        start_time = time.perf_counter()
+        with phase(metrics, 'solve'):
+            solution = two_opt(initial, metrics)
+        return solution, time.perf_counter() - start_time
+
+    if algorithm == 'granular_nearest_neighbour':
+        from src.algorithm.nearest_neighbour import granular_nearest_neighbour
+        start_time = time.perf_counter()
+        with phase(metrics, 'solve'):
+            solution = granular_nearest_neighbour(instance)
+        return solution, time.perf_counter() - start_time
+
+    if algorithm == 'granular_two_opt':
+        from src.algorithm.nearest_neighbour import granular_nearest_neighbour
+        from src.algorithm.two_opt import granular_two_opt
+        initial = granular_nearest_neighbour(instance)
+        start_time = time.perf_counter()
+        with phase(metrics, 'solve'):
+            solution = granular_two_opt(initial)
+        return solution, time.perf_counter() - start_time
+
+    if algorithm == 'alns':
+        from src.algorithm.alns import alns
+        start_time = time.perf_counter()
+        with phase(metrics, 'solve'):
+            solution = alns(instance, metrics=metrics)
+        return solution, time.perf_counter() - start_time
+
+    raise ValueError(f"Unknown algorithm {algorithm!r}, expected one of {ALGORITHMS + OPTIONAL_ALGORITHMS}")
+
+
+def algorithm_params(algorithm, warm_start=False):
+    """The 'params' column of a job: the run options that change that algorithm's result."""
+    if algorithm in EXACT_ALGORITHMS:
+        return job_params(warm_start=warm_start)
+    return job_params()
+
+
+def run_job(pkl_file, algorithm, results_folder, render=True, gurobi_threads=None, warm_start=False,
+            instance=None, instrument=False, profile=False):
+    """
+    Solve one (instance, algorithm) job, save its solution and return its
+    summary row, or None if the algorithm found no solution. The MIP solvers
+    add their solver_stats (build/optimize time, time to first incumbent) to
+    the row. pkl_file may be a dataset pickle or a binary instance directory;
+    an already loaded instance can be passed to skip loading it again.
+
+    With render=True the solution map is drawn inline (run_batch instead
+    passes render=False and draws the maps in its RenderQueue).
+
+    With instrument=True the row also gets the algorithm counters, the
+    route cache hits and misses of the job, the <phase>_time of the load, build, solve, extract and render phases and
+    the peak memory of load + solve (tracemalloc, which slows the job down).
+    With profile=True load + solve run under cProfile and the stats are
+    written to <results_folder>/<algorithm>/<instance>.prof.
+    """
+    pkl_file = Path(pkl_file)
+    print(f'Processing {pkl_file.name} with {algorithm}')
+    output_folder = Path(results_folder) / algorithm
+    metrics = Metrics() if instrument else None
+
+    with ExitStack() as stack:
+        if instrument:
+            stack.enter_context(track_memory(metrics))
+        if profile:
+            output_folder.mkdir(parents=True, exist_ok=True)
+            stack.enter_context(profile_to(output_folder / (pkl_file.stem + '.prof')))
+        if instance is None:
+            with phase(metrics, 'load'):
+                instance = load_instance(pkl_file)
+        cache = instance.route_cache()
+        hits, misses = cache.hits, cache.misses
+        solution, exec_time = solve(instance, algorithm, gurobi_threads, warm_start, metrics)
+
+    if metrics is not None:
+        metrics.count('route_cache_hits', cache.hits - hits)
+        metrics.count('route_cache_misses', cache.misses - misses)
+
+    if solution is None:
+        print(f"{algorithm} no encontró solución factible para {pkl_file.stem}.")
+        return None
+
+    output_folder.mkdir(parents=True, exist_ok=True)
+    solution.execution_time = exec_time
+    solution.save(filepath=solution_path(results_folder, pkl_file, algorithm))
+    if render:
+        from src.rendering import render_solution  # folium only when rendering
+        with phase(metrics, 'render'):
+            render_solution(solution, solution_path(results_folder, pkl_file, algorithm, '.html'))
+
+    return {
+        'instance_name': pkl_file.stem,
+        'algorithm': algorithm,
+        'execution_time': exec_time,
+        'cost': solution.total_cost,
+        **solution.solver_stats,
+        **(metrics.as_row() if metrics is not None else {}),
+        'dataset_key': dataset_key(pkl_file),
+        # last, so a row cut short by a crash is never taken as a finished job
+        'fingerprint': instance.fingerprint(),
+        'params': algorithm_params(algorithm, warm_start),
+    }
+
+
+def dataset_key(pkl_file):
+    """Cheap file-level key of a dataset (size and modification time), stored with each row."""
+    stat = os.stat(pkl_file)
+    return f'{stat.st_size}-{stat.st_mtime_ns}'
+
+
+def solution_path(results_folder, pkl_file, algorithm, suffix='.pkl'):
+    """<results_folder>/<algorithm>/<instance>_solution<suffix>"""
+    return os.path.join(results_folder, algorithm, Path(pkl_file).stem + '_solution' + suffix)
+
+
+def instance_map_path(pkl_file):
+    """Path of the instance map, next to its dataset pickle."""
+    pkl_file = Path(pkl_file)
+    return os.path.join(pkl_file.parent, pkl_file.stem + '_instance.html')
+
+
+def plot_instance(pkl_file, instance=None):
+    """Render the instance map next to its dataset pickle."""
+    from src.rendering import render_instance, render_instance_file
+    if instance is None:
+        render_instance_file(pkl_file, instance_map_path(pkl_file))
+    else:
+        render_instance(instance, instance_map_path(pkl_file))
+
+
+def run_batch(pkl_files, results_folder, algorithms=ALGORITHMS, workers=None,
+              gurobi_workers=1, gurobi_threads=None, render=True, warm_start=False,
+              instrument=False, profile=False, render_workers=1, results_csv=None, resume=True):
+    """
+    Solve every (instance, algorithm) pair with a process pool.
+
+    Rendering is a separate stage: the instance maps and, as each job
+    finishes, its saved solution are queued to a RenderQueue whose
+    background threads draw them (GeoJSON layers, base layer cached per
+    instance) while the solvers keep running. render=False skips it.
+
+    Instances can be dataset pickles or binary instance directories (see
+    instance_store.convert_folder); the latter are memory-mapped, so every
+    worker opens them without deserializing the matrices. With workers=0
+    the jobs run in this process, instance by instance, while the next
+    instance is prefetched in the background.
+
+    Heuristic jobs and instance renders share a pool of `workers` processes;
+    MIP jobs (Gurobi or HiGHS) run in a separate pool of at most
+    `gurobi_workers` processes, each limited to `gurobi_threads` solver
+    threads. Rows are returned in a deterministic order: instances sorted by
+    name, then algorithms in the order given, regardless of which job
+    finishes first.
+
+    With results_csv every row is appended to that file as soon as its job
+    finishes (ResultsWriter: flushed per row, fsynced per batch), so an
+    interrupted sweep keeps what it had solved. With resume=True, jobs that
+    already have a row in the file (same instance fingerprint, algorithm and
+    parameters, see algorithm_params) and a saved solution are skipped and
+    their stored rows are returned with the new ones.
+
+    Args:
+        pkl_files (iterable of Path): Dataset pickles or instance directories to solve.
+        results_folder (Path): Folder with one sub-folder per algorithm.
+        algorithms (iterable of str): Algorithms to run, from ALGORITHMS or OPTIONAL_ALGORITHMS.
+        workers (int | None): Heuristic pool size (None = number of CPUs, 0 = serial).
+        gurobi_workers (int): Maximum number of concurrent MIP jobs.
+        gurobi_threads (int | None): Threads per MIP job (None = solver default).
+        render (bool): Whether to write the instance and solution HTML maps.
+        render_workers (int): Threads of the rendering stage.
+        warm_start (bool): Start the MIP solvers from the heuristic solution.
+        instrument (bool): Add counters, phase timings and peak memory to the rows.
+        profile (bool): Write a cProfile .prof file per job (see run_job).
+        results_csv (Path | None): Streaming results file.
+        resume (bool): Skip the jobs already in results_csv (False starts it again).
+
+    Returns:
+        list of dict: Summary rows (instance_name, algorithm, execution_time, cost).
+    """
+    pkl_files = sorted(Path(p) for p in pkl_files)
+    algorithms = list(algorithms)
+    jobs = [(pkl_file, algorithm) for pkl_file in pkl_files for algorithm in algorithms]
+
+    writer = ResultsWriter(results_csv, resume) if results_csv is not None else None
+    done = _finished_jobs(writer, jobs, results_folder, warm_start) if writer is not None else {}
+    if done:
+        print(f'Skipping {len(done)} jobs already in {results_csv}')
+    pending_jobs = [job for job in jobs if job not in done]
+    pending_files = sorted({pkl_file for pkl_file, _ in pending_jobs})
+    results = {}
+
+    if render:
+        from src.rendering import RenderQueue  # folium only when rendering
+        renderer = RenderQueue(workers=render_workers)
+    else:
+        renderer = nullcontext()
+
+    def record(job, row):
+        results[job] = row
+        if row is None:
+            return
+        if writer is not None:
+            writer.write(row)
+        if render:
+            pkl_file, algorithm = job
+            renderer.put_solution_file(solution_path(results_folder, pkl_file, algorithm),
+                                       solution_path(results_folder, pkl_file, algorithm, '.html'))
+
+    with renderer, (writer or nullcontext()):
+        if workers == 0:
+            for pkl_file, instance in prefetch(pending_files):
+                if render:
+                    renderer.put_instance(instance, instance_map_path(pkl_file))
+                for algorithm in algorithms:
+                    if (pkl_file, algorithm) not in done:
+                        record((pkl_file, algorithm),
+                               run_job(pkl_file, algorithm, results_folder, False, gurobi_threads,
+                                       warm_start, instance, instrument, profile))
+                if writer is not None:
+                    writer.sync()
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool, \
+                    ProcessPoolExecutor(max_workers=max(1, gurobi_workers)) as gurobi_pool:
+                if render:
+                    for pkl_file in pending_files:
+                        renderer.put_instance_file(pkl_file, instance_map_path(pkl_file))
+
+                # MIP jobs first so the long solves start as early as possible
+                futures = {}
+                for job in sorted(pending_jobs, key=lambda job: job[1] not in EXACT_ALGORITHMS):
+                    pkl_file, algorithm = job
+                    executor = gurobi_pool if algorithm in EXACT_ALGORITHMS else pool
+                    futures[executor.submit(
+                        run_job, pkl_file, algorithm, results_folder, False, gurobi_threads, warm_start,
+                        None, instrument, profile
+                    )] = job
+                for future in as_completed(futures):
+                    record(futures[future], future.result())
+
+    rows = [done[job] if job in done else results[job] for job in jobs]
+    return [row for row in rows if row is not None]
+
+
+def _finished_jobs(writer, jobs, results_folder, warm_start):
+    """
+    {job: stored row} of the jobs with a row in the results file and a saved solution.
+
+    The fingerprint of a dataset whose size and modification time match a
+    stored row (dataset_key) is taken from that row; only new or changed
+    datasets are loaded to compute it.
+    """
+    stored = {(row.get('instance_name'), str(row.get('dataset_key'))): row['fingerprint']
+              for row in writer.rows if row.get('dataset_key') is not None and row.get('fingerprint')}
+    fingerprints = {}
+    done = {}
+    for pkl_file, algorithm in jobs:
+        if pkl_file not in fingerprints:
+            fingerprint = stored.get((pkl_file.stem, dataset_key(pkl_file)))
+            fingerprints[pkl_file] = fingerprint or load_instance(pkl_file).fingerprint()
+        row = writer.done(fingerprints[pkl_file], algorithm, algorithm_params(algorithm, warm_start))
+        if row is not None and os.path.exists(solution_path(results_folder, pkl_file, algorithm)):
+            done[pkl_file, algorithm] = row
+    return done
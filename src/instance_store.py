@@ -0,0 +1,164 @@
+import json
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from src.vrp_instance import MATRICES, VRPInstance
+
+# On-disk layout of a binary instance: a directory named <stem>.vrp holding
+# one .npy file per matrix and a small JSON table with the locations.
+INSTANCE_SUFFIX = '.vrp'
+LOCATIONS_FILE = 'locations.json'
+FORMAT_VERSION = 1
+
+
+def is_instance_dir(path):
+    """True if path is a binary instance directory written by save_instance."""
+    path = Path(path)
+    return path.is_dir() and (path / LOCATIONS_FILE).is_file()
+
+
+def save_instance(instance, path):
+    """
+    Write an instance in the binary format.
+
+    Args:
+        instance (VRPInstance): Instance to store.
+        path (Path): Target directory (created if needed).
+
+    Returns:
+        Path: The instance directory.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    for matrix in MATRICES:
+        np.save(path / f'{matrix}.npy', getattr(instance, matrix))
+
+    table = {
+        'version': FORMAT_VERSION,
+        'dtype': instance.dtype.str,
+        'locations': [
+            {
+                'name': name,
+                'node': loc['node'],
+                'coords': list(loc['coords']),
+                'charging_cost': instance.charging_costs.get(name, 0),
+            }
+            for name, loc in instance.locations.items()
+        ],
+    }
+    with open(path / LOCATIONS_FILE, 'w', encoding='utf-8') as f:
+        json.dump(table, f, ensure_ascii=False, indent=1)
+    return path
+
+
+def open_instance(path, mmap=True):
+    """
+    Open a binary instance.
+
+    With mmap=True the matrices are memory-mapped read-only, so opening is
+    O(number of locations) and the pages are shared between processes that
+    open the same instance.
+
+    Args:
+        path (Path): Instance directory.
+        mmap (bool): Memory-map the matrices instead of reading them.
+
+    Returns:
+        VRPInstance: Instance whose distance/time/cost arrays are the stored matrices.
+    """
+    path = Path(path)
+    with open(path / LOCATIONS_FILE, encoding='utf-8') as f:
+        table = json.load(f)
+    if table.get('version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported instance format version {table.get('version')!r} in {path}")
+
+    locations = {
+        loc['name']: {'node': loc['node'], 'name': loc['name'], 'coords': tuple(loc['coords'])}
+        for loc in table['locations']
+    }
+    charging_costs = {loc['name']: loc['charging_cost'] for loc in table['locations']}
+    mmap_mode = 'r' if mmap else None
+    distance, time, cost = (np.load(path / f'{matrix}.npy', mmap_mode=mmap_mode) for matrix in MATRICES)
+
+    return VRPInstance(
+        locations=locations,
+        distance_matrix=distance,
+        time_matrix=time,
+        charging_costs=charging_costs,
+        cost_matrix=cost,
+        dtype=table['dtype']
+    )
+
+
+def load_pickle(pkl_file):
+    """Load a dataset pickle (dicts keyed by (name, name)) and build its VRPInstance."""
+    with open(pkl_file, 'rb') as f:
+        data = pickle.load(f)
+
+    return VRPInstance(
+        locations=data['locations'],
+        distance_matrix=data['distance_matrix'],
+        time_matrix=data['time_matrix'],
+        charging_costs=data['chargin_cost'],  # verify spelling
+        cost_matrix=data['cost_matrix']
+    )
+
+
+def convert_pickle(pkl_file, out_dir=None, overwrite=False):
+    """
+    Convert a dataset pickle to the binary format.
+
+    The instance is written as <out_dir>/<stem>.vrp (out_dir defaults to the
+    pickle's folder). An existing conversion newer than the pickle is kept
+    unless overwrite=True.
+
+    Returns:
+        Path: The instance directory.
+    """
+    pkl_file = Path(pkl_file)
+    target = Path(out_dir or pkl_file.parent) / (pkl_file.stem + INSTANCE_SUFFIX)
+    if (not overwrite and is_instance_dir(target)
+            and (target / LOCATIONS_FILE).stat().st_mtime >= pkl_file.stat().st_mtime):
+        return target
+    return save_instance(load_pickle(pkl_file), target)
+
+
+def convert_folder(folder, out_dir=None, overwrite=False):
+    """Convert every dataset_*.pkl of a folder; returns the instance directories sorted by name."""
+    return [convert_pickle(pkl_file, out_dir, overwrite)
+            for pkl_file in sorted(Path(folder).glob('*.pkl'))]
+
+
+def load_instance(path):
+    """Load an instance from a binary instance directory or a dataset pickle."""
+    if is_instance_dir(path):
+        return open_instance(path)
+    return load_pickle(path)
+
+
+def prefetch(paths, loader=load_instance, depth=1):
+    """
+    Iterate over (path, instance) pairs, loading ahead in a background thread.
+
+    While the caller works on one instance the next `depth` instances are
+    already being read, so solving and I/O overlap.
+
+    Args:
+        paths (iterable of Path): Instances to load, in order.
+        loader (callable): Function path -> VRPInstance.
+        depth (int): Number of instances loaded ahead.
+
+    Yields:
+        tuple: (path, VRPInstance)
+    """
+    paths = list(paths)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pending = [executor.submit(loader, path) for path in paths[:depth + 1]]
+        for k, path in enumerate(paths):
+            instance = pending.pop(0).result()
+            if k + depth + 1 < len(paths):
+                pending.append(executor.submit(loader, paths[k + depth + 1]))
+            yield path, instance
@@ -0,0 +1,77 @@
+import cProfile
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+
+class Metrics:
+    """
+    Opt-in counters and phase timings collected while a job runs.
+
+    Algorithms take an optional ``metrics`` argument; when it is None they
+    skip every bookkeeping step, so instrumentation costs nothing unless it
+    is requested.
+
+    Attributes:
+        counters (dict): Counter name -> value (e.g. moves_evaluated).
+        timings (dict): Phase name -> accumulated seconds (e.g. build, solve).
+        peak_memory (int | None): Peak traced memory in bytes (see track_memory).
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.timings = {}
+        self.peak_memory = None
+
+    def count(self, name, n=1):
+        """Add n to a counter."""
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextmanager
+    def phase(self, name):
+        """Context manager that adds the elapsed time to the phase timing."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def as_row(self):
+        """Flat dict for the results table: counters, <phase>_time and peak_memory_mb."""
+        row = dict(self.counters)
+        row.update({f'{name}_time': seconds for name, seconds in self.timings.items()})
+        if self.peak_memory is not None:
+            row['peak_memory_mb'] = self.peak_memory / 2**20
+        return row
+
+
+def phase(metrics, name):
+    """metrics.phase(name), or a no-op context when metrics is None."""
+    return nullcontext() if metrics is None else metrics.phase(name)
+
+
+@contextmanager
+def track_memory(metrics):
+    """Record the peak memory allocated inside the block with tracemalloc."""
+    already_tracing = tracemalloc.is_tracing()
+    if not already_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    try:
+        yield
+    finally:
+        metrics.peak_memory = tracemalloc.get_traced_memory()[1]
+        if not already_tracing:
+            tracemalloc.stop()
+
+
+@contextmanager
+def profile_to(path):
+    """Run the block under cProfile and dump the stats to path (readable with pstats)."""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
@@ -0,0 +1,204 @@
+import pickle
+import queue
+import threading
+from collections import OrderedDict
+
+import folium
+
+from src.instance_store import load_instance
+
+# Colour of each node type and of the routes, as in the original maps
+NODE_COLORS = {
+    "parking": "green",
+    "loading": "blue",
+    "unloading": "red",
+    "charger": "orange",
+}
+ROUTE_COLORS = ["blue", "red", "green", "orange", "purple", "brown", "pink", "darkcyan"]
+BASE_LAYER_CACHE_SIZE = 64
+
+_base_layers = OrderedDict()
+_base_layers_lock = threading.Lock()
+
+
+def base_layer(instance):
+    """
+    Map centre and GeoJSON FeatureCollection with one Point per location.
+
+    The layer only depends on the instance, so it is built once and cached
+    by instance fingerprint: rendering several solutions of the same
+    instance reuses it.
+
+    Returns:
+        tuple: ([lat, lon] centre, FeatureCollection dict)
+    """
+    key = instance.fingerprint()
+    with _base_layers_lock:
+        if key in _base_layers:
+            _base_layers.move_to_end(key)
+            return _base_layers[key]
+
+    features = []
+    for name, loc in instance.locations.items():
+        lat, lon = loc['coords']
+        features.append({
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+            'properties': {'name': name, 'node': loc['node'],
+                           'color': NODE_COLORS.get(loc['node'], 'black')},
+        })
+    lats = [loc['coords'][0] for loc in instance.locations.values()]
+    lons = [loc['coords'][1] for loc in instance.locations.values()]
+    layer = ([sum(lats) / len(lats), sum(lons) / len(lons)],
+             {'type': 'FeatureCollection', 'features': features})
+
+    with _base_layers_lock:
+        _base_layers[key] = layer
+        while len(_base_layers) > BASE_LAYER_CACHE_SIZE:
+            _base_layers.popitem(last=False)
+    return layer
+
+
+def route_layer(solution):
+    """GeoJSON FeatureCollection with one LineString per route and a Point per route stop."""
+    instance = solution.instance
+    coords = [instance.locations[name]['coords'] for name in instance.names]
+    features = []
+    for k, ids in enumerate(solution.route_ids):
+        color = ROUTE_COLORS[k % len(ROUTE_COLORS)]
+        line = [[coords[i][1], coords[i][0]] for i in ids]
+        features.append({
+            'type': 'Feature',
+            'geometry': {'type': 'LineString', 'coordinates': line},
+            'properties': {'route': f'Route {k + 1}', 'color': color},
+        })
+        features += [{
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': point},
+            'properties': {'route': f'Route {k + 1}', 'color': color},
+        } for point in line]
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def _style(feature):
+    color = feature['properties']['color']
+    return {'color': color, 'fillColor': color, 'weight': 4, 'opacity': 0.7, 'fillOpacity': 1}
+
+
+def _map(instance):
+    center, nodes = base_layer(instance)
+    m = folium.Map(location=center, zoom_start=6, tiles="CartoDB positron")
+    return m, nodes
+
+
+def _add_nodes(m, nodes):
+    folium.GeoJson(
+        nodes,
+        name="Nodes",
+        marker=folium.CircleMarker(radius=7, fill=True),
+        style_function=_style,
+        popup=folium.GeoJsonPopup(fields=['name', 'node'], aliases=['', 'Tipo:']),
+    ).add_to(m)
+
+
+def render_instance(instance, save_path):
+    """Write the HTML map of an instance: a single GeoJSON layer with all the nodes."""
+    m, nodes = _map(instance)
+    _add_nodes(m, nodes)
+    m.save(save_path)
+
+
+def render_solution(solution, save_path):
+    """Write the HTML map of a solution: the routes layer below the nodes layer."""
+    m, nodes = _map(solution.instance)
+    folium.GeoJson(
+        route_layer(solution),
+        name="Routes",
+        marker=folium.CircleMarker(radius=4, fill=True),
+        style_function=_style,
+        tooltip=folium.GeoJsonTooltip(fields=['route'], labels=False),
+    ).add_to(m)
+    _add_nodes(m, nodes)
+    m.save(save_path)
+
+
+def render_instance_file(path, save_path):
+    """Render an instance stored as a dataset pickle or a binary instance directory."""
+    render_instance(load_instance(path), save_path)
+
+
+def render_solution_file(pkl_file, save_path):
+    """Render a solution saved with VRPSolution.save."""
+    with open(pkl_file, 'rb') as f:
+        render_solution(pickle.load(f), save_path)
+
+
+class RenderQueue:
+    """
+    Background rendering stage.
+
+    Instances and solutions are put on a queue and rendered by `workers`
+    threads, so solving does not wait for the maps. With enabled=False
+    every put is a no-op (headless runs and benchmarks).
+
+    Usage:
+        with RenderQueue(workers=2) as renderer:
+            renderer.put_instance(instance, 'instance.html')
+            renderer.put_solution(solution, 'solution.html')
+        # leaving the block waits for the pending maps
+
+    Attributes:
+        errors (list): (save_path, exception) of the renders that failed.
+    """
+
+    def __init__(self, workers=1, enabled=True):
+        self.enabled = enabled
+        self.errors = []
+        self._jobs = queue.Queue()
+        self._threads = [threading.Thread(target=self._work, daemon=True)
+                         for _ in range(workers if enabled else 0)]
+        for thread in self._threads:
+            thread.start()
+
+    def put_instance(self, instance, save_path):
+        self.put(render_instance, instance, save_path)
+
+    def put_instance_file(self, path, save_path):
+        self.put(render_instance_file, path, save_path)
+
+    def put_solution(self, solution, save_path):
+        self.put(render_solution, solution, save_path)
+
+    def put_solution_file(self, pkl_file, save_path):
+        self.put(render_solution_file, pkl_file, save_path)
+
+    def put(self, render, source, save_path):
+        """Queue render(source, save_path)."""
+        if self.enabled:
+            self._jobs.put((render, source, save_path))
+
+    def _work(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            render, source, save_path = job
+            try:
+                render(source, save_path)
+            except Exception as exc:
+                print(f"Render of {save_path} failed: {exc}")
+                self.errors.append((save_path, exc))
+
+    def close(self):
+        """Wait for the pending renders and stop the workers."""
+        for _ in self._threads:
+            self._jobs.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,159 @@
+import csv
+import json
+import os
+from pathlib import Path
+
+# Rows written between two fsyncs of the results file
+FSYNC_BATCH = 8
+# Columns that identify a job in the results file
+KEY_COLUMNS = ('fingerprint', 'algorithm', 'params')
+
+
+def job_params(**params):
+    """Canonical string of the parameters that change an algorithm's result (the 'params' column)."""
+    return json.dumps(params, sort_keys=True)
+
+
+def _parse(value):
+    """CSV cell back to int, float or None where possible."""
+    if value is None or value == '':
+        return None
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+class ResultsWriter:
+    """
+    Streaming, resumable results CSV.
+
+    Every row is appended and flushed as soon as it is written, and the
+    file is fsynced every `fsync_batch` rows and on close, so a crash or a
+    killed job loses at most the row being solved (an OS crash at most one
+    batch). When a row brings new columns (e.g. the counters of an
+    instrumented algorithm) the file is rewritten once with the wider
+    header, through a temporary file and an atomic rename; the same
+    happens when a job is solved again and its old row is replaced. New
+    columns go before the key columns that end the header, so a row
+    whose writer puts those last (as run_job does) can only be cut short
+    inside a key column.
+
+    With resume=True the rows already in the file are loaded and a job is
+    reported as done if a row with the same instance fingerprint, algorithm
+    and parameters exists (see done()); with resume=False the file is
+    started from scratch.
+
+    Usage:
+        with ResultsWriter('results/resultados.csv') as writer:
+            if not writer.done(fingerprint, 'two_opt', job_params()):
+                writer.write(row)
+
+    Attributes:
+        csv_file (Path): The results file.
+        rows (list of dict): Every row in the file, previous ones included.
+    """
+
+    def __init__(self, csv_file, resume=True, fsync_batch=FSYNC_BATCH):
+        self.csv_file = Path(csv_file)
+        self.fsync_batch = fsync_batch
+        self.rows = []
+        self.fieldnames = []
+        if resume and self.csv_file.is_file():
+            with open(self.csv_file, newline='', encoding='utf-8') as f:
+                reader = csv.DictReader(f)
+                self.fieldnames = list(reader.fieldnames or [])
+                self.rows = [{key: value if key in KEY_COLUMNS else _parse(value) for key, value in row.items()}
+                             for row in reader if self._complete(row)]
+        self._index = {self._key(row): row for row in self.rows
+                       if all(row.get(column) is not None for column in KEY_COLUMNS)}
+        # a job solved more than once keeps its latest row
+        self.rows = [row for row in self.rows if self._index.get(self._key(row), row) is row]
+        self._pending = 0
+        self.csv_file.parent.mkdir(parents=True, exist_ok=True)
+        self._rewrite()
+
+    def _complete(self, row):
+        """
+        False for a row cut short by a crash: fewer (or more) cells than the
+        header, an empty key column or a params cell that is not the whole
+        JSON of job_params. Such rows are dropped on resume.
+        """
+        if None in row or any(value is None for value in row.values()):
+            return False
+        if not all(row[column] != '' for column in KEY_COLUMNS if column in self.fieldnames):
+            return False
+        if 'params' in self.fieldnames:
+            try:
+                json.loads(row['params'])
+            except ValueError:
+                return False
+        return True
+
+    @staticmethod
+    def _key(row):
+        return tuple(str(row.get(column)) for column in KEY_COLUMNS)
+
+    def done(self, fingerprint, algorithm, params):
+        """The stored row of that job, or None if it has not been solved yet."""
+        return self._index.get((str(fingerprint), str(algorithm), str(params)))
+
+    def write(self, row):
+        """Append a row; a previous row of the same job (a job solved again) is replaced."""
+        replaced = None
+        if all(row.get(column) is not None for column in KEY_COLUMNS):
+            replaced = self._index.get(self._key(row))
+            self._index[self._key(row)] = row
+        if replaced is not None:
+            self.rows.remove(replaced)
+        self.rows.append(row)
+
+        new_columns = [key for key in row if key not in self.fieldnames]
+        if new_columns or replaced is not None:
+            keys_at_end = len(self.fieldnames)
+            while keys_at_end and self.fieldnames[keys_at_end - 1] in KEY_COLUMNS:
+                keys_at_end -= 1
+            self.fieldnames[keys_at_end:keys_at_end] = new_columns
+            self._file.close()
+            self._rewrite()
+        else:
+            self._writer.writerow(row)
+            self._file.flush()
+            self._pending += 1
+            if self._pending >= self.fsync_batch:
+                self.sync()
+
+    def sync(self):
+        """fsync the rows written so far."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+
+    def _rewrite(self):
+        """Write header + all rows to a temporary file, swap it in and reopen it for appending."""
+        tmp_file = self.csv_file.with_name(self.csv_file.name + '.tmp')
+        with open(tmp_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=self.fieldnames)
+            if self.fieldnames:
+                writer.writeheader()
+            writer.writerows(self.rows)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.csv_file)
+        self._file = open(self.csv_file, 'a', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames)
+        self._pending = 0
+
+    def close(self):
+        """Sync and close the file."""
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
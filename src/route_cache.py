@@ -0,0 +1,159 @@
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+import numpy as np
+
+from src.vrp_instance import PARKING, LOADING, UNLOADING, CHARGER
+
+# Default memory cap of a cache and estimated bookkeeping cost of one entry
+DEFAULT_MAX_BYTES = 32 * 2**20
+ENTRY_OVERHEAD = 200
+
+
+class RouteEvaluation(NamedTuple):
+    """
+    Everything VRPSolution needs to know about one route.
+
+    Attributes:
+        distance, time (float): Route totals (km, minutes).
+        cost (float): Travel cost plus charging cost.
+        chargers (tuple of int): Charger ids visited after the start, in order.
+        feasible (bool): Route-level check: starts and ends at a parking and
+            has no loading after an unloading.
+    """
+    distance: float
+    time: float
+    cost: float
+    chargers: tuple
+    feasible: bool
+
+
+def route_key(ids):
+    """Cache key of a route: the bytes of its id sequence."""
+    return np.asarray(ids, dtype=np.intp).tobytes()
+
+
+def evaluate_route(instance, ids):
+    """Evaluate a route of ids (no cache)."""
+    ids = np.asarray(ids, dtype=np.intp)
+    from_ids, to_ids = ids[:-1], ids[1:]
+    codes = instance.node_codes[ids]
+    feasible = bool(
+        len(ids)
+        and codes[0] == PARKING
+        and codes[-1] == PARKING
+        and not ((np.cumsum(codes == UNLOADING) > 0) & (codes == LOADING)).any()
+    )
+    stops = ids[1:]
+    return RouteEvaluation(
+        float(instance.distance[from_ids, to_ids].sum()),
+        float(instance.time[from_ids, to_ids].sum()),
+        float(instance.cost[from_ids, to_ids].sum()) + float(instance.charging_cost_array[from_ids].sum()),
+        tuple(int(i) for i in stops[codes[1:] == CHARGER]),
+        feasible,
+    )
+
+
+class RouteCache:
+    """
+    LRU cache of route evaluations with a memory cap.
+
+    Keys are byte strings (see route_key) and values anything with an
+    estimated size; once the estimated total goes over max_bytes the least
+    recently used entries are evicted. Lookups and evictions are counted so
+    the hit rate of a run can be reported.
+
+    A cache can be shared between threads (the server's thread workers,
+    iter_anytime's solver thread): get, put, clear and stats hold a lock.
+    lookup and evaluate compute a missing value outside it, so two threads
+    may compute the same entry once each.
+
+    Usage:
+        cache = RouteCache(max_bytes=8 * 2**20)
+        evaluation = cache.evaluate(instance, ids)   # computed on a miss
+        cache.stats()   # {'hits': ..., 'misses': ..., 'hit_rate': ..., ...}
+
+    Attributes:
+        max_bytes (int): Memory cap (estimated) of the stored entries.
+        nbytes (int): Current estimated size.
+        hits, misses, evictions (int): Lookup and eviction counters.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        """Cached value of key (marked as most recently used), or default."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, nbytes=0):
+        """Store value under key; nbytes is its estimated size beyond the key."""
+        size = len(key) + nbytes + ENTRY_OVERHEAD
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= evicted
+                self.evictions += 1
+
+    def lookup(self, key, compute, nbytes=0):
+        """Cached value of key, or compute() stored under key."""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value, nbytes)
+        return value
+
+    def evaluate(self, instance, ids):
+        """RouteEvaluation of a route of ids, cached by its id sequence."""
+        key = route_key(ids)
+        evaluation = self.get(key)
+        if evaluation is None:
+            evaluation = evaluate_route(instance, ids)
+            self.put(key, evaluation, 8 * len(evaluation.chargers))
+        return evaluation
+
+    def clear(self):
+        """Drop every entry (the counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        """Counters, size and hit rate as a flat dict."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self.nbytes,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
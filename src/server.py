@@ -0,0 +1,545 @@
+"""
+Local solve server.
+
+A small asyncio service that keeps instances resident and answers solve
+requests over TCP, one JSON object per line:
+
+    {"id": 1, "op": "load", "path": "datasets/dataset_size25_1.pkl"}
+    {"id": 2, "op": "solve", "instance": "<fingerprint or path>", "algorithm": "two_opt"}
+    {"id": 3, "op": "solve", "instance": "<fingerprint>", "algorithm": "gurobi", "time_limit": 30}
+    {"id": 4, "op": "stats"}
+
+Every response carries the request id and "ok"; a solve answers with the
+cost, feasibility, routes and its latency split into queue and solve time.
+Responses on one connection come back as they finish, not in request order.
+
+    python -m src serve --preload datasets/ --port 8765
+
+Only the standard library, NumPy and the heuristics are imported up front;
+the exact models are loaded by the worker that first runs one.
+"""
+import asyncio
+import itertools
+import json
+import os
+import tempfile
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from src.batch_runner import ALGORITHMS, EXACT_ALGORITHMS, OPTIONAL_ALGORITHMS, solve
+from src.instance_store import INSTANCE_SUFFIX, is_instance_dir, load_instance, save_instance
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+SERVER_ALGORITHMS = ALGORITHMS + OPTIONAL_ALGORITHMS
+# Small requests arriving within BATCH_WINDOW seconds (at most MAX_BATCH) share one pool task
+BATCHED_ALGORITHMS = ('nearest_neighbour', 'two_opt')
+BATCH_WINDOW = 0.002
+MAX_BATCH = 32
+# Latencies kept per algorithm for the percentiles, and the percentiles reported
+LATENCY_WINDOW = 10000
+PERCENTILES = (50, 90, 99)
+# Longest request/response line (a solution of a large instance is a few hundred KB)
+STREAM_LIMIT = 2**24
+
+# Instances opened by this process (a pool worker, or the server itself with workers=0)
+_instances = {}
+
+
+def _open(instance_dir):
+    """The instance of a .vrp folder, opened (memory-mapped) once per process."""
+    instance = _instances.get(instance_dir)
+    if instance is None:
+        instance = _instances[instance_dir] = load_instance(instance_dir)
+    return instance
+
+
+def _solve_one(instance, algorithm, options):
+    """Solve one request; errors are returned, so one bad request does not fail its batch."""
+    try:
+        start = time.perf_counter()
+        if options.get('time_limit') is not None:
+            from src.algorithm.anytime import solve_anytime
+            solution = solve_anytime(instance, algorithm, time_limit=options['time_limit'])
+        else:
+            solution, _ = solve(instance, algorithm, warm_start=options.get('warm_start', False))
+        solve_time = time.perf_counter() - start
+    except Exception as exc:
+        return {'error': f'{type(exc).__name__}: {exc}'}
+    if solution is None:
+        return {'error': f'{algorithm} found no solution'}
+    return {
+        'cost': solution.total_cost,
+        'distance': solution.total_distance,
+        'time': solution.total_time,
+        'feasible': bool(solution.complete_feasibility_flag),
+        'routes': solution.routes,
+        'solve_time': solve_time,
+    }
+
+
+def _solve_jobs(instance_dir, jobs):
+    """
+    Solve a batch of (algorithm, options) jobs on one instance.
+
+    Runs in a pool worker; only the instance folder travels with the task
+    and only plain results travel back.
+
+    Returns:
+        list of dict: One result per job, in order.
+    """
+    instance = _open(instance_dir)
+    return [_solve_one(instance, algorithm, options) for algorithm, options in jobs]
+
+
+def _summary(values):
+    """Mean, percentiles and max of a list of seconds, in milliseconds."""
+    if not values:
+        return {}
+    values = np.asarray(values) * 1000
+    summary = {'mean': float(values.mean())}
+    summary.update((f'p{q}', float(v)) for q, v in zip(PERCENTILES, np.percentile(values, PERCENTILES)))
+    summary['max'] = float(values.max())
+    return summary
+
+
+class _Request:
+    """A solve request waiting for (or running in) a pool task."""
+
+    __slots__ = ('instance_dir', 'algorithm', 'options', 'future', 'received', 'dispatched')
+
+    def __init__(self, instance_dir, algorithm, options, future, received):
+        self.instance_dir = instance_dir
+        self.algorithm = algorithm
+        self.options = options
+        self.future = future
+        self.received = received
+        self.dispatched = None
+
+
+class SolveServer:
+    """
+    Asyncio solve server with resident instances and request batching.
+
+    Instances are loaded once and kept by fingerprint (a path that was
+    already loaded is not read again). Solving is CPU-bound, so it never
+    runs on the event loop: the heuristics go to a process pool whose
+    workers open each instance's memory-mapped .vrp folder once, and the
+    exact models to a separate, smaller pool so a long MIP cannot hold up
+    the heuristics. Pickled instances are converted to .vrp in a private
+    store folder when loaded.
+
+    nearest_neighbour and two_opt take milliseconds, so sending each
+    request to a worker on its own would mostly cost inter-process
+    overhead. Requests for them arriving within batch_window seconds (up
+    to max_batch) are grouped per instance and sent as one task per
+    worker. Requests with a time_limit (solved with solve_anytime) and the
+    other algorithms run one per task.
+
+    Usage:
+        server = SolveServer(workers=4)
+        await server.start()
+        ...
+        await server.close()
+
+    Args:
+        host, port (str, int): Address to listen on (port 0 = any free port).
+        workers (int | None): Heuristic processes (None = CPUs, 0 = threads
+            of this process, which solve the resident instances directly).
+        exact_workers (int): Concurrent exact-model solves.
+        batch_window (float): Seconds to wait for more small requests
+            (0 = only batch the requests already queued).
+        max_batch (int): Largest batch.
+        store_dir (Path | None): Where converted pickles are kept (default:
+            a temporary folder removed on close).
+
+    Attributes:
+        instances (dict): fingerprint -> VRPInstance of the resident instances.
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, exact_workers=1,
+                 batch_window=BATCH_WINDOW, max_batch=MAX_BATCH, store_dir=None):
+        self.host = host
+        self.port = port
+        self.workers = os.cpu_count() if workers is None else workers
+        self.exact_workers = exact_workers
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.instances = {}
+        self._instance_dirs = {}
+        self._paths = {}
+        self._tmp = None
+        self.store_dir = store_dir
+        self._server = None
+        self._queue = None
+        self._batcher = None
+        self._tasks = set()
+        self._latencies = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+        self._counts = defaultdict(lambda: {'requests': 0, 'errors': 0})
+        self._batches = 0
+        self._batched_requests = 0
+        self._started = None
+
+    async def start(self):
+        """Start the pools, the batcher and the listening socket."""
+        if self.store_dir is None:
+            self._tmp = tempfile.TemporaryDirectory(prefix='vrp-server-')
+            self.store_dir = self._tmp.name
+        if self.workers:
+            self._pool = ProcessPoolExecutor(self.workers)
+            self._exact_pool = ProcessPoolExecutor(self.exact_workers)
+        else:
+            self._pool = ThreadPoolExecutor(1, thread_name_prefix='solve')
+            self._exact_pool = ThreadPoolExecutor(self.exact_workers, thread_name_prefix='solve-exact')
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._batch_loop())
+        self._server = await asyncio.start_server(self._serve_client, self.host, self.port, limit=STREAM_LIMIT)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._started = time.perf_counter()
+        return self
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def close(self):
+        """Stop listening, cancel the batcher and shut the pools down."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._batcher is not None:
+            self._batcher.cancel()
+        for pool in (self._pool, self._exact_pool):
+            await asyncio.to_thread(pool.shutdown, cancel_futures=True)
+        if self._tmp is not None:
+            self._tmp.cleanup()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    # -- instances -------------------------------------------------------
+
+    async def load(self, path):
+        """
+        Make an instance resident (a .pkl or a .vrp folder).
+
+        Returns:
+            str: The instance fingerprint, used to refer to it in solve requests.
+        """
+        key = (str(Path(path).resolve()), Path(path).stat().st_mtime)
+        if key in self._paths and self._paths[key] in self.instances:
+            return self._paths[key]
+        fingerprint, instance, instance_dir = await asyncio.to_thread(self._load, Path(path))
+        self._paths[key] = fingerprint
+        if fingerprint not in self.instances:
+            self.instances[fingerprint] = instance
+            self._instance_dirs[fingerprint] = instance_dir
+            if not self.workers:
+                _instances[instance_dir] = instance
+        return fingerprint
+
+    def _load(self, path):
+        instance = load_instance(path)
+        fingerprint = instance.fingerprint()
+        if is_instance_dir(path):
+            instance_dir = path
+        else:
+            instance_dir = Path(self.store_dir) / (fingerprint + INSTANCE_SUFFIX)
+            if not is_instance_dir(instance_dir):
+                save_instance(instance, instance_dir)
+        return fingerprint, instance, str(instance_dir)
+
+    def unload(self, fingerprint):
+        """Drop a resident instance."""
+        self.instances.pop(fingerprint)
+        _instances.pop(self._instance_dirs.pop(fingerprint), None)
+        self._paths = {key: value for key, value in self._paths.items() if value != fingerprint}
+
+    async def _resolve(self, instance):
+        if instance in self.instances:
+            return instance
+        return await self.load(instance)
+
+    # -- solving ---------------------------------------------------------
+
+    async def solve(self, instance, algorithm='nearest_neighbour', received=None, **options):
+        """
+        Solve a resident instance (or load it first, if given a path).
+
+        Args:
+            instance (str): Fingerprint of a resident instance, or a path.
+            algorithm (str): One of SERVER_ALGORITHMS.
+            received (float | None): time.perf_counter() when the request
+                arrived (default: now).
+            **options: time_limit (seconds, solve with solve_anytime) and
+                warm_start (exact models).
+
+        Returns:
+            dict: cost, distance, time, feasible, routes, and the latencies
+            in seconds: solve_time (in the worker), queue_time (waiting for
+            a batch and a worker) and latency (arrival to answer).
+        """
+        received = time.perf_counter() if received is None else received
+        if algorithm not in SERVER_ALGORITHMS:
+            raise ValueError(f"Unknown algorithm {algorithm!r}, expected one of {SERVER_ALGORITHMS}")
+        fingerprint = await self._resolve(instance)
+        options = {key: value for key, value in options.items() if key in ('time_limit', 'warm_start')}
+        request = _Request(self._instance_dirs[fingerprint], algorithm, options,
+                           asyncio.get_running_loop().create_future(), received)
+        self._counts[algorithm]['requests'] += 1
+
+        if algorithm in BATCHED_ALGORITHMS and options.get('time_limit') is None:
+            self._queue.put_nowait(request)
+        else:
+            pool = self._exact_pool if algorithm in EXACT_ALGORITHMS else self._pool
+            self._spawn(self._run(pool, [request]))
+
+        result = await request.future
+        if 'error' in result:
+            self._counts[algorithm]['errors'] += 1
+            raise RuntimeError(result['error'])
+        result['fingerprint'] = fingerprint
+        result['algorithm'] = algorithm
+        result['queue_time'] = request.dispatched - received
+        result['latency'] = time.perf_counter() - received
+        self._latencies[algorithm].append((result['latency'], result['queue_time'], result['solve_time']))
+        return result
+
+    def _spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _batch_loop(self):
+        """Collect small requests for batch_window seconds and send them to the workers in batches."""
+        while True:
+            batch = [await self._queue.get()]
+            if self.batch_window > 0 and self._queue.qsize() < self.max_batch - 1:
+                await asyncio.sleep(self.batch_window)
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            self._batches += 1
+            self._batched_requests += len(batch)
+
+            by_instance = defaultdict(list)
+            for request in batch:
+                by_instance[request.instance_dir].append(request)
+            for requests in by_instance.values():
+                # one task per worker, so a batch is still solved in parallel
+                chunks = min(len(requests), max(self.workers, 1))
+                for k in range(chunks):
+                    self._spawn(self._run(self._pool, requests[k::chunks]))
+
+    async def _run(self, pool, requests):
+        """Solve requests (all on one instance) as one pool task and resolve their futures."""
+        dispatched = time.perf_counter()
+        for request in requests:
+            request.dispatched = dispatched
+        jobs = [(request.algorithm, request.options) for request in requests]
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                pool, _solve_jobs, requests[0].instance_dir, jobs)
+        except Exception as exc:
+            results = [{'error': f'{type(exc).__name__}: {exc}'}] * len(requests)
+        for request, result in zip(requests, results):
+            if not request.future.done():
+                request.future.set_result(dict(result))
+
+    # -- metrics ---------------------------------------------------------
+
+    def stats(self):
+        """
+        Server counters and per-algorithm latencies.
+
+        Returns:
+            dict: uptime, resident instances, queued requests, batches and
+            mean batch size, and for every algorithm the request and error
+            counts with mean/p50/p90/p99/max of latency, queue_time and
+            solve_time in milliseconds (over the last LATENCY_WINDOW
+            requests).
+        """
+        algorithms = {}
+        for algorithm, counts in self._counts.items():
+            latencies = list(zip(*self._latencies[algorithm])) or [(), (), ()]
+            algorithms[algorithm] = dict(
+                counts,
+                latency_ms=_summary(latencies[0]),
+                queue_ms=_summary(latencies[1]),
+                solve_ms=_summary(latencies[2]),
+            )
+        return {
+            'uptime': time.perf_counter() - self._started if self._started else 0.0,
+            'instances': len(self.instances),
+            'workers': self.workers,
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'in_flight': len(self._tasks),
+            'batches': self._batches,
+            'mean_batch_size': self._batched_requests / self._batches if self._batches else 0.0,
+            'algorithms': algorithms,
+        }
+
+    # -- protocol --------------------------------------------------------
+
+    async def _serve_client(self, reader, writer):
+        """Read request lines and answer each one as soon as it is done."""
+        lock = asyncio.Lock()
+        pending = set()
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(self._answer(line, time.perf_counter(), writer, lock))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _answer(self, line, received, writer, lock):
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            response = {'id': request_id, 'ok': True, **await self._handle(request, received)}
+        except Exception as exc:
+            response = {'id': request_id, 'ok': False, 'error': f'{type(exc).__name__}: {exc}'}
+        async with lock:
+            writer.write(json.dumps(response).encode() + b'\n')
+            await writer.drain()
+
+    async def _handle(self, request, received):
+        op = request.get('op', 'solve')
+        if op == 'solve':
+            options = {key: request[key] for key in ('time_limit', 'warm_start') if key in request}
+            return await self.solve(request['instance'], request.get('algorithm', 'nearest_neighbour'),
+                                    received, **options)
+        if op == 'load':
+            return {'fingerprint': await self.load(request['path'])}
+        if op == 'unload':
+            self.unload(request['instance'])
+            return {}
+        if op == 'stats':
+            return self.stats()
+        if op == 'ping':
+            return {}
+        raise ValueError(f"Unknown op {op!r}")
+
+
+class SolveClient:
+    """
+    Asyncio client of SolveServer.
+
+    One connection carries any number of concurrent requests: each one gets
+    an id and its response is matched by id, so they can finish out of
+    order.
+
+    Usage:
+        async with SolveClient(port=8765) as client:
+            fingerprint = await client.load('datasets/dataset_size25_1.pkl')
+            results = await asyncio.gather(*(client.solve(fingerprint, 'two_opt') for _ in range(10)))
+            print(await client.stats())
+
+    Failed requests raise RuntimeError with the server's message.
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.host = host
+        self.port = port
+        self._ids = itertools.count()
+        self._waiting = {}
+        self._lock = asyncio.Lock()
+        self._reader_task = None
+
+    async def connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port, limit=STREAM_LIMIT)
+        self._reader_task = asyncio.create_task(self._read_loop())
+        return self
+
+    async def _read_loop(self):
+        try:
+            while line := await self._reader.readline():
+                response = json.loads(line)
+                future = self._waiting.pop(response.get('id'), None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        finally:
+            for future in self._waiting.values():
+                if not future.done():
+                    future.set_exception(ConnectionError('connection to the solve server closed'))
+            self._waiting.clear()
+
+    async def request(self, op, **fields):
+        """Send one request and wait for its response (a dict without 'id' and 'ok')."""
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[request_id] = future
+        async with self._lock:
+            self._writer.write(json.dumps({'id': request_id, 'op': op, **fields}).encode() + b'\n')
+            await self._writer.drain()
+        response = await future
+        if not response.pop('ok'):
+            raise RuntimeError(response['error'])
+        del response['id']
+        return response
+
+    async def load(self, path):
+        """Make an instance resident; returns its fingerprint."""
+        return (await self.request('load', path=str(path)))['fingerprint']
+
+    async def solve(self, instance, algorithm='nearest_neighbour', **options):
+        """Solve a resident instance (fingerprint) or a path; options: time_limit, warm_start."""
+        return await self.request('solve', instance=str(instance), algorithm=algorithm, **options)
+
+    async def stats(self):
+        return await self.request('stats')
+
+    async def ping(self):
+        await self.request('ping')
+
+    async def close(self):
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except ConnectionError:
+            pass
+        if self._reader_task is not None:
+            await self._reader_task
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+def serve(paths=(), host=DEFAULT_HOST, port=DEFAULT_PORT, **kwargs):
+    """
+    Run a SolveServer until interrupted, with the given instances preloaded.
+
+    Args:
+        paths (iterable of Path): Instances (.pkl or .vrp) to load at start.
+        host, port: Address to listen on.
+        **kwargs: Other SolveServer arguments.
+    """
+    async def main():
+        async with SolveServer(host, port, **kwargs) as server:
+            for path in paths:
+                print(f'{path}: {await server.load(path)}')
+            print(f'Serving on {server.host}:{server.port} ({server.workers or "in-process"} workers)')
+            await server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
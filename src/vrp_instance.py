@@ -1,6 +1,56 @@
 
-import folium
-from folium.plugins import BeautifyIcon
+import hashlib
+import numpy as np
+
+
+# Integer codes used by the array-backed representation of node types
+NODE_TYPES = ('parking', 'loading', 'unloading', 'charger')
+PARKING, LOADING, UNLOADING, CHARGER = range(len(NODE_TYPES))
+NODE_CODES = {node_type: code for code, node_type in enumerate(NODE_TYPES)}
+
+# Default size of the per-type candidate lists
+DEFAULT_CANDIDATES = 10
+# Memory cap of the per-instance route evaluation cache
+ROUTE_CACHE_BYTES = 32 * 2**20
+# Id-indexed matrices of an instance
+MATRICES = ('distance', 'time', 'cost')
+
+
+class NamedMatrix:
+    """
+    Read-only view of a 2-D array addressed with ``(name, name)`` keys.
+
+    Keeps the ``matrix[from_loc, to_loc]`` interface of the original dict
+    matrices for instances that are built directly from arrays.
+    """
+
+    def __init__(self, array, index):
+        self.array = array
+        self.index = index
+
+    def __getitem__(self, key):
+        from_loc, to_loc = key
+        return self.array[self.index[from_loc], self.index[to_loc]].item()
+
+    def __contains__(self, key):
+        from_loc, to_loc = key
+        return from_loc in self.index and to_loc in self.index
+
+    def __len__(self):
+        return len(self.index) ** 2
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        return [(i, j) for i in self.index for j in self.index]
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
 
 class VRPInstance:
     """
@@ -12,6 +62,12 @@ class VRPInstance:
         - 'charger'
         - 'parking'
     
+    The matrices can be given either as dicts keyed by ``(name, name)`` or as
+    2-D arrays whose rows and columns follow the order of ``locations``.
+    In both cases the instance keeps contiguous NumPy copies indexed by dense
+    integer ids, which the algorithms use in their inner loops; name-based
+    lookups remain available as a compatibility layer.
+
     Attributes:
         locations (dict): All locations, keyed by name.
         distance_matrix (dict of dict): Distance between locations (km).
@@ -24,14 +80,40 @@ class VRPInstance:
         loadings (list): Names of all loading locations.
         unloadings (list): Names of all unloading locations.
         parkings (list): Names of all parking locations.
+
+        # Array-backed attributes
+        names (list): Location names, position i is the name of id i.
+        index (dict): Location name -> integer id.
+        node_codes (np.ndarray): Node type code of each id (int8).
+        distance, time, cost (np.ndarray): Square matrices indexed by id.
+        charging_cost_array (np.ndarray): Charging cost of each id.
     """
 
-    def __init__(self, locations, distance_matrix, time_matrix, charging_costs, cost_matrix):
+    def __init__(self, locations, distance_matrix, time_matrix, charging_costs, cost_matrix,
+                 dtype=np.float64):
         self.locations = locations
-        self.distance_matrix = distance_matrix
-        self.time_matrix = time_matrix
         self.charging_costs = charging_costs
-        self.cost_matrix = cost_matrix
+
+        # Interned location ids
+        self.names = list(locations.keys())
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.node_codes = np.array(
+            [NODE_CODES[loc['node']] for loc in locations.values()], dtype=np.int8
+        )
+
+        # Contiguous matrices indexed by id
+        self.dtype = np.dtype(dtype)
+        self.distance = self._as_array(distance_matrix)
+        self.time = self._as_array(time_matrix)
+        self.cost = self._as_array(cost_matrix)
+        self.charging_cost_array = np.array(
+            [charging_costs.get(name, 0) for name in self.names], dtype=self.dtype
+        )
+
+        # Name-based matrices: keep the original dicts, or wrap the arrays
+        self.distance_matrix = self._as_named(distance_matrix, self.distance)
+        self.time_matrix = self._as_named(time_matrix, self.time)
+        self.cost_matrix = self._as_named(cost_matrix, self.cost)
 
         # Separate entities for easy access
         self.chargers = [name for name, loc in locations.items() if loc['node'] == 'charger']
@@ -39,6 +121,56 @@ class VRPInstance:
         self.unloadings = [name for name, loc in locations.items() if loc['node'] == 'unloading']
         self.parkings = [name for name, loc in locations.items() if loc['node'] == 'parking']
 
+        self.charger_ids = np.flatnonzero(self.node_codes == CHARGER)
+        self.loading_ids = np.flatnonzero(self.node_codes == LOADING)
+        self.unloading_ids = np.flatnonzero(self.node_codes == UNLOADING)
+        self.parking_ids = np.flatnonzero(self.node_codes == PARKING)
+        self._symmetric = {}
+        self._candidate_lists = {}
+        self._fingerprint = None
+        self._route_cache = None
+        self._best_chargers = None
+        self._buffers = None
+
+    def __getstate__(self):
+        # The route cache and the charger table are rebuilt on demand and the
+        # growable buffers on the next add_location; none travels with the instance
+        state = self.__dict__.copy()
+        state['_route_cache'] = None
+        state['_best_chargers'] = None
+        state['_buffers'] = None
+        return state
+
+    def __setstate__(self, state):
+        # Instances pickled before the array-backed attributes (e.g. inside the
+        # results/*_solution.pkl files) only have the locations and dict matrices
+        if 'index' not in state:
+            self.__init__(state['locations'], state['distance_matrix'], state['time_matrix'],
+                          state['charging_costs'], state['cost_matrix'])
+            return
+        self.__dict__.update(state)
+        for attribute in ('_symmetric', '_candidate_lists'):
+            self.__dict__.setdefault(attribute, {})
+        for attribute in ('_fingerprint', '_route_cache', '_best_chargers', '_buffers'):
+            self.__dict__.setdefault(attribute, None)
+
+    def _as_array(self, matrix):
+        """Convert a dict matrix keyed by (name, name), or an array, to a square id-indexed array."""
+        if isinstance(matrix, dict):
+            n = len(self.names)
+            array = np.full((n, n), np.nan, dtype=self.dtype)
+            index = self.index
+            for (from_loc, to_loc), value in matrix.items():
+                if value is not None:
+                    array[index[from_loc], index[to_loc]] = value
+            return array
+        return np.ascontiguousarray(matrix, dtype=self.dtype)
+
+    def _as_named(self, matrix, array):
+        if isinstance(matrix, dict):
+            return matrix
+        return NamedMatrix(array, self.index)
+
     # -----------------------
     # Access methods
     # -----------------------
@@ -62,11 +194,270 @@ class VRPInstance:
             return self.charging_costs.get(loc_name, 0)
         return 0
 
+    # -----------------------
+    # Index-based access methods
+    # -----------------------
+    def route_to_ids(self, route):
+        """Translate a route of location names into an array of ids."""
+        index = self.index
+        return np.fromiter((index[loc] for loc in route), dtype=np.intp, count=len(route))
+
+    def ids_to_route(self, ids):
+        """Translate an array of ids back into a route of location names."""
+        names = self.names
+        return [names[i] for i in ids]
+
+    def get_distance_idx(self, i, j):
+        return self.distance[i, j]
+
+    def get_time_idx(self, i, j):
+        return self.time[i, j]
+
+    def get_cost_idx(self, i, j):
+        return self.cost[i, j]
+
+    def is_type_idx(self, i, node_type):
+        return self.node_codes[i] == NODE_CODES[node_type]
+
+    def is_symmetric(self, matrix='distance'):
+        """True if the given matrix ('distance', 'time' or 'cost') is symmetric."""
+        if matrix not in self._symmetric:
+            array = getattr(self, matrix)
+            self._symmetric[matrix] = bool(np.allclose(array, array.T, equal_nan=True))
+        return self._symmetric[matrix]
+
+    def candidate_lists(self, k=DEFAULT_CANDIDATES):
+        """
+        For every location id, its k nearest locations of each node type.
+
+        Built once per k and cached on the instance.
+
+        Returns:
+            dict: node type -> int array of shape (n, min(k, count of that type)),
+                  row i sorted by increasing distance from i (equal distances by
+                  id). A location is never its own candidate unless there are no
+                  others of its type. Of several locations tied at the k-th
+                  distance, argpartition keeps an arbitrary subset.
+        """
+        if k not in self._candidate_lists:
+            distance = np.where(np.isnan(self.distance), np.inf, self.distance)
+            np.fill_diagonal(distance, np.inf)
+            lists = {}
+            for code, node_type in enumerate(NODE_TYPES):
+                ids = np.flatnonzero(self.node_codes == code)
+                size = min(k, len(ids))
+                sub = distance[:, ids]
+                if size < len(ids):
+                    nearest = np.argpartition(sub, size - 1, axis=1)[:, :size]
+                else:
+                    nearest = np.broadcast_to(np.arange(len(ids)), sub.shape)
+                nearest = np.sort(nearest, axis=1)   # equal distances: lowest id first, as argmin
+                order = np.take_along_axis(sub, nearest, axis=1).argsort(axis=1, kind='stable')
+                lists[node_type] = ids[np.take_along_axis(nearest, order, axis=1)]
+            self._candidate_lists[k] = lists
+        return self._candidate_lists[k]
+
+    def best_chargers(self):
+        """
+        For every arc (i, j), the charger that minimises the detour cost plus
+        its charging cost when visited between i and j.
+
+        Built once (one n x n pass per charger) and cached on the instance;
+        add_location and remove_location reset it. Ties go to the charger
+        with the lowest id.
+
+        Returns:
+            tuple: (chargers, extra_cost, extra_distance, extra_time), n x n
+            arrays indexed by (i, j): the charger id (-1 and zero extras if the
+            instance has no chargers) and what visiting it adds to the arc.
+        """
+        if getattr(self, '_best_chargers', None) is None:
+            n = len(self.names)
+            chargers = np.full((n, n), -1, dtype=np.intp)
+            extra_cost = np.zeros((n, n), dtype=self.dtype)
+            if len(self.charger_ids):
+                extra_cost[:] = np.inf
+                for f in self.charger_ids:
+                    cost = (self.cost[:, f, None] + self.cost[None, f, :] - self.cost
+                            + self.charging_cost_array[f])
+                    better = cost < extra_cost
+                    extra_cost[better] = cost[better]
+                    chargers[better] = f
+            rows, columns = np.arange(n)[:, None], np.arange(n)[None, :]
+            detour = chargers >= 0
+            extra_distance = np.where(detour, self.distance[rows, chargers] + self.distance[chargers, columns]
+                                      - self.distance, 0.0)
+            extra_time = np.where(detour, self.time[rows, chargers] + self.time[chargers, columns]
+                                  - self.time, 0.0)
+            self._best_chargers = (chargers, extra_cost, extra_distance, extra_time)
+        return self._best_chargers
+
+    def route_distance(self, ids):
+        """Total distance of a route given as an array of ids."""
+        ids = np.asarray(ids)
+        return float(self.distance[ids[:-1], ids[1:]].sum())
+
+    # -----------------------
+    # Incremental updates
+    # -----------------------
+    def add_location(self, name, node, coords, distance, time, cost, charging_cost=0):
+        """
+        Append a location, extending the matrices in place.
+
+        The matrices live in buffers with spare capacity (allocated on the
+        first update, which also copies read-only memory-mapped matrices),
+        so an update writes one row and one column instead of rebuilding
+        the instance. Existing ids do not change.
+
+        Args:
+            name (str): New location name.
+            node (str): One of NODE_TYPES.
+            coords (tuple): (lat, lon).
+            distance, time, cost: The new row and column of each matrix in
+                id order: n values for a symmetric matrix, or a pair (from
+                the new location, to the new location) of n values each.
+            charging_cost (float): Charging cost (chargers).
+
+        Returns:
+            int: Id of the new location.
+        """
+        if name in self.index:
+            raise ValueError(f"Location {name!r} already exists")
+        if node not in NODE_CODES:
+            raise ValueError(f"Unknown node type {node!r}, expected one of {NODE_TYPES}")
+        n = len(self.names)
+        rows = [self._new_row(values, n) for values in (distance, time, cost)]
+
+        self._reserve(n + 1)
+        for matrix, (out, into) in zip(MATRICES, rows):
+            buffer = self._buffers[matrix]
+            buffer[n, :n], buffer[:n, n], buffer[n, n] = out, into, 0
+            named = getattr(self, matrix + '_matrix')
+            if isinstance(named, dict):
+                named.update({(name, other): value for other, value in zip(self.names, out.tolist())})
+                named.update({(other, name): value for other, value in zip(self.names, into.tolist())})
+                named[name, name] = 0.0
+
+        self.locations[name] = {'node': node, 'name': name, 'coords': tuple(coords)}
+        self.charging_costs[name] = charging_cost
+        self.names.append(name)
+        self.index[name] = n
+        self.node_codes = np.append(self.node_codes, np.int8(NODE_CODES[node]))
+        self.charging_cost_array = np.append(self.charging_cost_array, self.dtype.type(charging_cost))
+        getattr(self, node + 's').append(name)
+        self._resized(n + 1)
+        return n
+
+    def remove_location(self, name):
+        """
+        Remove a location, compacting the matrices in place.
+
+        The ids after the removed one move down by one, so the ids of
+        existing solutions of this instance must be renumbered (ids above
+        the returned id minus one).
+
+        Returns:
+            int: Id the location had.
+        """
+        k = self.index[name]
+        n = len(self.names)
+        self._reserve(n)
+        for matrix in MATRICES:
+            buffer = self._buffers[matrix]
+            buffer[k:n - 1, :n] = buffer[k + 1:n, :n]
+            buffer[:n - 1, k:n - 1] = buffer[:n - 1, k + 1:n]
+            named = getattr(self, matrix + '_matrix')
+            if isinstance(named, dict):
+                for other in self.names:
+                    named.pop((name, other), None)
+                    named.pop((other, name), None)
+
+        node = self.locations.pop(name)['node']
+        self.charging_costs.pop(name, None)
+        del self.names[k]
+        del self.index[name]
+        for i in range(k, n - 1):
+            self.index[self.names[i]] = i
+        self.node_codes = np.delete(self.node_codes, k)
+        self.charging_cost_array = np.delete(self.charging_cost_array, k)
+        getattr(self, node + 's').remove(name)
+        self._resized(n - 1)
+        self.route_cache().clear()
+        return k
+
+    def _new_row(self, values, n):
+        """(outgoing, incoming) arrays of a new matrix row/column."""
+        values = np.asarray(values, dtype=self.dtype)
+        if values.shape == (n,):
+            return values, values
+        if values.shape == (2, n):
+            return values[0], values[1]
+        raise ValueError(f"Expected {n} values or a pair of {n} values, got shape {values.shape}")
+
+    def _reserve(self, size):
+        """Make sure the matrix buffers are writable and hold size x size."""
+        buffers = getattr(self, '_buffers', None)
+        if buffers is not None and len(buffers['distance']) >= size:
+            return
+        capacity = max(size, len(self.names) * 3 // 2, 16)
+        n = len(self.names)
+        self._buffers = {}
+        for matrix in MATRICES:
+            buffer = np.empty((capacity, capacity), dtype=self.dtype)
+            buffer[:n, :n] = getattr(self, matrix)
+            self._buffers[matrix] = buffer
+
+    def _resized(self, n):
+        """Point the matrices at the first n x n of the buffers and reset the derived data."""
+        for matrix in MATRICES:
+            setattr(self, matrix, self._buffers[matrix][:n, :n])
+            named = getattr(self, matrix + '_matrix')
+            if isinstance(named, NamedMatrix):
+                named.array = getattr(self, matrix)
+        for code, node_type in enumerate(NODE_TYPES):
+            setattr(self, node_type + '_ids', np.flatnonzero(self.node_codes == code))
+        self._symmetric = {}
+        self._candidate_lists = {}
+        self._best_chargers = None
+        self._fingerprint = None
+
+    def route_cache(self):
+        """
+        Route evaluation cache shared by every solution of this instance.
+
+        A RouteCache created on first use with a ROUTE_CACHE_BYTES cap (its
+        max_bytes can be changed, 0 disables caching). It is not pickled.
+        """
+        if getattr(self, '_route_cache', None) is None:
+            from src.route_cache import RouteCache
+            self._route_cache = RouteCache(ROUTE_CACHE_BYTES)
+        return self._route_cache
+
+    def fingerprint(self):
+        """
+        Content hash of the instance (SHA-256 hex digest).
+
+        Covers the names, node types and coordinates of the locations, the
+        charging costs and the distance, time and cost matrices, so two
+        instances with the same data share the fingerprint regardless of
+        how they were loaded. Computed once and cached.
+        """
+        if getattr(self, '_fingerprint', None) is None:
+            digest = hashlib.sha256()
+            for name, loc in self.locations.items():
+                digest.update(repr((name, loc['node'], tuple(loc['coords']))).encode('utf-8'))
+            for array in (self.charging_cost_array, self.distance, self.time, self.cost):
+                digest.update(np.ascontiguousarray(array, dtype=np.float64).tobytes())
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
     def plot_vrp_instance_default_icons(self, save_path="vrp_instance.html"):
         """
         Genera un mapa HTML con todos los nodos del VRP,
         usando iconos normales de Folium, sin agruparlos.
             """
+        import folium  # solo al dibujar
+
         # Centro del mapa
         lats = [loc["coords"][0] for loc in self.locations.values()]
         lons = [loc["coords"][1] for loc in self.locations.values()]
@@ -1,28 +1,44 @@
 import os
 import pickle
-import plotly.graph_objects as go
-import folium
-from folium.plugins import BeautifyIcon
+import numpy as np
+from src.vrp_instance import PARKING, LOADING, UNLOADING
 
 
 class VRPSolution:
     """
     Represents a solution for a VRP instance.
 
+    Routes are stored as arrays of integer location ids together with their
+    distance, time and cost, so routes can be replaced or removed in
+    O(route length) while the totals and charging stops are kept up to date.
+
     Attributes:
         instance (VRPInstance): The VRP instance this solution belongs to.
-        routes (list of list): List of routes. Each route is a list of location names.
+        route_ids (list of np.ndarray): Routes as arrays of location ids.
+        route_distance, route_time, route_cost (list of float): Totals of each route;
+            route_cost includes the charging cost.
+        routes (list of list): Routes as lists of location names (read-only view).
         total_distance (float): Total distance of all routes (km).
         total_time (float): Total travel time of all routes (minutes).
         total_cost (float): Total travel cost of all routes.
         charging_stops (dict): Number of times each charger is used.
         short_feasibility_flag (bool | None): True if all routes pass route-level checks.
         complete_feasibility_flag (bool | None): True if all load/unload points visited.
+        solver_stats (dict): Extra figures reported by the solver (e.g. time_to_first_incumbent).
     """
 
+    __slots__ = (
+        'instance', 'route_ids', 'route_distance', 'route_time', 'route_cost',
+        'total_distance', 'total_time', 'total_cost', 'charging_stops', 'execution_time',
+        'short_feasibility_flag', 'complete_feasibility_flag', 'solver_stats',
+    )
+
     def __init__(self, instance):
         self.instance = instance
-        self.routes = []
+        self.route_ids = []
+        self.route_distance = []
+        self.route_time = []
+        self.route_cost = []
         self.total_distance = 0
         self.total_time = 0
         self.total_cost = 0
@@ -30,66 +46,126 @@ class VRPSolution:
         self.execution_time = None
         self.short_feasibility_flag = None
         self.complete_feasibility_flag = None
+        self.solver_stats = {}
+
+    @property
+    def routes(self):
+        ids_to_route = self.instance.ids_to_route
+        return [ids_to_route(ids) for ids in self.route_ids]
+
+    def copy(self):
+        """Copy of the solution that can be modified without affecting this one."""
+        new = VRPSolution.__new__(VRPSolution)
+        for slot in self.__slots__:
+            setattr(new, slot, getattr(self, slot))
+        for slot in ('route_ids', 'route_distance', 'route_time', 'route_cost'):
+            setattr(new, slot, list(getattr(self, slot)))
+        new.charging_stops = dict(self.charging_stops)
+        new.solver_stats = dict(self.solver_stats)
+        return new
 
     # ---------------------------
     # Route-level methods
     # ---------------------------
     def add_route(self, route):
-        self.short_feasibility_check(route)
-
-        self.routes.append(route)
-        for i in range(len(route)-1):
-            from_loc = route[i]
-            to_loc = route[i+1]
-            self.total_distance += self.instance.get_distance(from_loc, to_loc)
-            self.total_time += self.instance.get_time(from_loc, to_loc)
-            self.total_cost += self.instance.get_cost(from_loc, to_loc)
-            self.total_cost += self.instance.charging_costs.get(from_loc, 0)
-            
-            if self.instance.is_type(to_loc, 'charger'):
-                self.charging_stops[to_loc] += 1
+        """Append a route, given as a list of location names or an array of ids."""
+        ids = self._as_ids(route)
+        self._check(ids)
+        self.route_ids.append(ids)
+        self.route_distance.append(0.0)
+        self.route_time.append(0.0)
+        self.route_cost.append(0.0)
+        self._account(len(self.route_ids) - 1, +1)
+
+    def replace_route(self, k, route):
+        """Replace route k, updating the totals with the difference of the two routes."""
+        ids = self._as_ids(route)
+        self._check(ids)
+        self._account(k, -1)
+        self.route_ids[k] = ids
+        self._account(k, +1)
+
+    def remove_route(self, k):
+        """Remove route k and subtract it from the totals."""
+        self._account(k, -1)
+        for values in (self.route_ids, self.route_distance, self.route_time, self.route_cost):
+            del values[k]
+
+    def _as_ids(self, route):
+        if isinstance(route, np.ndarray):
+            return route.astype(np.intp, copy=False)
+        if len(route) and isinstance(route[0], (int, np.integer)):
+            return np.asarray(route, dtype=np.intp)
+        return self.instance.route_to_ids(route)
+
+    def _account(self, k, sign):
+        """Add (sign=+1) or subtract (sign=-1) route k to the totals and charging stops."""
+        evaluation = self.instance.route_cache().evaluate(self.instance, self.route_ids[k])
+        if sign > 0:
+            self.route_distance[k], self.route_time[k], self.route_cost[k] = evaluation[:3]
+        self.total_distance += sign * self.route_distance[k]
+        self.total_time += sign * self.route_time[k]
+        self.total_cost += sign * self.route_cost[k]
+
+        names = self.instance.names
+        for i in evaluation.chargers:
+            self.charging_stops[names[i]] += sign
+
+    def _check(self, ids):
+        """Route-level check through the route cache; the full check only runs (and prints) on failure."""
+        if self.instance.route_cache().evaluate(self.instance, ids).feasible:
+            self.short_feasibility_flag = True
+            return True
+        return self.short_feasibility_check(ids)
+
+    def _route_totals(self, ids):
+        """(distance, time, cost including charging) of a route of ids."""
+        return self.instance.route_cache().evaluate(self.instance, ids)[:3]
 
     # ---------------------------
     # Solution-level methods
     # ---------------------------
     def all_loads_unloads_visited(self):
-        visited = set(loc for route in self.routes for loc in route)
-        missing_loadings = [loc for loc in self.instance.loadings if loc not in visited]
-        missing_unloadings = [loc for loc in self.instance.unloadings if loc not in visited]
-
-        return not (missing_loadings or missing_unloadings)
+        instance = self.instance
+        visited = np.zeros(len(instance.names), dtype=bool)
+        for ids in self.route_ids:
+            visited[ids] = True
+        return bool(visited[instance.loading_ids].all() and visited[instance.unloading_ids].all())
 
     def short_feasibility_check(self, route):
         """
         Check route-level feasibility:
         1. Starts and ends at parking
         2. No loading after unloading
+        The route can be a list of location names or an array of ids.
         Returns True/False and prints the reason if False.
         """
         self.short_feasibility_flag = False
-        if not route:
+        if not len(route):
             print("Route is empty")
             return False
 
-        if not self.instance.is_type(route[0], 'parking'):
-            print(f"Route does not start at a parking: {route[0]}")
+        instance = self.instance
+        ids = self._as_ids(route)
+        codes = instance.node_codes[ids]
+
+        if codes[0] != PARKING:
+            print(f"Route does not start at a parking: {instance.names[ids[0]]}")
             return False
 
-        if not self.instance.is_type(route[-1], 'parking'):
-            print(f"Route does not end at a parking: {route[-1]}")
+        if codes[-1] != PARKING:
+            print(f"Route does not end at a parking: {instance.names[ids[-1]]}")
+            return False
+
+        unloading_seen = np.cumsum(codes == UNLOADING) > 0
+        late_loadings = np.flatnonzero(unloading_seen & (codes == LOADING))
+        if len(late_loadings):
+            print(f"Route has loading after unloading: {instance.names[ids[late_loadings[0]]]}")
             return False
 
-        unloading_seen = False
-        for loc in route:
-            if self.instance.is_type(loc, 'unloading'):
-                unloading_seen = True
-            if unloading_seen and self.instance.is_type(loc, 'loading'):
-                print(f"Route has loading after unloading: {loc}")
-                return False
-        
         self.short_feasibility_flag = True
         return True
-    
+
     def complete_feasibility(self):
         """
         Run all feasibility tests and update flags:
@@ -98,7 +174,7 @@ class VRPSolution:
         """
 
         # Route-level check: all routes pass
-        all_routes_ok = all(self.short_feasibility_check(r) for r in self.routes)
+        all_routes_ok = all(self._check(r) for r in self.route_ids)
         self.short_feasibility_flag = all_routes_ok
 
         # Solution-level check: all load/unload points visited
@@ -107,6 +183,30 @@ class VRPSolution:
         # Overall solution feasible only if both are True
         self.complete_feasibility_flag = all_routes_ok and loads_unloads_ok
 
+    # ---------------------------
+    # Pickling
+    # ---------------------------
+    def __getstate__(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __setstate__(self, state):
+        """Restore a pickled solution, including those saved before routes were stored as ids."""
+        if isinstance(state, tuple):  # (dict state, slot state)
+            state = {**(state[0] or {}), **(state[1] or {})}
+        state = dict(state)
+        legacy_routes = state.pop('routes', None)
+        self.execution_time = None
+        self.solver_stats = {}
+        for slot, value in state.items():
+            if slot in self.__slots__:
+                setattr(self, slot, value)
+
+        if 'route_ids' not in state:
+            self.route_ids = [self.instance.route_to_ids(route) for route in legacy_routes or []]
+            totals = [self._route_totals(ids) for ids in self.route_ids]
+            self.route_distance = [distance for distance, _, _ in totals]
+            self.route_time = [time for _, time, _ in totals]
+            self.route_cost = [cost for _, _, cost in totals]
 
     def save(self, filepath):
         """
@@ -130,6 +230,8 @@ class VRPSolution:
         - Sin agrupación de marcadores
         """
 
+        import folium  # solo al dibujar
+
         instance = self.instance
 
         # -------------------------
@@ -0,0 +1,48 @@
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.instance_store import load_pickle
+from src.algorithm.nearest_neighbour import nearest_neighbour
+from src.algorithm.two_opt import two_opt
+from src.algorithm.split import split, MAX_TIME_PER_ROUTE
+from src.algorithm.alns import (alns, _Context, _routes_from_solution, _random_removal, _worst_removal,
+                                _shaw_removal, _greedy_insertion, _regret_insertion)
+
+DATASET = Path(__file__).resolve().parent.parent / 'datasets' / 'dataset_size100_1.pkl'
+MAX_ROUTE_LENGTH = 200.0
+MAX_VEHICLES = 3
+
+
+@pytest.fixture(scope='module')
+def instance():
+    return load_pickle(DATASET)
+
+
+def _orders(instance):
+    return Counter(int(i) for i in np.concatenate((instance.loading_ids, instance.unloading_ids)))
+
+
+@pytest.mark.parametrize('destroy', (_random_removal, _worst_removal, _shaw_removal))
+@pytest.mark.parametrize('repair', (_greedy_insertion, _regret_insertion(2), _regret_insertion(3)))
+def test_repair_under_vehicle_cap_inserts_every_order_once(instance, destroy, repair):
+    ctx = _Context(instance, MAX_ROUTE_LENGTH, MAX_TIME_PER_ROUTE, MAX_VEHICLES)
+    initial = split(two_opt(nearest_neighbour(instance)), MAX_ROUTE_LENGTH, MAX_TIME_PER_ROUTE)
+    current = _routes_from_solution(ctx, initial)
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        routes = list(current)
+        removed = destroy(ctx, routes, 10, rng)
+        if repair(ctx, routes, removed, rng):
+            assert Counter(u for route in routes for u in route.customers) == _orders(instance)
+            current = routes
+
+
+def test_alns_under_vehicle_cap_visits_every_order_once(instance):
+    solution = alns(instance, max_route_length=MAX_ROUTE_LENGTH, max_vehicles=MAX_VEHICLES,
+                    max_iterations=300, seed=2)
+    visited = Counter(int(i) for ids in solution.route_ids for i in ids if int(i) in _orders(instance))
+    assert visited == _orders(instance)
+    assert solution.complete_feasibility_flag